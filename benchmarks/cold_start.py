@@ -0,0 +1,149 @@
+"""
+Benchmark de arranque en frío de la CLI (estilo `python -X importtime`).
+
+Mide, en procesos nuevos, el tiempo de importar lo que necesita cada comando
+de src/main.py, lista los módulos más costosos y compara el mínimo de las N
+corridas (el menos afectado por ruido del sistema) contra el presupuesto de
+benchmarks/cold_start_budget.json. Sale con código 1 si algún
+escenario supera su presupuesto (más la tolerancia) o si la inferencia importa
+módulos del stack de entrenamiento.
+
+Uso:
+    python benchmarks/cold_start.py [--runs 5] [--output benchmarks/results/cold_start.json]
+    python benchmarks/cold_start.py --runs 7 --update-budget   # re-registrar la línea base
+"""
+import os
+import re
+import sys
+import json
+import argparse
+import statistics
+import subprocess
+from datetime import datetime, timezone
+
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SRC_DIR = os.path.join(ROOT, "src")
+BUDGET_PATH = os.path.join(ROOT, "benchmarks", "cold_start_budget.json")
+
+SCENARIOS = {
+    # Intérprete + argparse, sin comando
+    "cli": "import main",
+    # Lo que importa --inference / --serve
+    "inference": "import main; import modules.model.inference",
+    # Lo que importa --train-model
+    "train_model": (
+        "import main; import modules.data.fetch_data, modules.data.pre_processing, "
+        "modules.data.upload_feature_store, modules.data.streaming_features, modules.model.pipe"
+    ),
+}
+
+# Módulos que la inferencia no debe cargar
+INFERENCE_FORBIDDEN = ("sklearn", "matplotlib", "ta", "joblib")
+
+IMPORTTIME_RE = re.compile(r"import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)")
+
+
+def run_scenario(code: str):
+    """
+    Ejecuta el import en un proceso nuevo y devuelve (wall_ms, módulos cargados, importtime).
+    """
+    probe = f"{code}; import sys, json; print(json.dumps(sorted(sys.modules)))"
+    env = dict(os.environ, PYTHONPATH=SRC_DIR, PYTHONDONTWRITEBYTECODE="0")
+
+    start = datetime.now(timezone.utc)
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", probe],
+        capture_output=True, text=True, env=env, cwd=ROOT, check=True,
+    )
+    wall_ms = (datetime.now(timezone.utc) - start).total_seconds() * 1000
+
+    imports = []
+    for line in result.stderr.splitlines():
+        match = IMPORTTIME_RE.match(line)
+        if match:
+            self_us, cumulative_us, indent, module = match.groups()
+            # Solo módulos de primer nivel (sin indentación en el árbol)
+            if len(indent) == 1:
+                imports.append((module, int(cumulative_us)))
+
+    modules = json.loads(result.stdout.strip().splitlines()[-1])
+    return wall_ms, modules, imports
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--output", default=os.path.join(ROOT, "benchmarks", "results", "cold_start.json"))
+    parser.add_argument("--update-budget", action="store_true",
+                        help="Registra los mínimos actuales como nueva línea base")
+    args = parser.parse_args()
+
+    with open(BUDGET_PATH) as f:
+        budget = json.load(f)
+    tolerance = budget.get("tolerance", 0.3)
+
+    report = {"timestamp": datetime.now(timezone.utc).isoformat(), "python": sys.version.split()[0],
+              "runs": args.runs, "scenarios": {}}
+    failures = []
+
+    for name, code in SCENARIOS.items():
+        walls, imports, modules = [], [], []
+        for _ in range(args.runs):
+            wall_ms, modules, imports = run_scenario(code)
+            walls.append(wall_ms)
+
+        median_ms = statistics.median(walls)
+        min_ms = min(walls)
+        top = sorted(imports, key=lambda x: x[1], reverse=True)[:10]
+        limit_ms = budget["budget_ms"].get(name)
+
+        report["scenarios"][name] = {
+            "median_ms": round(median_ms, 1),
+            "min_ms": round(min_ms, 1),
+            "budget_ms": limit_ms,
+            "top_imports_ms": {module: round(us / 1000, 1) for module, us in top},
+        }
+
+        status = "OK"
+        if limit_ms is not None and min_ms > limit_ms * (1 + tolerance):
+            status = "EXCEDIDO"
+            failures.append(f"{name}: {min_ms:.0f} ms > {limit_ms} ms (+{tolerance:.0%})")
+
+        if name == "inference":
+            loaded = sorted({m.split(".")[0] for m in modules} & set(INFERENCE_FORBIDDEN))
+            report["scenarios"][name]["forbidden_loaded"] = loaded
+            if loaded:
+                status = "EXCEDIDO"
+                failures.append(f"inference importa módulos de entrenamiento: {loaded}")
+
+        print(f"{name:<12} mínimo {min_ms:8.1f} ms  mediana {median_ms:8.1f} ms  "
+              f"presupuesto {limit_ms} ms  [{status}]")
+        for module, us in top[:5]:
+            print(f"    {module:<40} {us / 1000:8.1f} ms")
+
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=4)
+    print(f"Resultados guardados en {args.output}")
+
+    if args.update_budget:
+        budget["budget_ms"] = {n: round(s["min_ms"]) for n, s in report["scenarios"].items()}
+        budget["tolerance"] = tolerance
+        budget["runs"] = args.runs
+        budget["recorded_at"] = report["timestamp"]
+        with open(BUDGET_PATH, "w") as f:
+            json.dump(budget, f, indent=4)
+        print(f"Presupuesto actualizado en {BUDGET_PATH}")
+        return 0
+
+    if failures:
+        print("Regresión de arranque en frío:")
+        for failure in failures:
+            print(f"  - {failure}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
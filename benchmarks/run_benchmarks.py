@@ -0,0 +1,395 @@
+"""
+Suite de benchmarks de throughput sobre historia OHLC sintética (sin red).
+
+Cada etapa corre en un proceso nuevo (spawn) dentro de un directorio temporal,
+así el pico de RSS reportado corresponde solo a esa etapa y los artifacts no
+tocan el repo. Por etapa se reporta throughput (barras/s), pico de RSS, tiempo
+de CPU y tiempos por sub-etapa; el resultado se guarda como JSON y, con
+--baseline, se compara contra una corrida anterior (sale con código 1 si
+alguna etapa pierde más de la tolerancia de throughput).
+
+Etapas:
+    parse            FetchData.fetch_raw_data sobre un payload JSON de Alpha Vantage
+    features_pandas  ForexFeatureEngineer.prepare_features (backend pandas)
+    features_polars  ForexFeatureEngineer.prepare_features (backend polars)
+    features_compact ForexFeatureEngineer.prepare_features (pandas, compact=True)
+    features_panel   PanelFeatureProcessor.process, todos los pares en un plan polars agrupado
+    streaming        StreamingFeatureEngine.update_many, barra a barra
+    pipeline         feature store + PipelineRunner.run (split, scale, train, test)
+    inference        InferenceService.predict_from_bars, una barra por llamada
+
+Uso:
+    python benchmarks/run_benchmarks.py --bars 1000000 --symbols 4
+    python benchmarks/run_benchmarks.py --stages features_pandas,features_polars --bars 100000000 --symbols 50
+    python benchmarks/run_benchmarks.py --baseline benchmarks/results/bench_<commit>_<ts>.json
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import resource
+import platform
+import tempfile
+import subprocess
+import multiprocessing
+from datetime import datetime, timezone
+from concurrent.futures import ProcessPoolExecutor
+
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SRC_DIR = os.path.join(ROOT, "src")
+BENCH_DIR = os.path.join(ROOT, "benchmarks")
+RESULTS_DIR = os.path.join(BENCH_DIR, "results")
+
+# Spawn hereda sys.path del padre: los workers importan `modules.*` y `synthetic`
+for path in (SRC_DIR, BENCH_DIR):
+    if path not in sys.path:
+        sys.path.insert(0, path)
+
+STAGES = ("parse", "features_pandas", "features_polars", "features_compact", "features_panel", "streaming", "pipeline", "inference")
+
+
+class _OfflineResponse:
+    def __init__(self, text: str):
+        self.text = text
+        self.status_code = 200
+
+    def raise_for_status(self):
+        pass
+
+
+class _OfflineSession:
+    """
+    Sesión que responde siempre el mismo payload, en lugar de la API.
+    """
+
+    def __init__(self, payload: str):
+        self.payload = payload
+
+    def get(self, url, params=None, timeout=None):
+        return _OfflineResponse(self.payload)
+
+
+def _timed(timings: dict, label: str, fn, *args, **kwargs):
+    start = time.perf_counter()
+    result = fn(*args, **kwargs)
+    timings[label] = timings.get(label, 0.0) + time.perf_counter() - start
+    return result
+
+
+def _timed_iter(timings: dict, label: str, iterable):
+    """
+    Acumula en timings[label] el tiempo de producir cada elemento del iterable.
+    """
+    iterator = iter(iterable)
+    while True:
+        start = time.perf_counter()
+        try:
+            item = next(iterator)
+        except StopIteration:
+            return
+        timings[label] = timings.get(label, 0.0) + time.perf_counter() - start
+        yield item
+
+
+# ----------------------------------------------------------------------
+# Etapas (se ejecutan dentro del proceso worker)
+# ----------------------------------------------------------------------
+def bench_parse(params: dict) -> dict:
+    from synthetic import generate_panel, to_alpha_vantage_json
+    from modules.data.fetch_data import FetchData
+    from modules.data.payload_parser import _parse_json_fast
+
+    os.environ.setdefault("API_URL", "http://offline.invalid/query")
+    os.environ.setdefault("API_KEY", "benchmark")
+
+    timings, bars = {}, 0
+    for symbol, df in generate_panel(params["symbols"], params["parse_bars"], params["seed"], params["freq"]):
+        payload = _timed(timings, "serialize", to_alpha_vantage_json, df)
+        if _parse_json_fast(payload.encode(), "Time Series FX (Daily)") is None:
+            raise RuntimeError("El payload sintético no entra por el camino rápido del parser")
+        fetcher = FetchData(raw_storage_root="raw", session=_OfflineSession(payload), use_cache=False)
+        parsed = _timed(timings, "fetch_raw_data", fetcher.fetch_raw_data, symbol[:3], symbol[3:])
+        bars += len(parsed)
+    return {"bars": bars, "measured": "fetch_raw_data", "timings": timings}
+
+
+def _bench_features(params: dict, backend: str, compact: bool = False) -> dict:
+    from synthetic import generate_panel
+    from modules.data.pre_processing import ForexFeatureEngineer
+
+    engineer = ForexFeatureEngineer(backend=backend, compact=compact)
+    timings, bars = {}, 0
+    panel = generate_panel(params["symbols"], params["bars_per_symbol"], params["seed"], params["freq"])
+    for symbol, df in _timed_iter(timings, "generate", panel):
+        _timed(timings, "prepare_features", engineer.prepare_features, df, "date")
+        bars += len(df)
+    return {"bars": bars, "measured": "prepare_features", "timings": timings}
+
+
+def bench_features_pandas(params: dict) -> dict:
+    return _bench_features(params, "pandas")
+
+
+def bench_features_polars(params: dict) -> dict:
+    return _bench_features(params, "polars")
+
+
+def bench_features_compact(params: dict) -> dict:
+    return _bench_features(params, "pandas", compact=True)
+
+
+def bench_features_panel(params: dict) -> dict:
+    from synthetic import generate_panel
+    from modules.data.panel_features import PanelFeatureProcessor
+
+    timings = {}
+    panel = generate_panel(params["symbols"], params["bars_per_symbol"], params["seed"], params["freq"])
+    frames = dict(_timed_iter(timings, "generate", panel))
+    df = _timed(timings, "concat", PanelFeatureProcessor.from_frames, frames)
+    del frames
+    _timed(timings, "process", PanelFeatureProcessor().process, df)
+    return {"bars": len(df), "measured": "process", "timings": timings}
+
+
+def bench_streaming(params: dict) -> dict:
+    from synthetic import generate_panel
+    from modules.data.streaming_features import StreamingFeatureEngine
+
+    timings, bars = {}, 0
+    for symbol, df in generate_panel(params["symbols"], params["stream_bars"], params["seed"], params["freq"]):
+        engine = StreamingFeatureEngine(symbol=symbol)
+        _timed(timings, "update_many", engine.update_many, df, "date")
+        bars += len(df)
+    return {"bars": bars, "measured": "update_many", "timings": timings}
+
+
+def bench_pipeline(params: dict) -> dict:
+    from synthetic import generate_panel
+    from modules.data.pre_processing import ForexFeatureEngineer
+    from modules.data.upload_feature_store import FeatureStoreManager
+    from modules.model.pipe import PipelineRunner
+
+    engineer = ForexFeatureEngineer()
+    store = FeatureStoreManager(".")
+    timings, bars = {}, 0
+    for symbol, df in generate_panel(params["symbols"], params["bars_per_symbol"], params["seed"], params["freq"]):
+        df_features = _timed(timings, "prepare_features", engineer.prepare_features, df, "date")
+        version = _timed(timings, "save_features", store.save_features, df_features,
+                         name=f"bench_{symbol.lower()}", symbol=symbol)
+        df_features.fillna(0, inplace=True)
+        df_features["symbol"] = symbol
+        runner = PipelineRunner(df_features, feature_version=version)
+        _timed(timings, "pipeline_run", runner.run)
+        bars += len(df)
+    return {"bars": bars, "measured": "pipeline_run", "timings": timings}
+
+
+def bench_inference(params: dict) -> dict:
+    import numpy as np
+    import pandas as pd
+    from synthetic import generate_ohlc, DEFAULT_END
+    from modules.data.pre_processing import ForexFeatureEngineer
+    from modules.data.streaming_features import StreamingFeatureEngine
+    from modules.model.inference import InferenceService
+    from modules.model.pipe import PipelineRunner
+
+    # Modelo chico entrenado sobre barras diarias hasta fin de 2024 (el split
+    # necesita años < 2024 y 2024); las barras "en vivo" continúan en 2025
+    symbol = "EURGBP"
+    n_train, n_calls = params["inference_train_bars"], params["inference_calls"]
+    end = pd.Timestamp(DEFAULT_END) + pd.Timedelta(days=n_calls)
+    df = generate_ohlc(n_train + n_calls, symbol, params["seed"], freq="D", end=end)
+    history, live = df.iloc[:n_train], df.iloc[n_train:]
+
+    timings = {}
+    df_features = _timed(timings, "prepare_features", ForexFeatureEngineer().prepare_features, history, "date")
+    df_features.fillna(0, inplace=True)
+    df_features["symbol"] = symbol
+    _timed(timings, "train", PipelineRunner(df_features).run)
+    StreamingFeatureEngine.from_history(history, symbol=symbol, date_column="date").save()
+
+    service = _timed(timings, "load", InferenceService, symbols=[symbol])
+    bars = [{symbol: live.iloc[i:i + 1]} for i in range(len(live))]
+    start = time.perf_counter()
+    for payload in bars:
+        service.predict_from_bars(payload)
+    timings["predict_from_bars"] = time.perf_counter() - start
+
+    latency = service.latency_stats()
+    return {
+        "bars": len(live),
+        "measured": "predict_from_bars",
+        "timings": timings,
+        "latency_ms": {k: round(float(v), 3) if isinstance(v, (float, np.floating)) else v for k, v in latency.items()},
+    }
+
+
+BENCHMARKS = {
+    "parse": bench_parse,
+    "features_pandas": bench_features_pandas,
+    "features_polars": bench_features_polars,
+    "features_compact": bench_features_compact,
+    "features_panel": bench_features_panel,
+    "streaming": bench_streaming,
+    "pipeline": bench_pipeline,
+    "inference": bench_inference,
+}
+
+
+def _run_stage(stage: str, params: dict, workdir: str) -> dict:
+    """
+    Punto de entrada del proceso worker: ejecuta una etapa y agrega CPU y pico de RSS.
+    """
+    import logging
+    import warnings
+
+    os.chdir(workdir)
+    warnings.filterwarnings("ignore")
+    logging.disable(logging.WARNING)
+
+    cpu_start = time.process_time()
+    wall_start = time.perf_counter()
+    result = BENCHMARKS[stage](params)
+    result["wall_seconds"] = time.perf_counter() - wall_start
+    result["cpu_seconds"] = time.process_time() - cpu_start
+    # ru_maxrss está en KB en Linux y en bytes en macOS
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    result["peak_rss_mb"] = max_rss / (1024 * 1024 if sys.platform == "darwin" else 1024)
+    return result
+
+
+# ----------------------------------------------------------------------
+# Orquestación
+# ----------------------------------------------------------------------
+def _git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                              text=True, cwd=ROOT, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def run_stage(stage: str, params: dict) -> dict:
+    workdir = tempfile.mkdtemp(prefix=f"bench_{stage}_")
+    try:
+        context = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+            result = executor.submit(_run_stage, stage, params, workdir).result()
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    measured = result["timings"][result["measured"]]
+    result["bars_per_s"] = result["bars"] / measured if measured > 0 else None
+    return result
+
+
+def compare(report: dict, baseline: dict, tolerance: float) -> list:
+    """
+    Etapas cuyo throughput cayó más de `tolerance` respecto a la línea base.
+    """
+    regressions = []
+    for stage, result in report["stages"].items():
+        previous = baseline.get("stages", {}).get(stage)
+        if not previous or not previous.get("bars_per_s") or not result.get("bars_per_s"):
+            continue
+        ratio = result["bars_per_s"] / previous["bars_per_s"]
+        result["vs_baseline"] = round(ratio, 3)
+        if ratio < 1 - tolerance:
+            regressions.append(f"{stage}: {result['bars_per_s']:,.0f} barras/s vs "
+                               f"{previous['bars_per_s']:,.0f} ({ratio - 1:+.0%})")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--bars", type=int, default=1_000_000, help="Barras totales (repartidas entre símbolos)")
+    parser.add_argument("--symbols", type=int, default=1)
+    parser.add_argument("--freq", default="min", help="Frecuencia de las barras sintéticas (pandas)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--stages", default=",".join(STAGES))
+    parser.add_argument("--parse-bars", type=int, default=200_000, help="Barras por símbolo para 'parse'")
+    parser.add_argument("--stream-bars", type=int, default=50_000, help="Barras por símbolo para 'streaming'")
+    parser.add_argument("--inference-train-bars", type=int, default=5_000)
+    parser.add_argument("--inference-calls", type=int, default=500)
+    parser.add_argument("--baseline", help="JSON de una corrida anterior para detectar regresiones")
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    parser.add_argument("--output", help="Ruta del JSON (por defecto benchmarks/results/bench_<commit>_<ts>.json)")
+    args = parser.parse_args()
+
+    stages = [s.strip() for s in args.stages.split(",") if s.strip()]
+    unknown = sorted(set(stages) - set(STAGES))
+    if unknown:
+        parser.error(f"Etapas desconocidas: {unknown}. Opciones: {', '.join(STAGES)}")
+
+    params = {
+        "symbols": args.symbols,
+        "bars_per_symbol": args.bars // args.symbols,
+        "parse_bars": min(args.parse_bars, args.bars // args.symbols),
+        "stream_bars": min(args.stream_bars, args.bars // args.symbols),
+        "inference_train_bars": args.inference_train_bars,
+        "inference_calls": args.inference_calls,
+        "freq": args.freq,
+        "seed": args.seed,
+    }
+    if "pipeline" in stages:
+        import pandas as pd
+        from synthetic import DEFAULT_END
+
+        first = pd.date_range(end=DEFAULT_END, periods=params["bars_per_symbol"], freq=args.freq)[0]
+        if first.year >= 2024:
+            parser.error(f"La etapa 'pipeline' necesita historia anterior a 2024 (empieza en {first:%Y-%m-%d}): "
+                         f"aumentar --bars o usar una --freq mayor")
+
+    commit = _git_commit()
+    report = {
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "commit": commit,
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "params": params,
+        "stages": {},
+    }
+
+    print(f"Benchmarks sobre {args.bars:,} barras sintéticas ({args.symbols} símbolos, freq={args.freq})")
+    for stage in stages:
+        try:
+            result = run_stage(stage, params)
+        except Exception as e:
+            print(f"{stage:<16} ERROR: {e}")
+            report["stages"][stage] = {"error": str(e)}
+            continue
+        report["stages"][stage] = result
+        print(f"{stage:<16} {result['bars']:>12,} barras  {result['bars_per_s']:>14,.0f} barras/s  "
+              f"RSS {result['peak_rss_mb']:8.1f} MB  CPU {result['cpu_seconds']:7.2f} s")
+        for name, seconds in result["timings"].items():
+            print(f"    {name:<20} {seconds:9.3f} s")
+        if "latency_ms" in result:
+            print(f"    latencia {result['latency_ms']}")
+
+    regressions = []
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(report, json.load(f), args.tolerance)
+        report["baseline"] = args.baseline
+
+    timestamp = datetime.now().strftime("%Y-%m-%d_%H%M%S")
+    output = args.output or os.path.join(RESULTS_DIR, f"bench_{commit}_{timestamp}.json")
+    os.makedirs(os.path.dirname(output), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(report, f, indent=4)
+    print(f"Resultados guardados en {output}")
+
+    failed = [s for s, r in report["stages"].items() if "error" in r]
+    if regressions:
+        print("Regresiones de throughput:")
+        for regression in regressions:
+            print(f"  - {regression}")
+    return 1 if regressions or failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,92 @@
+"""
+Generador determinístico de historia OHLC sintética para benchmarks.
+
+Los precios siguen un random walk geométrico por símbolo (semilla derivada del
+símbolo + semilla base), con fechas ancladas al final de 2024 para que el split
+train/test del pipeline (años < 2024 / 2024) tenga datos en ambos lados.
+Se genera por bloques, arrastrando el último cierre, para poder producir de
+1M a 100M barras sin materializarlas todas a la vez.
+"""
+import json
+import zlib
+
+import numpy as np
+import pandas as pd
+
+
+DEFAULT_END = "2024-12-31 23:59"
+CHUNK_SIZE = 5_000_000
+# Volatilidad por barra, independiente de la frecuencia: con el umbral de ±0.1%
+# del target las tres clases quedan representadas
+VOLATILITY = 0.0015
+
+
+def symbol_seed(symbol: str, seed: int = 42) -> int:
+    return (zlib.crc32(symbol.encode()) + seed) % (2 ** 32)
+
+
+def symbol_names(n_symbols: int) -> list:
+    """
+    Nombres de pares determinísticos: EURGBP, USDJPY, ... y luego SYN000, SYN001, ...
+    """
+    base = ["EURGBP", "USDJPY", "EURUSD", "GBPUSD", "AUDUSD", "USDCHF", "USDCAD", "NZDUSD"]
+    return (base + [f"SYN{i:03d}" for i in range(max(0, n_symbols - len(base)))])[:n_symbols]
+
+
+def iter_chunks(n_bars: int, symbol: str = "EURGBP", seed: int = 42, freq: str = "min",
+                end: str = DEFAULT_END, chunk_size: int = CHUNK_SIZE, volatility: float = VOLATILITY):
+    """
+    Genera la historia de un símbolo en DataFrames de hasta chunk_size barras
+    (columnas timestamp, open, high, low, close, date), en orden cronológico.
+    """
+    rng = np.random.default_rng(symbol_seed(symbol, seed))
+    dates = pd.date_range(end=end, periods=n_bars, freq=freq)
+    last_close = 0.5 + rng.random() * 1.5
+    for start in range(0, n_bars, chunk_size):
+        n = min(chunk_size, n_bars - start)
+        log_returns = rng.normal(0.0, volatility, n)
+        close = last_close * np.exp(np.cumsum(log_returns))
+        open_ = np.concatenate(([last_close], close[:-1]))
+        spread = np.abs(rng.normal(0.0, volatility, (2, n)))
+        high = np.maximum(open_, close) * (1 + spread[0])
+        low = np.minimum(open_, close) * (1 - spread[1])
+        last_close = close[-1]
+
+        chunk_dates = dates[start:start + n]
+        yield pd.DataFrame({
+            "timestamp": chunk_dates.strftime("%Y-%m-%d %H:%M:%S"),
+            "open": open_,
+            "high": high,
+            "low": low,
+            "close": close,
+            "date": chunk_dates,
+        })
+
+
+def generate_ohlc(n_bars: int, symbol: str = "EURGBP", seed: int = 42, freq: str = "min",
+                  end: str = DEFAULT_END) -> pd.DataFrame:
+    """
+    Historia completa de un símbolo en un solo DataFrame.
+    """
+    return pd.concat(list(iter_chunks(n_bars, symbol, seed, freq, end)), ignore_index=True)
+
+
+def generate_panel(n_symbols: int, bars_per_symbol: int, seed: int = 42, freq: str = "min",
+                   end: str = DEFAULT_END):
+    """
+    Itera (symbol, DataFrame) para un universo de símbolos.
+    """
+    for symbol in symbol_names(n_symbols):
+        yield symbol, generate_ohlc(bars_per_symbol, symbol, seed, freq, end)
+
+
+def to_alpha_vantage_json(df: pd.DataFrame, key: str = "Time Series FX (Daily)") -> str:
+    """
+    Serializa un DataFrame OHLC con el formato de respuesta de Alpha Vantage
+    (más reciente primero, con indent=4 como la API), para medir el parseo sin red.
+    """
+    series = {}
+    for ts, o, h, l, c in zip(df["timestamp"][::-1], df["open"][::-1], df["high"][::-1],
+                              df["low"][::-1], df["close"][::-1]):
+        series[ts] = {"1. open": f"{o:.5f}", "2. high": f"{h:.5f}", "3. low": f"{l:.5f}", "4. close": f"{c:.5f}"}
+    return json.dumps({"Meta Data": {"1. Information": "synthetic"}, key: series}, indent=4)
@@ -1,63 +1,321 @@
-from modules.data.fetch_data import FetchData
-from modules.data.pre_processing import ForexFeatureEngineer
-from modules.data.upload_feature_store import FeatureStoreManager
 import argparse
 
+# Los subsistemas se importan dentro de cada comando: --inference no paga
+# el costo de importar el stack de entrenamiento (sklearn, ta, pyarrow).
 
 
-from modules.model.pipe import PipelineRunner
+def modeling(compact=False, backend='pandas', symbols=("EURGBP", "USDJPY"), model=None, use_cache=True):
+    import os
+    import pandas as pd
+    from modules.data import feature_graph, pre_processing, pre_processing_polars, rolling_regression
+    from modules.data import streaming_features
+    from modules.data.fetch_data import FetchData
+    from modules.data.pre_processing import ForexFeatureEngineer
+    from modules.data.raw_store import RawHistoryStore, drop_open_bar
+    from modules.data.response_cache import next_daily_close
+    from modules.data.upload_feature_store import FeatureStoreManager
+    from modules.data.streaming_features import StreamingFeatureEngine
+    from modules.model import multi_symbol, pipe, pre_processor, registry, tester, trainer
+    from modules.model.pipe import PipelineRunner
+    from modules.model.registry import ModelRegistry
+    from modules.utils.stage_cache import StageCache, code_version, fingerprint, hash_frame, model_config
+    from modules.utils.tracing import Tracer, set_tracer
 
-def modeling():
-    fetcher = FetchData()
+    # Spans por etapa: artifacts/traces/spans.jsonl y artifacts/traces/modeling.prom
+    tracer = set_tracer(Tracer(run_name="modeling"))
+    # Cada etapa se reutiliza si no cambió su fingerprint (artifacts/stage_cache/manifest.json)
+    cache = StageCache(enabled=use_cache)
+    try:
+        fetcher = FetchData()
+        store_manager = FeatureStoreManager(".")
+        symbols = [symbol.upper() for symbol in symbols]
+        # Las barras cerradas de FX_DAILY solo cambian con el cierre diario: hasta entonces no se
+        # vuelve a ingerir. La barra del día en curso (cierre parcial) se descarta de todas las etapas
+        period = next_daily_close().isoformat()
+
+        raw, raw_hashes = {}, {}
+        for symbol in symbols:
+            name = f"{symbol[:3].lower()}_{symbol[3:].lower()}_daily"
+            raw_store = RawHistoryStore(name, fetcher.raw_storage_root)
+
+            # Ingesta incremental: solo 'compact' + upsert sobre el histórico crudo
+            with tracer.span("fetch", symbol=symbol) as span:
+                key = fingerprint(symbol=symbol, function="FX_DAILY", period=period, segments=raw_store.version())
+                if cache.lookup("fetch", key, scope=symbol):
+                    df = raw_store.load()
+                else:
+                    df = fetcher.ingest_incremental(
+                        from_symbol=symbol[:3],
+                        to_symbol=symbol[3:],
+                        function="FX_DAILY",
+                        name=name
+                    )
+                    key = fingerprint(symbol=symbol, function="FX_DAILY", period=period,
+                                      segments=raw_store.version())
+                    cache.store("fetch", key, {"raw": raw_store.store_dir}, scope=symbol)
+                df = drop_open_bar(df).reset_index(drop=True)
+                span.rows = len(df)
+                span.attributes["cache"] = cache.manifest[-1]["status"]
+            raw[symbol] = df
+            raw_hashes[symbol] = hash_frame(df)
+
+            # Estado incremental de features para la inferencia diaria (sin warm-up de 90 barras)
+            with tracer.span("feature_state", rows=len(df), symbol=symbol) as span:
+                key = fingerprint(raw=raw_hashes[symbol], code=code_version(streaming_features))
+                outputs = cache.lookup("feature_state", key, scope=symbol,
+                                       validate=lambda o: os.path.exists(o["state"]))
+                if outputs is None:
+                    outputs = {"state": StreamingFeatureEngine.from_history(df, symbol=symbol, date_column="date").save()}
+                    cache.store("feature_state", key, outputs, scope=symbol)
+                span.attributes["cache"] = cache.manifest[-1]["status"]
+                print("Estado de features guardado en:", outputs["state"])
+
+        # Pre Procesado de datos + feature store (una versión con todos los pares)
+        features_key = fingerprint(
+            raw=raw_hashes,
+            code=code_version(pre_processing, pre_processing_polars, feature_graph, rolling_regression),
+            backend=backend,
+            compact=compact,
+        )
+        df_features = None
+        outputs = cache.lookup("features", features_key, validate=lambda o: os.path.isdir(o["version_dir"]))
+        if outputs is None:
+            # compact: float32/int8/categóricas sin copias intermedias (ver check_compact_precision)
+            # backend 'graph': solo los nodos que cambiaron se recalculan (artifacts/feature_cache)
+            engineer = ForexFeatureEngineer(backend=backend, compact=compact)
+            frames = []
+            for symbol in symbols:
+                with tracer.span("features", rows=len(raw[symbol]), symbol=symbol):
+                    df_features = engineer.prepare_features(raw[symbol], date_column='timestamp')
+                    df_features["symbol"] = symbol
+                    frames.append(df_features)
+            df_features = pd.concat(frames, ignore_index=True)
+            del frames
+
+            with tracer.span("store_save", rows=len(df_features)):
+                outputs = {"version_dir": store_manager.save_features(df_features)}
+            cache.store("features", features_key, outputs)
+        del raw
+        file = outputs["version_dir"]
+
+        print("Guardado en:", file)
+
+        # Un modelo por par: se reentrena solo si cambian las features, el modelo o el código
+        model_registry = ModelRegistry()
+        pipeline_key = fingerprint(
+            features=features_key,
+            model=model_config(model),
+            code=code_version(trainer, tester, pipe, multi_symbol, pre_processor, registry),
+            symbols=symbols,
+        )
+
+        def trained(o):
+            return os.path.exists(o["report"]) and all(
+                os.path.exists(model_registry.object_path(entry[kind]))
+                for entry in o["entries"].values() for kind in ("model", "scaler")
+            )
+
+        outputs = cache.lookup("pipeline", pipeline_key, validate=trained)
+        if outputs is not None:
+            model_registry.set_aliases(outputs["entries"])
+            report = pd.read_csv(outputs["report"])
+            print(f"Modelos sin cambios para {sorted(outputs['entries'])}; reporte en {outputs['report']}")
+        else:
+            if df_features is None:
+                with tracer.span("store_load", version=file) as span:
+                    df_features = pd.concat([
+                        store_manager.load_specific_version(os.path.basename(file), symbols=symbol).assign(symbol=symbol)
+                        for symbol in symbols
+                    ], ignore_index=True)
+                    span.rows = len(df_features)
+
+            # FIX tiene 1 valor null que debe ser por el shift --> arreglar
+            df_features.fillna(0, inplace=True)
+            training_piper = PipelineRunner(df_features, model_class=model, feature_version=file)
+
+            # Un modelo por par, en paralelo; los pares que fallan quedan en el reporte
+            with tracer.span("pipeline", rows=len(df_features)):
+                report = training_piper.run_symbols()
+            if (report["status"] != "ok").all():
+                raise RuntimeError("No se pudo entrenar ningún par")
 
-    df = fetcher.fetch_raw_data(
-        from_symbol="EUR",
-        to_symbol="GBP",
-        function="FX_DAILY",
-        outputsize="full", 
-        datatype="json"
-    )
+            entries = {symbol: model_registry.get_entry(symbol)
+                       for symbol in report.loc[report["status"] == "ok", "symbol"]}
+            # Solo se cachea una corrida sin fallas (un par con error se reintenta la próxima vez)
+            if len(entries) == len(report):
+                cache.store("pipeline", pipeline_key, {"report": report.attrs["report_path"], "entries": entries})
+        return report
+    finally:
+        print("Manifest de cache de etapas:", cache.save_manifest(), cache.stats())
+        print("Trazas guardadas en:", ", ".join(tracer.export()))
 
 
-    fetcher.store_raw_data(df, name="eur_gbp_daily")
+def intraday_features(symbols, interval, memory_budget_mb, compact=False):
+    from modules.data.fetch_data import FetchData
+    from modules.data.chunked_features import ChunkedFeatureProcessor
+    from modules.data.pre_processing import ForexFeatureEngineer
+    from modules.data.raw_store import RawHistoryStore
+    from modules.data.upload_feature_store import FeatureStoreManager
 
-    # Pre Procesado de datos
-    engineer = ForexFeatureEngineer()
-    df_features = engineer.prepare_features(df, date_column='timestamp')
+    fetcher = FetchData()
 
+    # Ingesta incremental por par sin cargar el histórico en memoria
+    sources = {}
+    for symbol in symbols:
+        symbol = symbol.upper()
+        name = f"{symbol[:3].lower()}_{symbol[3:].lower()}_intraday_{interval}"
+        fetcher.ingest_incremental(symbol[:3], symbol[3:], function="FX_INTRADAY", name=name,
+                                   interval=interval, load_history=False)
+        sources[symbol] = RawHistoryStore(name, fetcher.raw_storage_root)
 
+    # Features por bloques con solape, escritos directo al feature store
+    processor = ChunkedFeatureProcessor(ForexFeatureEngineer(compact=compact), memory_budget_mb=memory_budget_mb)
     store_manager = FeatureStoreManager(".")
-    file=store_manager.save_features(df_features)
+    return processor.process_many(sources, store_manager, name=f"forex_features_{interval}")
+
+
+def panel_features(symbols, backend='polars', compact=False):
+    from modules.data.fetch_data import FetchData
+    from modules.data.pre_processing import ForexFeatureEngineer
+    from modules.data.panel_features import PanelFeatureProcessor
+    from modules.data.upload_feature_store import FeatureStoreManager
+
+    fetcher = FetchData()
+
+    # Histórico diario por par (incremental) en un único panel largo
+    frames = {}
+    for symbol in symbols:
+        symbol = symbol.upper()
+        frames[symbol] = fetcher.ingest_incremental(
+            from_symbol=symbol[:3],
+            to_symbol=symbol[3:],
+            function="FX_DAILY",
+            name=f"{symbol[:3].lower()}_{symbol[3:].lower()}_daily"
+        )
 
+    # Todos los pares en una sola pasada agrupada (polars) o repartidos en procesos
+    processor = PanelFeatureProcessor(ForexFeatureEngineer(backend=backend, compact=compact), date_column="timestamp")
+    df_features = processor.process(PanelFeatureProcessor.from_frames(frames))
+
+    store_manager = FeatureStoreManager(".")
+    file = store_manager.save_features(df_features)
     print("Guardado en:", file)
+    return file
+
 
-    # FIX tiene 1 valor null que debe ser por el shift --> arreglar 
+def _latest_features_runner():
+    from modules.data.upload_feature_store import FeatureStoreManager
+    from modules.model.pipe import PipelineRunner
+    from modules.utils.tracing import get_tracer
+
+    # Reutiliza la última versión del feature store (sin volver a descargar ni procesar)
+    store_manager = FeatureStoreManager(".")
+    version = store_manager.list_feature_versions()[0]
+    with get_tracer().span("store_load", version=version) as span:
+        df_features = store_manager.load_specific_version(version, symbols="EURGBP")
+        span.rows = len(df_features)
     df_features.fillna(0, inplace=True)
-    training_piper = PipelineRunner(df_features)
 
-    training_piper.run()
+    return PipelineRunner(df_features, feature_version=version)
+
 
+def backtest(n_folds, mode, train_years):
+    from modules.utils.tracing import Tracer, set_tracer
 
-def inference():
-    # Los pasos que deben pasar en la inferencia: 
-    # Tomar los datos desde la ultima fecha desde la api --> PredictionDataFetcher esta clase la hice pero no se si es la correcta
-    # preprocesar para dejarlo limpio usando las feaures para preparar la data 
+    tracer = set_tracer(Tracer(run_name="backtest"))
+    try:
+        runner = _latest_features_runner()
+        with tracer.span("backtest", rows=len(runner.df), folds=n_folds, mode=mode):
+            return runner.backtest(n_folds=n_folds, mode=mode, train_years=train_years)
+    finally:
+        tracer.export()
 
-    # pasarlo por el ss guardado 
-    # pasarlo por el model para que guarde las predicciones 
 
-    # recorda que las fechas se deben correr en el horario que habian pasado que creo que era entre la 1 y 4 
-    pass
+def search(n_samples, n_folds):
+    from modules.utils.tracing import Tracer, set_tracer
+
+    tracer = set_tracer(Tracer(run_name="search"))
+    try:
+        runner = _latest_features_runner()
+        with tracer.span("search", rows=len(runner.df), folds=n_folds):
+            return runner.search(n_samples=n_samples, n_folds=n_folds)
+    finally:
+        tracer.export()
+
+
+def inference(symbols, force=False, online=False):
+    from modules.model.inference import InferenceService
+
+    # Carga modelos, scalers y estado de features una sola vez y predice todos los pares en batch
+    # online: las barras con T+1 ya cerrado actualizan modelo y scaler (partial_fit) antes de predecir
+    service = InferenceService(symbols=symbols, online=online)
+    results = service.predict_latest(force=force)
+    service.save_state()
+
+    path = service.save_predictions(results)
+    for r in results:
+        print(r)
+    print("Predicciones guardadas en:", path)
+    print("Latencia:", service.latency_stats())
+    return results
+
+
+def serve(symbols, host, port):
+    from modules.model.inference import InferenceService
+
+    # Servicio residente: modelos en memoria y predicciones por HTTP local
+    service = InferenceService(symbols=symbols)
+    service.serve(host=host, port=port)
+
+
+def schedule(symbols, online=False):
+    import signal
+    from modules.model.inference import InferenceService
+    from modules.model.scheduler import PredictionScheduler
+
+    # Daemon: modelos y estado en memoria; cada ventana 01-04 UTC solo descarga y predice
+    service = InferenceService(symbols=symbols, online=online)
+    scheduler = PredictionScheduler(service)
+    signal.signal(signal.SIGTERM, lambda *_: scheduler.stop())
+    try:
+        scheduler.run_forever()
+    except KeyboardInterrupt:
+        scheduler.stop()
 
 
 def main(args):
 
     if args.train_model:
-        modeling()
+        modeling(compact=args.compact_features, backend=args.feature_backend, symbols=args.symbols,
+                 use_cache=not args.no_stage_cache)
         return 
 
+    if args.backtest:
+        backtest(args.folds, args.backtest_mode, args.train_years)
+        return
+
+    if args.search:
+        search(args.search_samples, args.folds)
+        return
+
+    if args.intraday:
+        intraday_features(args.symbols, args.interval, args.memory_budget_mb, compact=args.compact_features)
+        return
+
+    if args.panel:
+        panel_features(args.symbols, backend=args.panel_backend, compact=args.compact_features)
+        return
+
     if args.inference:
-        inference()
+        inference(args.symbols, force=args.force, online=args.online)
+        return
+
+    if args.schedule:
+        schedule(args.symbols, online=args.online)
+        return
+
+    if args.serve:
+        serve(args.symbols, args.host, args.port)
         return
     
 
@@ -67,7 +325,34 @@ if __name__ == "__main__":
 
     parser = argparse.ArgumentParser()
     parser.add_argument("--train-model", action="store_true", help="Ejecuta el entrenamiento del modelo")
+    parser.add_argument("--backtest", action="store_true", help="Ejecuta el backtest walk-forward")
+    parser.add_argument("--folds", type=int, default=5, help="Cantidad de años de test del backtest")
+    parser.add_argument("--backtest-mode", choices=["expanding", "rolling"], default="expanding")
+    parser.add_argument("--train-years", type=int, default=None, help="Años de train en modo rolling")
+    parser.add_argument("--search", action="store_true", help="Búsqueda de modelos e hiperparámetros")
+    parser.add_argument("--search-samples", type=int, default=None, help="Muestra aleatoria de candidatos")
+    parser.add_argument("--intraday", action="store_true", help="Ingesta FX_INTRADAY y features por bloques")
+    parser.add_argument("--interval", choices=["1min", "5min", "15min", "30min", "60min"], default="1min")
+    parser.add_argument("--memory-budget-mb", type=float, default=1024, help="Memoria por bloque de features")
+    parser.add_argument("--compact-features", action="store_true",
+                        help="Features en float32/int8 sin copias intermedias (menos memoria)")
+    parser.add_argument("--feature-backend", choices=["pandas", "polars", "graph"], default="pandas",
+                        help="Motor de features del entrenamiento ('graph' memoiza cada feature)")
+    parser.add_argument("--no-stage-cache", action="store_true",
+                        help="Recalcula todas las etapas del entrenamiento aunque sus entradas no cambiaron")
+    parser.add_argument("--panel", action="store_true", help="Features de todos los pares de --symbols en un panel")
+    parser.add_argument("--panel-backend", choices=["pandas", "polars", "graph"], default="polars",
+                        help="'polars': una pasada agrupada por símbolo; 'pandas'/'graph': símbolos repartidos en procesos")
     parser.add_argument("--inference", action="store_true", help="Ejecuta la inferencia")
+    parser.add_argument("--serve", action="store_true", help="Levanta el servicio de inferencia HTTP")
+    parser.add_argument("--schedule", action="store_true",
+                        help="Scheduler residente: predice cada día en la ventana 01-04 UTC")
+    parser.add_argument("--symbols", nargs="+", default=["EURGBP", "USDJPY"], help="Pares a entrenar / predecir")
+    parser.add_argument("--online", action="store_true",
+                        help="Con --inference / --schedule: actualiza cada día modelo y scaler con partial_fit")
+    parser.add_argument("--force", action="store_true", help="Ignora la ventana horaria 01-04 UTC")
+    parser.add_argument("--host", default="127.0.0.1", help="Host del servicio de inferencia")
+    parser.add_argument("--port", type=int, default=8080, help="Puerto del servicio de inferencia")
     args = parser.parse_args()
 
     main(args)
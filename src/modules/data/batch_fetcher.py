@@ -0,0 +1,177 @@
+import os
+import time
+import random
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import numpy as np
+import requests
+
+from modules.data.fetch_data import FetchData, ApiRateLimitError, build_session
+
+
+class TokenBucket:
+    """
+    Limitador token-bucket thread-safe.
+
+    `rate` tokens por `per` segundos, con ráfaga máxima `capacity`.
+    acquire() bloquea hasta que haya un token disponible.
+    """
+
+    def __init__(self, rate: int, per: float = 60.0, capacity: int = None):
+        self.rate = rate
+        self.per = per
+        self.capacity = capacity or rate
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate / self.per)
+        self.updated = now
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                self._refill()
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) * self.per / self.rate
+            time.sleep(wait)
+
+
+class LatencyStats:
+    """
+    Registro thread-safe de latencias por request.
+    """
+
+    def __init__(self):
+        self.latencies = []
+        self.retries = 0
+        self.errors = 0
+        self._lock = threading.Lock()
+
+    def record(self, seconds: float):
+        with self._lock:
+            self.latencies.append(seconds)
+
+    def record_retry(self):
+        with self._lock:
+            self.retries += 1
+
+    def record_error(self):
+        with self._lock:
+            self.errors += 1
+
+    def summary(self) -> dict:
+        with self._lock:
+            values = np.array(self.latencies)
+            if values.size == 0:
+                return {"requests": 0, "retries": self.retries, "errors": self.errors}
+            return {
+                "requests": int(values.size),
+                "retries": self.retries,
+                "errors": self.errors,
+                "p50_s": float(np.percentile(values, 50)),
+                "p95_s": float(np.percentile(values, 95)),
+                "max_s": float(values.max()),
+                "total_s": float(values.sum()),
+            }
+
+
+class BatchFetcher:
+    """
+    Descarga concurrente de varios pares / funciones de Alpha Vantage.
+
+    - Un pool de threads comparte una única requests.Session (conexiones reutilizadas).
+    - Un token-bucket respeta la cuota por minuto de la API (API_REQUESTS_PER_MINUTE).
+    - Reintentos con backoff exponencial + jitter ante errores de red, 429/5xx
+      y avisos de límite de la API.
+    - Latencia por request (p50/p95/max) en self.stats.
+    """
+
+    RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+
+    def __init__(self, fetcher: FetchData = None, max_workers: int = 4, requests_per_minute: int = None,
+                 max_retries: int = 3, backoff: float = 2.0):
+        requests_per_minute = requests_per_minute or int(os.getenv("API_REQUESTS_PER_MINUTE", "5"))
+
+        self.fetcher = fetcher or FetchData(session=build_session(max_workers))
+        self.max_workers = max_workers
+        self.limiter = TokenBucket(rate=requests_per_minute, per=60.0)
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.stats = LatencyStats()
+
+    def _is_retryable(self, error: Exception) -> bool:
+        if isinstance(error, ApiRateLimitError):
+            return True
+        if isinstance(error, requests.HTTPError):
+            return error.response is not None and error.response.status_code in self.RETRYABLE_STATUS
+        return isinstance(error, (requests.ConnectionError, requests.Timeout))
+
+    def _fetch_one(self, from_symbol: str, to_symbol: str, function: str, outputsize: str, datatype: str,
+                   interval: str = None):
+        for attempt in range(self.max_retries + 1):
+            self.limiter.acquire()
+            start = time.perf_counter()
+            try:
+                df = self.fetcher.fetch_raw_data(
+                    from_symbol=from_symbol,
+                    to_symbol=to_symbol,
+                    function=function,
+                    outputsize=outputsize,
+                    datatype=datatype,
+                    interval=interval,
+                )
+                self.stats.record(time.perf_counter() - start)
+                return df
+            except Exception as e:
+                self.stats.record(time.perf_counter() - start)
+                if attempt == self.max_retries or not self._is_retryable(e):
+                    self.stats.record_error()
+                    raise
+                self.stats.record_retry()
+                delay = self.backoff ** attempt + random.uniform(0, 1)
+                logging.warning(f"{from_symbol}/{to_symbol} {function}: {e}. Reintento {attempt + 1} en {delay:.1f}s")
+                time.sleep(delay)
+
+    def fetch_many(self, pairs: list, functions=("FX_DAILY",), outputsize: str = "full",
+                   datatype: str = "json", interval: str = None):
+        """
+        Descarga todas las combinaciones par x función en paralelo.
+
+        Args:
+            pairs: Lista de pares como tuplas ("EUR", "GBP") o strings "EURGBP"
+            interval: Resolución para FX_INTRADAY (ej. '1min')
+
+        Returns:
+            (results, failures): dicts indexados por (from_symbol, to_symbol, function)
+            con el DataFrame descargado o la excepción final, respectivamente.
+        """
+        tasks = []
+        for pair in pairs:
+            from_symbol, to_symbol = (pair[:3], pair[3:]) if isinstance(pair, str) else pair
+            for function in functions:
+                tasks.append((from_symbol, to_symbol, function))
+
+        results, failures = {}, {}
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            futures = {
+                executor.submit(self._fetch_one, f, t, fn, outputsize, datatype, interval): (f, t, fn)
+                for f, t, fn in tasks
+            }
+            for future in as_completed(futures):
+                key = futures[future]
+                try:
+                    results[key] = future.result()
+                except Exception as e:
+                    logging.error(f"Fallo al descargar {key}: {e}")
+                    failures[key] = e
+
+        logging.info(f"Descarga batch finalizada: {len(results)} ok, {len(failures)} fallidas. "
+                     f"Latencias: {self.stats.summary()}")
+        return results, failures
@@ -0,0 +1,297 @@
+import os
+import json
+import hashlib
+import logging
+
+import numpy as np
+import pandas as pd
+
+from modules.data.rolling_regression import rolling_slope
+
+
+FEATURE_CACHE_DIR = "artifacts/feature_cache"
+
+# Columnas crudas que pueden ser entrada de un nodo ('date' sale de date_column)
+SOURCE_COLUMNS = ("open", "high", "low", "close", "volume", "date")
+
+
+def hash_array(values: np.ndarray) -> str:
+    """
+    Hash del contenido de una columna (dtype + forma + bytes).
+    """
+    values = np.ascontiguousarray(values)
+    digest = hashlib.sha256(f"{values.dtype.str}{values.shape}".encode())
+    digest.update(values.view(np.uint8))
+    return digest.hexdigest()
+
+
+class FeatureNode:
+    """
+    Feature declarada con sus entradas (columnas crudas u otros nodos) y parámetros.
+    `func` recibe las entradas como Series (en el orden de `inputs`) y los parámetros
+    como keywords; `version` se incrementa al cambiar la implementación para
+    invalidar los resultados cacheados.
+    """
+
+    def __init__(self, name: str, func, inputs, params: dict = None, version: int = 1):
+        self.name = name
+        self.func = func
+        self.inputs = tuple(inputs)
+        self.params = dict(params or {})
+        self.version = version
+
+    def key(self, input_keys: list) -> str:
+        payload = json.dumps({
+            "name": self.name,
+            "func": f"{self.func.__module__}.{self.func.__qualname__}",
+            "version": self.version,
+            "params": self.params,
+            "inputs": list(input_keys),
+        }, sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode()).hexdigest()
+
+    def __repr__(self):
+        params = ", ".join(f"{k}={v}" for k, v in self.params.items())
+        return f"{self.name} = {self.func.__name__}({', '.join(self.inputs)}{', ' if params else ''}{params})"
+
+
+class FeatureNodeCache:
+    """
+    Cache en disco de la salida de cada nodo (.npy por clave), con evicción LRU
+    por tamaño total usando el mtime como último acceso.
+    """
+
+    def __init__(self, cache_dir: str = FEATURE_CACHE_DIR, max_bytes: int = 2 * 1024 ** 3):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}.npy")
+
+    def get(self, key: str):
+        path = self._path(key)
+        try:
+            values = np.load(path, allow_pickle=False)
+        except (FileNotFoundError, ValueError, OSError):
+            return None
+        os.utime(path)
+        return values
+
+    def put(self, key: str, values: np.ndarray):
+        path = self._path(key)
+        tmp_path = f"{path}.tmp.npy"
+        np.save(tmp_path, np.asarray(values), allow_pickle=False)
+        os.replace(tmp_path, path)
+        self._evict()
+
+    def _evict(self):
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            if name.endswith(".npy") and ".tmp" not in name:
+                path = os.path.join(self.cache_dir, name)
+                stat = os.stat(path)
+                entries.append((stat.st_mtime, stat.st_size, path))
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            os.remove(path)
+            total -= size
+
+    def clear(self):
+        for name in os.listdir(self.cache_dir):
+            os.remove(os.path.join(self.cache_dir, name))
+
+
+class FeatureGraph:
+    """
+    Grafo de dependencias de features.
+
+    Cada feature es un FeatureNode con entradas explícitas, por ejemplo
+    SMA_crossover = sub(SMA_30, SMA_90). compute() resuelve solo los nodos que
+    necesitan las columnas pedidas (en orden topológico) y memoiza cada salida
+    por el hash de sus entradas y parámetros: dentro de la corrida en memoria y,
+    con `cache`, en disco entre corridas. Agregar o cambiar una feature solo
+    recalcula ese nodo y los que dependen de él.
+    """
+
+    def __init__(self, nodes=(), cache: FeatureNodeCache = None):
+        self.nodes = {}
+        self.cache = cache
+        self.hits = 0
+        self.misses = 0
+        for node in nodes:
+            self.nodes[node.name] = node
+
+    def add(self, name: str, func, inputs, version: int = 1, **params) -> FeatureNode:
+        node = FeatureNode(name, func, inputs, params, version)
+        self.nodes[name] = node
+        return node
+
+    def dependencies(self, targets, available=()) -> list:
+        """
+        Nodos necesarios para las columnas pedidas, en orden topológico.
+        Las columnas presentes en `available` (datos crudos) no se calculan.
+        """
+        order, visiting, done = [], set(), set(available)
+
+        def visit(name):
+            if name in done:
+                return
+            if name not in self.nodes:
+                raise KeyError(f"Feature '{name}' no está declarada en el grafo ni en los datos")
+            if name in visiting:
+                raise ValueError(f"Dependencia circular en '{name}'")
+            visiting.add(name)
+            for dependency in self.nodes[name].inputs:
+                visit(dependency)
+            visiting.discard(name)
+            done.add(name)
+            order.append(self.nodes[name])
+
+        for target in targets:
+            visit(target)
+        return order
+
+    def compute(self, df: pd.DataFrame, targets, date_column: str = "date") -> pd.DataFrame:
+        """
+        Calcula las columnas pedidas sobre df y las devuelve como DataFrame (mismo índice).
+        """
+        sources = {}
+        for column in SOURCE_COLUMNS:
+            source = date_column if column == "date" else column
+            if source in df.columns:
+                values = df[source]
+                if column == "date" and not pd.api.types.is_datetime64_any_dtype(values):
+                    values = pd.to_datetime(values)
+                sources[column] = values
+
+        values, keys = {}, {}
+        for node in self.dependencies(targets, available=sources):
+            for name in node.inputs:
+                if name not in values:
+                    values[name] = sources[name]
+                    keys[name] = hash_array(sources[name].to_numpy())
+
+            key = node.key([keys[name] for name in node.inputs])
+            cached = self.cache.get(key) if self.cache is not None else None
+            if cached is not None and len(cached) == len(df):
+                self.hits += 1
+                result = pd.Series(cached, index=df.index, name=node.name)
+            else:
+                self.misses += 1
+                result = node.func(*(values[name] for name in node.inputs), **node.params)
+                result = pd.Series(np.asarray(result), index=df.index, name=node.name)
+                if self.cache is not None:
+                    self.cache.put(key, result.to_numpy())
+            values[node.name] = result
+            keys[node.name] = key
+
+        for target in targets:
+            if target not in values:
+                values[target] = sources[target]
+        logging.info(f"FeatureGraph: {len(targets)} columnas, {self.hits} hits / {self.misses} calculados")
+        return pd.DataFrame({target: values[target] for target in targets}, index=df.index)
+
+
+# ----------------------------------------------------------------------
+# Funciones de los nodos (mismos cálculos que ForexFeatureEngineer)
+# ----------------------------------------------------------------------
+def synthetic_volume(high, low, close):
+    return ((high - low) / close) * 1000000
+
+
+def sma(series, window):
+    import ta
+    return ta.trend.sma_indicator(series, window=window)
+
+
+def rsi(series, window):
+    import ta
+    return ta.momentum.rsi(series, window=window)
+
+
+def atr(high, low, close, window):
+    import ta
+    return ta.volatility.average_true_range(high, low, close, window=window)
+
+
+def subtract(a, b):
+    return a - b
+
+
+def divide(a, b):
+    return a / b
+
+
+def pct_change(series):
+    return series.pct_change()
+
+
+def rolling_std(series, window):
+    return series.rolling(window=window).std()
+
+
+def rolling_mean(series, window):
+    return series.rolling(window=window).mean()
+
+
+def slope(series, window):
+    return rolling_slope(series, window=window)
+
+
+def forward_return(close, periods):
+    return close.shift(-periods) / close - 1
+
+
+def ternary_target(returns, threshold):
+    # 0 = down, 1 = neutral, 2 = up (mismo mapeo que create_target)
+    return np.select([returns > threshold, returns < -threshold], [2, 0], default=1)
+
+
+def calendar_field(date, field):
+    if field == "is_month_end":
+        return date.dt.is_month_end.astype(int)
+    return getattr(date.dt, field)
+
+
+def cyclical(values, period, wave):
+    return getattr(np, wave)(2 * np.pi * values / period)
+
+
+def build_default_graph(cache: FeatureNodeCache = None) -> FeatureGraph:
+    """
+    Grafo con las features de ForexFeatureEngineer.get_feature_columns(),
+    el retorno T+1 y el target codificado.
+    """
+    graph = FeatureGraph(cache=cache)
+    graph.add("volume", synthetic_volume, ["high", "low", "close"])
+
+    graph.add("SMA_30", sma, ["close"], window=30)
+    graph.add("SMA_90", sma, ["close"], window=90)
+    graph.add("SMA_crossover", subtract, ["SMA_30", "SMA_90"])
+    graph.add("sma_ratio", divide, ["SMA_30", "SMA_90"])
+    graph.add("RSI", rsi, ["close"], window=14)
+    graph.add("ATR", atr, ["high", "low", "close"], window=14)
+
+    graph.add("return_t", pct_change, ["close"])
+    graph.add("volatility_30d", rolling_std, ["return_t"], window=30)
+    graph.add("volatility_rolling", rolling_std, ["return_t"], window=10)
+
+    graph.add("volume_ma_30", rolling_mean, ["volume"], window=30)
+    graph.add("volume_ratio", divide, ["volume", "volume_ma_30"])
+    graph.add("volume_trend", slope, ["volume"], window=5)
+
+    graph.add("month", calendar_field, ["date"], field="month")
+    graph.add("quarter", calendar_field, ["date"], field="quarter")
+    graph.add("day_of_week", calendar_field, ["date"], field="dayofweek")
+    graph.add("is_month_end", calendar_field, ["date"], field="is_month_end")
+    graph.add("month_sin", cyclical, ["month"], period=12, wave="sin")
+    graph.add("month_cos", cyclical, ["month"], period=12, wave="cos")
+    graph.add("day_sin", cyclical, ["day_of_week"], period=7, wave="sin")
+    graph.add("day_cos", cyclical, ["day_of_week"], period=7, wave="cos")
+
+    graph.add("return_t1", forward_return, ["close"], periods=1)
+    graph.add("target_encoded", ternary_target, ["return_t1"], threshold=0.001)
+    return graph
@@ -1,8 +1,54 @@
 import os
+import json
 import requests
 import pandas as pd
 from datetime import datetime
 from dotenv import load_dotenv
+from requests.adapters import HTTPAdapter
+
+from modules.data.payload_parser import parse_payload
+from modules.data.response_cache import ResponseCache
+from modules.data.raw_store import RawHistoryStore
+
+
+# Clave de la serie en la respuesta JSON según el endpoint
+SERIES_KEYS = {
+    "FX_DAILY": "Time Series FX (Daily)",
+    "FX_WEEKLY": "Time Series FX (Weekly)",
+    "FX_MONTHLY": "Time Series FX (Monthly)",
+}
+INTRADAY_INTERVALS = ("1min", "5min", "15min", "30min", "60min")
+
+
+def series_key(function: str, interval: str = None) -> str:
+    """
+    Clave de la serie temporal en la respuesta de Alpha Vantage
+    (ej. 'Time Series FX (Daily)' o 'Time Series FX (5min)').
+    """
+    if function == "FX_INTRADAY":
+        if interval not in INTRADAY_INTERVALS:
+            raise ValueError(f"Intervalo '{interval}' no soportado. Opciones: {INTRADAY_INTERVALS}")
+        return f"Time Series FX ({interval})"
+    if function not in SERIES_KEYS:
+        raise ValueError(f"Función '{function}' no soportada. Opciones: {list(SERIES_KEYS) + ['FX_INTRADAY']}")
+    return SERIES_KEYS[function]
+
+
+class ApiRateLimitError(RuntimeError):
+    """
+    Alpha Vantage respondió con un aviso de límite de llamadas ('Note' / 'Information').
+    """
+
+
+def build_session(pool_size: int = 10) -> requests.Session:
+    """
+    Crea una sesión HTTP con pool de conexiones reutilizables (keep-alive).
+    """
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
 
 
 class FetchData:
@@ -10,7 +56,8 @@ class FetchData:
     Clase para obtener y almacenar datos crudos desde la API de Alpha Vantage.
     """
 
-    def __init__(self, raw_storage_root: str = "./data/raw/"):
+    def __init__(self, raw_storage_root: str = "./data/raw/", session: requests.Session = None,
+                 cache: ResponseCache = None, use_cache: bool = True, timeout: int = 30):
         load_dotenv()
         self.api_url = os.getenv("API_URL")
         self.api_key = os.getenv("API_KEY")
@@ -23,6 +70,38 @@ class FetchData:
         self.raw_storage_root = raw_storage_root
         os.makedirs(self.raw_storage_root, exist_ok=True)
 
+        self.session = session or build_session()
+        self.timeout = timeout
+        self.cache = (cache or ResponseCache()) if use_cache else None
+
+    def _get(self, params: dict, validate=None) -> str:
+        """
+        GET contra la API con cache en disco. Solo se cachean respuestas 2xx
+        que pasan `validate` (ej. sin avisos de límite de la API).
+        """
+        if self.cache is not None:
+            body = self.cache.get(self.api_url, params)
+            if body is not None:
+                return body
+
+        response = self.session.get(self.api_url, params=params, timeout=self.timeout)
+        response.raise_for_status()
+        body = response.text
+
+        if validate is not None:
+            validate(body)
+        if self.cache is not None:
+            self.cache.put(self.api_url, params, body)
+        return body
+
+    @staticmethod
+    def _validate_json(body: str):
+        data = json.loads(body)
+        if "Note" in data or "Information" in data:
+            raise ApiRateLimitError(data.get("Note") or data.get("Information"))
+        if "Error Message" in data:
+            raise ValueError(f"Error de Alpha Vantage: {data['Error Message']}")
+
     def fetch_raw_data(
         self,
         from_symbol: str = "EUR",
@@ -30,6 +109,7 @@ class FetchData:
         function: str = "FX_DAILY",
         outputsize: str = "full",
         datatype: str = "json",
+        interval: str = None,
     ) -> pd.DataFrame:
         """
         Obtiene datos desde Alpha Vantage según los parámetros indicados.
@@ -37,13 +117,17 @@ class FetchData:
         Args:
             from_symbol: Símbolo base del par (ej. "EUR")
             to_symbol: Símbolo cotizado del par (ej. "GBP")
-            function: Endpoint de Alpha Vantage (por defecto 'FX_DAILY')
+            function: Endpoint de Alpha Vantage ('FX_DAILY', 'FX_WEEKLY', 'FX_MONTHLY' o 'FX_INTRADAY')
             outputsize: 'compact' o 'full'
             datatype: 'json' o 'csv'
+            interval: Resolución de FX_INTRADAY ('1min', '5min', '15min', '30min', '60min')
 
         Returns:
-            DataFrame con los datos descargados
+            DataFrame ordenado por fecha con timestamp, open, high, low, close y date
         """
+        interval = (interval or "1min") if function == "FX_INTRADAY" else None
+        key = series_key(function, interval)
+
         params = {
             "function": function,
             "from_symbol": from_symbol,
@@ -52,32 +136,15 @@ class FetchData:
             "apikey": self.api_key,
             "datatype": datatype,
         }
+        if interval is not None:
+            params["interval"] = interval
 
         print(f"Solicitando datos desde {self.api_url} para {from_symbol}/{to_symbol}...")
 
-        response = requests.get(self.api_url, params=params, timeout=30)
-        response.raise_for_status()
+        body = self._get(params, validate=None if datatype == "csv" else self._validate_json)
 
-        # Manejo de respuesta CSV o JSON
-        if datatype == "csv":
-            df = pd.read_csv(pd.compat.StringIO(response.text))
-        else:
-            data = response.json()
-            if "Time Series FX (Daily)" not in data:
-                raise ValueError("La respuesta no contiene 'Time Series FX (Daily)'. "
-                                 "Verifique el API key o los parámetros.")
-            daily_data = data["Time Series FX (Daily)"]
-            df = pd.DataFrame.from_dict(daily_data, orient="index")
-            df.reset_index(inplace=True)
-            df.rename(columns={"index": "timestamp"}, inplace=True)
-            df = df.rename(columns=lambda x: x.split(". ")[-1])  # Limpia nombres como '1. open' -> 'open'
-            df = df.astype({
-                "open": float,
-                "high": float,
-                "low": float,
-                "close": float
-            })
-            df["date"] = pd.to_datetime(df["timestamp"])
+        # JSON o CSV -> columnas tipadas y ordenadas por fecha en una sola pasada
+        df = parse_payload(body, key, datatype)
 
         print(f"Datos obtenidos: {len(df)} registros.")
         return df
@@ -89,3 +156,63 @@ class FetchData:
         df.to_csv(filepath, index=False)
         print(f"Datos almacenados en: {filepath}")
         return filepath
+
+    def ingest_incremental(
+        self,
+        from_symbol: str = "EUR",
+        to_symbol: str = "GBP",
+        function: str = "FX_DAILY",
+        name: str = None,
+        interval: str = None,
+        load_history: bool = True,
+    ) -> pd.DataFrame:
+        """
+        Ingesta incremental sobre el store append-only (RawHistoryStore).
+        Para FX_INTRADAY cada `interval` tiene su propio histórico.
+
+        - Sin histórico: descarga 'full' y escribe el snapshot base.
+        - Con histórico: descarga solo 'compact' y hace upsert por fecha: agrega
+          como delta las barras posteriores a la última almacenada y las ya
+          almacenadas con precios distintos (revisiones, ej. la barra del día
+          todavía abierta). load() se queda con la última escritura de cada fecha.
+        - Si el compact no se solapa con el histórico (hueco) se descarga 'full'
+          y se hace el mismo upsert: las barras más viejas que la ventana de
+          'full' (ej. intradiario) se conservan.
+
+        Solo se leen del histórico la última fecha y las barras que se solapan con
+        el compact, así que la ingesta no depende del tamaño de la historia.
+
+        Returns:
+            DataFrame con el histórico completo actualizado, o None si
+            load_history=False (ej. historias intradiarias que se procesan por
+            bloques con RawHistoryStore.iter_chunks)
+        """
+        interval = (interval or "1min") if function == "FX_INTRADAY" else None
+        suffix = f"{function.lower()}_{interval}" if interval else function.lower()
+        name = name or f"{from_symbol.lower()}_{to_symbol.lower()}_{suffix}"
+        store = RawHistoryStore(name, self.raw_storage_root)
+
+        def result():
+            return store.load() if load_history else None
+
+        if not store.exists():
+            print(f"Sin histórico previo para {name}. Descargando historia completa...")
+            df = self.fetch_raw_data(from_symbol, to_symbol, function, outputsize="full", interval=interval)
+            store.rewrite(df)
+            return result()
+
+        last_date = store.last_date()
+
+        update = self.fetch_raw_data(from_symbol, to_symbol, function, outputsize="compact", interval=interval)
+
+        if update["date"].min() > last_date:
+            print(f"Completando histórico de {name} desde 'full': hueco entre {last_date} y {update['date'].min()}")
+            update = self.fetch_raw_data(from_symbol, to_symbol, function, outputsize="full", interval=interval)
+
+        n_new, n_revised = store.upsert(update)
+        if not n_new and not n_revised:
+            print(f"Histórico de {name} al día (última barra {last_date}).")
+            return result()
+
+        print(f"Agregadas {n_new} barras nuevas y {n_revised} revisadas a {name}.")
+        return result()
@@ -5,21 +5,28 @@ from datetime import datetime, timezone
 from dotenv import load_dotenv
 import logging
 
-load_dotenv()
-
+from modules.data.fetch_data import SERIES_KEYS, FetchData, build_session
+from modules.data.payload_parser import parse_payload
+from modules.data.response_cache import ResponseCache
 
 class PredictionDataFetcher:
     """
     Clase enfocada en obtener los datos recientes para la predicción diaria de Forex.
     """
 
-    def __init__(self):
+    def __init__(self, session: requests.Session = None, timeout: int = 30,
+                 cache: ResponseCache = None, use_cache: bool = True):
+        load_dotenv()
         self.api_key = os.getenv("API_KEY")
         self.api_url = os.getenv("API_URL")
 
         if not self.api_key:
             raise ValueError("No se encontró la variable ALPHAVANTAGE_API_KEY en el archivo .env")
 
+        self.session = session or build_session()
+        self.timeout = timeout
+        self.cache = (cache or ResponseCache()) if use_cache else None
+
     def _check_time_window(self, start_hour=1, end_hour=4, force=False) -> bool:
         """
         Verifica si la ejecución está dentro de la ventana horaria (UTC).
@@ -52,20 +59,62 @@ class PredictionDataFetcher:
         }
 
         logging.info(f"Obteniendo datos recientes de {from_symbol}/{to_symbol} desde Alpha Vantage...")
-        response = requests.get(self.api_url, params=params)
-        if response.status_code != 200:
-            logging.error(f"Error HTTP {response.status_code} al llamar a Alpha Vantage")
-            return None
+        body = self.cache.get(self.api_url, params) if self.cache is not None else None
+        if body is None:
+            try:
+                response = self.session.get(self.api_url, params=params, timeout=self.timeout)
+            except requests.RequestException as e:
+                logging.error(f"Error de red al llamar a Alpha Vantage: {e}")
+                return None
+            if response.status_code != 200:
+                logging.error(f"Error HTTP {response.status_code} al llamar a Alpha Vantage")
+                return None
+            body = response.text
+            cacheable = True
+        else:
+            cacheable = False
 
-        data = response.json()
-        if "Time Series FX (Daily)" not in data:
-            logging.error("Respuesta inesperada de la API. Falta 'Time Series FX (Daily)'.")
+        try:
+            df = parse_payload(body, SERIES_KEYS["FX_DAILY"])
+        except ValueError as e:
+            logging.error(f"Respuesta inesperada de la API: {e}")
             return None
+        if cacheable and self.cache is not None:
+            self.cache.put(self.api_url, params, body)
 
-        df = pd.DataFrame.from_dict(data["Time Series FX (Daily)"], orient="index").astype(float)
-        df.index = pd.to_datetime(df.index)
-        df = df.sort_index()
-        df.rename(columns=lambda c: c.split(". ")[1] if ". " in c else c, inplace=True)
+        # Mismo formato que fetch_latest_daily_many: OHLC indexado por fecha
+        df = df.set_index("date")[["open", "high", "low", "close"]]
 
         logging.info(f"Datos obtenidos. Último registro: {df.index[-1].strftime('%Y-%m-%d')}")
         return df
+
+    def fetch_latest_daily_many(self, pairs: list, force=False, max_workers: int = 4, use_cache: bool = True) -> dict:
+        """
+        Obtiene en paralelo los datos diarios recientes de varios pares
+        (token-bucket, sesión compartida y reintentos vía BatchFetcher).
+        Con use_cache=False siempre consulta la API (sondeo hasta que aparece el cierre).
+
+        Returns:
+            dict {"EURGBP": DataFrame indexado por fecha}. Los pares que fallan se omiten.
+        """
+        if not self._check_time_window(force=force):
+            return {}
+
+        from modules.data.batch_fetcher import BatchFetcher
+
+        # Misma sesión, timeout y cache que fetch_latest_daily_data
+        cache = self.cache if use_cache else None
+        fetcher = FetchData(session=self.session, timeout=self.timeout, cache=cache, use_cache=cache is not None)
+        batch = BatchFetcher(fetcher=fetcher, max_workers=max_workers)
+        results, failures = batch.fetch_many(pairs, functions=("FX_DAILY",), outputsize="compact")
+
+        latest = {}
+        for (from_symbol, to_symbol, _), df in results.items():
+            latest[f"{from_symbol}{to_symbol}"] = (
+                df.set_index("date")[["open", "high", "low", "close"]].sort_index()
+            )
+        for key in failures:
+            logging.error(f"No se pudieron obtener datos recientes para {key[0]}/{key[1]}")
+
+        logging.info(f"Latencias de descarga: {batch.stats.summary()}")
+        return latest
@@ -0,0 +1,106 @@
+import os
+import logging
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from modules.data.pre_processing import ForexFeatureEngineer
+
+
+def _process_shard(engineer: ForexFeatureEngineer, shard: pd.DataFrame, symbol_column: str,
+                   date_column: str) -> pd.DataFrame:
+    """
+    Features de un grupo de símbolos, uno por uno (worker de PanelFeatureProcessor).
+    """
+    frames = []
+    for symbol, group in shard.groupby(symbol_column, sort=False):
+        features = engineer.prepare_features(group, date_column)
+        features[symbol_column] = symbol
+        frames.append(features)
+    return pd.concat(frames) if frames else shard.iloc[:0]
+
+
+class PanelFeatureProcessor:
+    """
+    Feature engineering para un panel de pares en formato largo (symbol, date, OHLC).
+
+    Con backend 'polars' todos los indicadores se calculan en un único plan lazy
+    agrupado por símbolo (ventanas con .over(symbol)): el costo por par agregado
+    es el de más filas en las mismas expresiones, no el de otro pipeline.
+    Con los backends 'pandas' y 'graph' (implementaciones de referencia) los
+    símbolos se reparten en `workers` procesos.
+    En ambos casos las features de cada par son las mismas que las de
+    prepare_features sobre el histórico de ese par.
+    """
+
+    def __init__(self, engineer: ForexFeatureEngineer = None, symbol_column: str = "symbol",
+                 date_column: str = "date", workers: int = None):
+        """
+        Args:
+            engineer: ForexFeatureEngineer a usar (por defecto backend 'polars')
+            workers: Procesos para los backends pandas/graph (por defecto os.cpu_count())
+        """
+        self.engineer = engineer or ForexFeatureEngineer(backend="polars")
+        self.symbol_column = symbol_column
+        self.date_column = date_column
+        self.workers = workers or os.cpu_count() or 1
+
+    @staticmethod
+    def from_frames(frames: dict, symbol_column: str = "symbol") -> pd.DataFrame:
+        """
+        Arma el panel largo a partir de {"EURGBP": df, "USDJPY": df, ...}.
+        """
+        return pd.concat(
+            [df.assign(**{symbol_column: symbol}) for symbol, df in frames.items()],
+            ignore_index=True,
+        )
+
+    def _sorted(self, df: pd.DataFrame) -> pd.DataFrame:
+        if self.symbol_column not in df.columns:
+            raise ValueError(f"Columna de símbolo '{self.symbol_column}' no encontrada en el panel")
+        dates = pd.to_datetime(df[self.date_column])
+        order = np.lexsort((dates.to_numpy(), df[self.symbol_column].astype(str).to_numpy()))
+        return df.iloc[order]
+
+    def _shards(self, df: pd.DataFrame) -> list:
+        """
+        Reparte los símbolos en shards de tamaño parecido (más filas primero).
+        """
+        sizes = df[self.symbol_column].value_counts()
+        n_shards = max(1, min(self.workers, len(sizes)))
+        loads, members = [0] * n_shards, [[] for _ in range(n_shards)]
+        for symbol, size in sizes.items():
+            target = loads.index(min(loads))
+            loads[target] += size
+            members[target].append(symbol)
+        return [df[df[self.symbol_column].isin(symbols)] for symbols in members if symbols]
+
+    def process(self, df: pd.DataFrame) -> pd.DataFrame:
+        """
+        Calcula las features de todos los pares del panel.
+
+        Returns:
+            DataFrame largo ordenado por símbolo y fecha, con el índice del panel de entrada
+        """
+        panel = self._sorted(df)
+        n_symbols = panel[self.symbol_column].nunique()
+        print(f"Panel: {n_symbols} pares, {len(panel)} filas")
+
+        if self.engineer.backend == "polars":
+            features = self.engineer.prepare_features(panel, self.date_column, group_column=self.symbol_column)
+        else:
+            shards = self._shards(panel)
+            if len(shards) == 1:
+                features = _process_shard(self.engineer, panel, self.symbol_column, self.date_column)
+            else:
+                with ProcessPoolExecutor(max_workers=len(shards)) as executor:
+                    futures = [
+                        executor.submit(_process_shard, self.engineer, shard, self.symbol_column, self.date_column)
+                        for shard in shards
+                    ]
+                    features = pd.concat([future.result() for future in futures])
+            features = self._sorted(features)
+
+        logging.info(f"Features de panel: {n_symbols} pares, {len(features)} filas")
+        return features
@@ -0,0 +1,161 @@
+import re
+import json
+import logging
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pcsv
+
+
+# Campos de precio de Alpha Vantage ('1. open' en JSON, 'open' en CSV) -> columna tipada
+PRICE_SCHEMA = {"open": pa.float64(), "high": pa.float64(), "low": pa.float64(), "close": pa.float64()}
+DATE_TYPE = pa.timestamp("us")
+
+# En el JSON cada barra es '"<ts>": {"1. open": "<v>", ..., "4. close": "<v>"}'. Sin '{' ni saltos
+# de línea (la API responde con indent) y con '}' como fin de fila, separar por comillas deja cada
+# campo en una columna fija: 1 = timestamp, 3/7/11/15 = nombres de campo, 5/9/13/17 = valores
+_JSON_TO_ROWS = bytes.maketrans(b"}", b"\n")
+_JSON_DROP = b"{\r\n"
+# Cierre de la última barra seguido del cierre de la serie
+_SERIES_END = re.compile(rb"}\s*}")
+_TIMESTAMP_FIELD = 1
+_NAME_FIELDS = (3, 7, 11, 15)
+_VALUE_FIELDS = (5, 9, 13, 17)
+
+
+def _field_name(name: str) -> str:
+    return name.split(". ")[-1].strip().lower()
+
+
+def _to_frame(timestamps: pa.Array, columns: dict) -> pd.DataFrame:
+    """
+    DataFrame ordenado por fecha: timestamp (texto original), OHLC float64 y date (datetime64).
+    """
+    timestamps = pc.utf8_trim_whitespace(timestamps.cast(pa.string()))
+    dates = pc.cast(timestamps, DATE_TYPE).to_numpy(zero_copy_only=False)
+
+    if len(dates) > 1 and (np.diff(dates.view(np.int64)) < 0).all():
+        order = np.arange(len(dates) - 1, -1, -1)  # Alpha Vantage devuelve lo más reciente primero
+    else:
+        order = np.argsort(dates, kind="stable")
+
+    df = pd.DataFrame({"timestamp": timestamps.take(pa.array(order)).to_pandas()})
+    for name in PRICE_SCHEMA:
+        df[name] = columns[name].to_numpy(zero_copy_only=False)[order]
+    df["date"] = dates[order]
+    return df
+
+
+def _parse_json_fast(body: bytes, key: str):
+    """
+    Decodifica la serie sin construir objetos Python por barra: el texto se
+    reacomoda (bytes.translate) en filas delimitadas por comillas y lo lee el
+    parser CSV de Arrow con tipos fijos. Devuelve None si el payload no tiene
+    la forma esperada (se usa entonces json.loads).
+    """
+    marker = f'"{key}"'.encode()
+    position = body.find(marker)
+    if position < 0:
+        return None
+    start = body.find(b"{", position + len(marker))
+    if start < 0:
+        return None
+    end = _SERIES_END.search(body, start + 1)
+    if end is None:
+        return None
+    rows = body[start + 1:end.start() + 1].translate(_JSON_TO_ROWS, _JSON_DROP)
+
+    first_line = rows[:rows.find(b"\n")].decode().split('"')
+    if len(first_line) != 19:
+        return None
+    names = [_field_name(first_line[i]) for i in _NAME_FIELDS]
+    if sorted(names) != sorted(PRICE_SCHEMA):
+        return None
+
+    fields = {f"f{_TIMESTAMP_FIELD}": "timestamp"}
+    fields.update({f"f{i}": name for i, name in zip(_VALUE_FIELDS, names)})
+    table = pcsv.read_csv(
+        pa.py_buffer(rows),
+        read_options=pcsv.ReadOptions(autogenerate_column_names=True),
+        parse_options=pcsv.ParseOptions(delimiter='"', quote_char=False),
+        convert_options=pcsv.ConvertOptions(
+            include_columns=list(fields),
+            column_types={f: (pa.string() if name == "timestamp" else PRICE_SCHEMA[name])
+                          for f, name in fields.items()},
+        ),
+    )
+    # Cada barra cierra con su último campo: si no coincide, el layout no es el esperado
+    if table.num_rows != body.count(f'"{first_line[_NAME_FIELDS[-1]]}"'.encode()):
+        return None
+    table = table.rename_columns([fields[name] for name in table.column_names])
+    return table.column("timestamp").combine_chunks(), {
+        name: table.column(name).combine_chunks() for name in PRICE_SCHEMA
+    }
+
+
+def _parse_json_generic(body: bytes, key: str):
+    """
+    Camino de respaldo con json.loads (respuestas con otro formato de espacios u orden).
+    """
+    data = json.loads(body)
+    if key not in data:
+        raise ValueError(f"La respuesta no contiene '{key}'. Verifique el API key o los parámetros.")
+    series = data[key]
+    timestamps = list(series)
+    columns = {name: [] for name in PRICE_SCHEMA}
+    for bar in series.values():
+        for field, value in bar.items():
+            name = _field_name(field)
+            if name in columns:
+                columns[name].append(value)
+    return pa.array(timestamps), {
+        name: pc.cast(pa.array(values, pa.string()), PRICE_SCHEMA[name]) for name, values in columns.items()
+    }
+
+
+def parse_json(body, key: str) -> pd.DataFrame:
+    """
+    Parsea una respuesta JSON de Alpha Vantage.
+
+    Args:
+        body: Texto o bytes de la respuesta
+        key: Clave de la serie (ej. 'Time Series FX (Daily)', ver series_key)
+
+    Returns:
+        DataFrame ordenado por fecha con timestamp, open, high, low, close y date
+    """
+    raw = body.encode() if isinstance(body, str) else body
+    parsed = _parse_json_fast(raw, key)
+    if parsed is None:
+        logging.info("Payload JSON con formato no estándar; se parsea con json.loads")
+        parsed = _parse_json_generic(raw, key)
+    return _to_frame(*parsed)
+
+
+def parse_csv(body) -> pd.DataFrame:
+    """
+    Parsea una respuesta CSV de Alpha Vantage (timestamp,open,high,low,close).
+    """
+    raw = body.encode() if isinstance(body, str) else body
+    table = pcsv.read_csv(
+        pa.py_buffer(raw),
+        convert_options=pcsv.ConvertOptions(column_types={"timestamp": pa.string(), **PRICE_SCHEMA}),
+    )
+    missing = [c for c in ["timestamp", *PRICE_SCHEMA] if c not in table.column_names]
+    if missing:
+        raise ValueError(f"La respuesta CSV no contiene las columnas {missing}")
+    return _to_frame(table.column("timestamp").combine_chunks(), {
+        name: table.column(name).combine_chunks() for name in PRICE_SCHEMA
+    })
+
+
+def parse_payload(body, key: str, datatype: str = "json") -> pd.DataFrame:
+    """
+    Parser único de respuestas de Alpha Vantage (JSON o CSV), usado por la
+    ingesta histórica y por la descarga diaria para predicción.
+    """
+    if datatype == "csv":
+        return parse_csv(body)
+    return parse_json(body, key)
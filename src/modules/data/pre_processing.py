@@ -1,25 +1,110 @@
 import pandas as pd
 import numpy as np
-import matplotlib.pyplot as plt
 
-from datetime import datetime
 import warnings
-warnings.filterwarnings('ignore')
 
-import ta
-from ta.momentum import RSIIndicator, StochasticOscillator, ROCIndicator, WilliamsRIndicator
-from ta.trend import SMAIndicator, EMAIndicator, MACD, ADXIndicator, CCIIndicator
-from ta.volatility import AverageTrueRange, BollingerBands
+from modules.data.rolling_regression import rolling_ols, rolling_slope
+
+BACKENDS = ('pandas', 'polars', 'graph')
+
+TARGET_LABELS = ['down', 'neutral', 'up']
+
+# Orden de creación de columnas del backend pandas (los backends polars y graph lo replican)
+TECHNICAL_ORDER = [
+    'SMA_30', 'SMA_90', 'SMA_crossover', 'sma_ratio', 'RSI', 'ATR',
+    'volatility_30d', 'volatility_rolling', 'volume_ratio', 'volume_trend', 'return_t',
+]
+TEMPORAL_ORDER = [
+    'month', 'quarter', 'day_of_week', 'is_month_end',
+    'month_sin', 'month_cos', 'day_sin', 'day_cos',
+]
+TARGET_ORDER = ['return_t1', 'target', 'target_encoded']
+
+# Modo compacto: tipos por columna. Los precios quedan en float64 (las cotizaciones
+# de 5 decimales, ej. USDJPY 150.12345, necesitan más de los ~7 dígitos de float32).
+COMPACT_INT8_COLUMNS = ['month', 'quarter', 'day_of_week', 'is_month_end', 'target_encoded']
+COMPACT_FLOAT32_COLUMNS = [
+    'volume', 'SMA_30', 'SMA_90', 'SMA_crossover', 'sma_ratio', 'RSI', 'ATR',
+    'volatility_30d', 'volatility_rolling', 'volume_ratio', 'volume_trend', 'return_t',
+    'month_sin', 'month_cos', 'day_sin', 'day_cos', 'return_t1'
+]
+
 
 class ForexFeatureEngineer:
   
-    def __init__(self):
+    def __init__(self, backend='pandas', compact=False, features=None, cache=None, use_cache=True):
+        """
+        Args:
+            backend: 'pandas' (ta, ejecución eager), 'polars' (LazyFrame, ventanas fusionadas
+                y multi-core) o 'graph' (FeatureGraph: solo las features pedidas, con
+                memoización por nodo). Solo prepare_features usa el backend: los métodos
+                por etapa (create_*) son pandas y fallan con backend='polars'
+            compact: Modo de memoria reducida. Las features se calculan en float64 y se
+                guardan en float32, los campos de calendario y el target codificado en
+                int8 y 'target' como categórica. Con backend pandas se trabaja sobre el
+                DataFrame recibido (se le agregan las columnas) sin copias intermedias.
+                Ver check_compact_precision para el error introducido.
+            features: Subconjunto de get_feature_columns() a calcular (solo backend 'graph')
+            cache: FeatureNodeCache para el backend 'graph' (por defecto artifacts/feature_cache)
+            use_cache: Si es False, el backend 'graph' solo memoiza dentro de la corrida
+        """
+        if backend not in BACKENDS:
+            raise ValueError(f"Backend '{backend}' no soportado. Opciones: {BACKENDS}")
+        if features is not None and backend != 'graph':
+            raise ValueError("Calcular un subconjunto de features requiere backend='graph'")
+        self.backend = backend
+        self.compact = compact
+        self.features = list(features) if features is not None else None
+        self.cache = cache
+        self.use_cache = use_cache
+        self.graph = None
         self.feature_columns = []
+
+    def _check_eager_backend(self, method):
+        """
+        Los métodos por etapa calculan con pandas/ta: con backend='polars' solo
+        prepare_features está acelerado, así que se rechaza la llamada directa.
+        """
+        if self.backend == 'polars':
+            raise ValueError(
+                f"{method} calcula con pandas/ta; con backend='polars' usar prepare_features"
+            )
+
+    def _store(self, values):
+        """
+        Valores de una feature con el tipo de salida (float32 en modo compacto).
+        """
+        if self.compact:
+            return np.asarray(values, dtype=np.float32)
+        return values
+
+    def _calendar(self, values):
+        """
+        Campo de calendario con el tipo de salida (int8 en modo compacto).
+        """
+        if self.compact:
+            return np.asarray(values, dtype=np.int8)
+        return values
+
+    @staticmethod
+    def to_compact(df):
+        """
+        Convierte un DataFrame de features ya calculado a los tipos del modo compacto.
+        """
+        dtypes = {c: np.float32 for c in COMPACT_FLOAT32_COLUMNS if c in df.columns}
+        dtypes.update({c: np.int8 for c in COMPACT_INT8_COLUMNS if c in df.columns})
+        if 'target' in df.columns:
+            dtypes['target'] = pd.CategoricalDtype(TARGET_LABELS)
+        return df.astype(dtypes)
         
     def create_technical_features(self, df):
         """
         Crear features técnicas usando la librería ta con Pandas
         """
+        self._check_eager_backend('create_technical_features')
+        # ta se importa recién aquí: la inferencia no necesita cargarla
+        import ta
+
         print("Creando features técnicas...")
         
         # Asegurar que tenemos las columnas necesarias básicas
@@ -34,84 +119,100 @@ class ForexFeatureEngineer:
             # Crear volume sintético basado en la volatilidad del día
             df['volume'] = ((df['high'] - df['low']) / df['close']) * 1000000
         
-        # Hacer copia para no modificar el original
-        df_processed = df.copy()
+        # Hacer copia para no modificar el original (en modo compacto se escribe sobre df)
+        df_processed = df if self.compact else df.copy()
+        close = df_processed['close']
         
         # 1. INDICADORES DE TENDENCIA (SMA)
         print("  - Calculando SMAs...")
-        df_processed['SMA_30'] = ta.trend.sma_indicator(df_processed['close'], window=30)
-        df_processed['SMA_90'] = ta.trend.sma_indicator(df_processed['close'], window=90)
-        df_processed['SMA_crossover'] = df_processed['SMA_30'] - df_processed['SMA_90']
-        df_processed['sma_ratio'] = df_processed['SMA_30'] / df_processed['SMA_90']
+        sma_30 = ta.trend.sma_indicator(close, window=30)
+        sma_90 = ta.trend.sma_indicator(close, window=90)
+        df_processed['SMA_30'] = self._store(sma_30)
+        df_processed['SMA_90'] = self._store(sma_90)
+        df_processed['SMA_crossover'] = self._store(sma_30 - sma_90)
+        df_processed['sma_ratio'] = self._store(sma_30 / sma_90)
+        del sma_30, sma_90
         
         # 2. INDICADORES DE MOMENTUM (RSI)
         print("  - Calculando RSI...")
-        df_processed['RSI'] = ta.momentum.rsi(df_processed['close'], window=14)
+        df_processed['RSI'] = self._store(ta.momentum.rsi(close, window=14))
         
         # 3. INDICADORES DE VOLATILIDAD (ATR)
         print("  - Calculando ATR...")
-        df_processed['ATR'] = ta.volatility.average_true_range(
-            df_processed['high'], df_processed['low'], df_processed['close'], window=14
-        )
+        df_processed['ATR'] = self._store(ta.volatility.average_true_range(
+            df_processed['high'], df_processed['low'], close, window=14
+        ))
         
-        # 4. VOLATILIDAD HISTÓRICA
+        # 4. VOLATILIDAD HISTÓRICA (sobre el retorno del día, sin columna auxiliar)
         print("  - Calculando volatilidades...")
-        df_processed['returns'] = df_processed['close'].pct_change()
-        df_processed['volatility_30d'] = df_processed['returns'].rolling(window=30).std()
-        df_processed['volatility_rolling'] = df_processed['returns'].rolling(window=10).std()
+        returns = close.pct_change()
+        df_processed['volatility_30d'] = self._store(returns.rolling(window=30).std())
+        df_processed['volatility_rolling'] = self._store(returns.rolling(window=10).std())
         
         # 5. FEATURES DE VOLUMEN
         print("  - Calculando features de volumen...")
-        df_processed['volume_ratio'] = df_processed['volume'] / df_processed['volume'].rolling(window=30).mean()
+        volume = df_processed['volume'].astype(np.float64)
+        df_processed['volume_ratio'] = self._store(volume / volume.rolling(window=30).mean())
         
         # Tendencia de volumen (pendiente de regresión lineal 5 días)
-        def calculate_volume_trend(volume_series):
-            if len(volume_series) < 5 or volume_series.isna().any():
-                return np.nan
-            x = np.arange(len(volume_series))
-            slope = np.polyfit(x, volume_series, 1)[0]
-            return slope
-        
-        df_processed['volume_trend'] = df_processed['volume'].rolling(window=5).apply(
-            calculate_volume_trend, raw=False
-        )
+        df_processed['volume_trend'] = self._store(rolling_slope(volume, window=5))
+        df_processed['volume'] = self._store(volume)
+        del volume
         
         # 6. RETORNO DEL DÍA ACTUAL
-        df_processed['return_t'] = df_processed['close'].pct_change()
-        
-        # Limpiar columnas temporales
-        df_processed = df_processed.drop(['returns'], axis=1)
+        df_processed['return_t'] = self._store(returns)
         
         return df_processed
     
+    def create_trend_features(self, df, columns=('close', 'ATR'), window=10):
+        """
+        Crear features de tendencia (pendiente y R² de regresión móvil) para las columnas indicadas.
+        Ej: close_slope_10, close_r2_10, ATR_slope_10, ATR_r2_10
+        """
+        self._check_eager_backend('create_trend_features')
+        print("Creando features de tendencia...")
+
+        df_processed = df.copy()
+
+        for col in columns:
+            if col not in df_processed.columns:
+                raise ValueError(f"Columna '{col}' no encontrada para calcular su tendencia")
+            ols = rolling_ols(df_processed[col], window=window)
+            df_processed[f'{col}_slope_{window}'] = ols['slope']
+            df_processed[f'{col}_r2_{window}'] = ols['r2']
+
+        return df_processed
+
     def create_temporal_features(self, df, date_column='date'):
         """
         Crear features temporales a partir de la columna de fecha con Pandas
         """
+        self._check_eager_backend('create_temporal_features')
         print("Creando features temporales...")
         
         # Asegurar que la columna de fecha existe
         if date_column not in df.columns:
             raise ValueError(f"Columna de fecha '{date_column}' no encontrada")
         
-        # Hacer copia para no modificar el original
-        df_processed = df.copy()
+        # Hacer copia para no modificar el original (en modo compacto se escribe sobre df)
+        df_processed = df if self.compact else df.copy()
         
         # Convertir a datetime si no lo es
         if not pd.api.types.is_datetime64_any_dtype(df_processed[date_column]):
             df_processed[date_column] = pd.to_datetime(df_processed[date_column])
         
         # Extraer componentes temporales
-        df_processed['month'] = df_processed[date_column].dt.month
-        df_processed['quarter'] = df_processed[date_column].dt.quarter
-        df_processed['day_of_week'] = df_processed[date_column].dt.dayofweek  # 0=Lunes, 6=Domingo
-        df_processed['is_month_end'] = df_processed[date_column].dt.is_month_end.astype(int)
+        dates = df_processed[date_column].dt
+        df_processed['month'] = self._calendar(dates.month)
+        df_processed['quarter'] = self._calendar(dates.quarter)
+        df_processed['day_of_week'] = self._calendar(dates.dayofweek)  # 0=Lunes, 6=Domingo
+        df_processed['is_month_end'] = self._calendar(dates.is_month_end.astype(int))
         
         # Features cíclicas para mes y día de la semana
-        df_processed['month_sin'] = np.sin(2 * np.pi * df_processed['month'] / 12)
-        df_processed['month_cos'] = np.cos(2 * np.pi * df_processed['month'] / 12)
-        df_processed['day_sin'] = np.sin(2 * np.pi * df_processed['day_of_week'] / 7)
-        df_processed['day_cos'] = np.cos(2 * np.pi * df_processed['day_of_week'] / 7)
+        df_processed['month_sin'] = self._store(np.sin(2 * np.pi * df_processed['month'] / 12))
+        df_processed['month_cos'] = self._store(np.cos(2 * np.pi * df_processed['month'] / 12))
+        df_processed['day_sin'] = self._store(np.sin(2 * np.pi * df_processed['day_of_week'] / 7))
+        df_processed['day_cos'] = self._store(np.cos(2 * np.pi * df_processed['day_of_week'] / 7))
         
         return df_processed
     
@@ -119,19 +220,29 @@ class ForexFeatureEngineer:
         """
         Crear target de clasificación ternaria con Pandas
         """
+        self._check_eager_backend('create_target')
         print("Creando variable target...")
         
-        # Hacer copia para no modificar el original
-        df_processed = df.copy()
+        # Hacer copia para no modificar el original (en modo compacto se escribe sobre df)
+        df_processed = df if self.compact else df.copy()
         
         # Calcular retorno del día siguiente
-        df_processed['return_t1'] = df_processed['close'].shift(-1) / df_processed['close'] - 1
+        return_t1 = df_processed['close'].shift(-1) / df_processed['close'] - 1
+        df_processed['return_t1'] = self._store(return_t1)
         
-        # Definir condiciones para clasificación ternaria
+        # Definir condiciones para clasificación ternaria (sobre el retorno en float64)
         conditions = [
-            df_processed['return_t1'] > 0.001,    # UP: sube más del 0.1%
-            df_processed['return_t1'] < -0.001    # DOWN: baja más del 0.1%
+            return_t1 > 0.001,    # UP: sube más del 0.1%
+            return_t1 < -0.001    # DOWN: baja más del 0.1%
         ]
+
+        if self.compact:
+            # Códigos int8 y etiquetas categóricas sobre los mismos códigos
+            codes = np.select(conditions, [2, 0], default=1).astype(np.int8)
+            df_processed['target'] = pd.Categorical.from_codes(codes, categories=TARGET_LABELS)
+            df_processed['target_encoded'] = codes
+            return df_processed
+
         choices = ['up', 'down']
         
         # Aplicar condiciones
@@ -160,34 +271,55 @@ class ForexFeatureEngineer:
         
         return technical_features + temporal_features
     
-    def prepare_features(self, df, date_column='date'):
+    def prepare_features(self, df, date_column='date', lazy=False, group_column=None):
         """
         Pipeline completo de feature engineering con Pandas
+
+        Con backend='polars' se delega en _prepare_features_polars; si además
+        lazy=True se devuelve el LazyFrame sin ejecutar (ej. para sink_parquet).
+        group_column (solo polars) calcula las ventanas por grupo en un panel
+        largo ordenado por grupo y fecha (ver PanelFeatureProcessor).
         """
         print("="*60)
         print("INICIANDO PIPELINE DE FEATURE ENGINEERING")
         print("="*60)
+
+        if self.backend == 'polars':
+            return self._prepare_features_polars(df, date_column, lazy, group_column)
+        if group_column is not None:
+            raise ValueError("group_column requiere backend='polars'")
         
-        # Hacer copia para no modificar el original
-        df_processed = df.copy()
+        # Hacer copia para no modificar el original (en modo compacto se escribe sobre df)
+        df_processed = df if self.compact else df.copy()
         
         print(f"Dataset de entrada: {df_processed.shape[0]} filas, {df_processed.shape[1]} columnas")
         print(f"Columnas disponibles: {list(df_processed.columns)}")
         
-        # Aplicar transformaciones
-        df_processed = self.create_technical_features(df_processed)
-        df_processed = self.create_temporal_features(df_processed, date_column)
-        df_processed = self.create_target(df_processed)
-        
-        # Obtener lista de columnas de features
-        self.feature_columns = self.get_feature_columns()
+        # Aplicar transformaciones (ta emite warnings de división por cero)
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore')
+            if self.backend == 'graph':
+                df_processed = self._apply_feature_graph(df_processed, date_column)
+            else:
+                df_processed = self.create_technical_features(df_processed)
+                df_processed = self.create_temporal_features(df_processed, date_column)
+                df_processed = self.create_target(df_processed)
+                # Obtener lista de columnas de features
+                self.feature_columns = self.get_feature_columns()
         
-        # Limpiar valores infinitos y NaN
-        df_processed = df_processed.replace([np.inf, -np.inf], np.nan)
-        
-        # Eliminar filas con NaN en features o target
         initial_shape = df_processed.shape[0]
-        df_processed = df_processed.dropna(subset=self.feature_columns + ['target_encoded'])
+        if self.compact:
+            # Máscara columna a columna: una sola copia (la del filtrado final)
+            valid = np.ones(initial_shape, dtype=bool)
+            for col in self.feature_columns + ['target_encoded']:
+                valid &= np.isfinite(df_processed[col].to_numpy())
+            df_processed = df_processed[valid]
+        else:
+            # Limpiar valores infinitos y NaN
+            df_processed = df_processed.replace([np.inf, -np.inf], np.nan)
+
+            # Eliminar filas con NaN en features o target
+            df_processed = df_processed.dropna(subset=self.feature_columns + ['target_encoded'])
         final_shape = df_processed.shape[0]
         
         print(f"\n📊 RESULTADOS DEL FEATURE ENGINEERING:")
@@ -195,11 +327,156 @@ class ForexFeatureEngineer:
         print(f"   - Filas finales: {final_shape}")
         print(f"   - Total features creadas: {len(self.feature_columns)}")
         
-        # Distribución del target
+        self._print_target_distribution(df_processed)
+        
+        return df_processed
+
+    def _apply_feature_graph(self, df_processed, date_column='date'):
+        """
+        Agrega a df_processed solo las features pedidas (más return_t1 y el target)
+        resolviendo el FeatureGraph; cada nodo se lee de la cache si sus entradas
+        y parámetros no cambiaron.
+        """
+        from modules.data.feature_graph import FeatureNodeCache, build_default_graph
+
+        if self.graph is None:
+            cache = (self.cache or FeatureNodeCache()) if self.use_cache else None
+            self.graph = build_default_graph(cache=cache)
+
+        self.feature_columns = self.features or self.get_feature_columns()
+        # Columnas en el orden del backend pandas (feature_names sale del orden del DataFrame)
+        order = TECHNICAL_ORDER + TEMPORAL_ORDER
+        targets = ([] if 'volume' in df_processed.columns else ['volume']) \
+            + sorted(self.feature_columns, key=lambda c: order.index(c) if c in order else len(order)) + ['return_t1', 'target_encoded']
+        hits, misses = self.graph.hits, self.graph.misses
+        computed = self.graph.compute(df_processed, targets, date_column)
+        print(f"Grafo de features: {self.graph.misses - misses} nodos calculados, "
+              f"{self.graph.hits - hits} desde cache")
+
+        if not pd.api.types.is_datetime64_any_dtype(df_processed[date_column]):
+            df_processed[date_column] = pd.to_datetime(df_processed[date_column])
+        for col in targets:
+            if col == 'target_encoded':
+                codes = computed[col].to_numpy()
+                df_processed['target'] = pd.Categorical.from_codes(codes, categories=TARGET_LABELS)
+                if not self.compact:
+                    df_processed['target'] = df_processed['target'].astype(str)
+                df_processed[col] = codes.astype(np.int8) if self.compact else codes
+            elif col in COMPACT_INT8_COLUMNS:
+                df_processed[col] = self._calendar(computed[col])
+            else:
+                df_processed[col] = self._store(computed[col])
+        return df_processed
+
+    def _prepare_features_polars(self, df, date_column='date', lazy=False, group_column=None):
+        """
+        Pipeline completo de feature engineering con un LazyFrame de Polars.
+        Acepta pandas DataFrame, polars DataFrame o LazyFrame y devuelve un
+        pandas DataFrame con el mismo índice y columnas que el backend pandas.
+        """
+        import polars as pl
+        from modules.data.pre_processing_polars import PolarsFeatureBuilder
+
+        self.feature_columns = self.get_feature_columns()
+
+        if isinstance(df, pd.DataFrame):
+            lf = pl.from_pandas(df.assign(__index=df.index)).lazy()
+        elif isinstance(df, pl.DataFrame):
+            lf = df.lazy()
+        else:
+            lf = df
+
+        lf = PolarsFeatureBuilder(group_column).build(lf, self.feature_columns, date_column)
+        if lazy:
+            return lf
+
+        result = lf.collect()
+        df_processed = result.to_pandas()
+        if '__index' in df_processed.columns:
+            df_processed = df_processed.set_index('__index')
+            df_processed.index.name = None
+        if self.compact:
+            df_processed = self.to_compact(df_processed)
+
+        print(f"\n📊 RESULTADOS DEL FEATURE ENGINEERING:")
+        print(f"   - Filas finales: {len(df_processed)}")
+        print(f"   - Total features creadas: {len(self.feature_columns)}")
+
+        self._print_target_distribution(df_processed)
+
+        return df_processed
+
+    def _print_target_distribution(self, df_processed):
+        """
+        Imprime la distribución del target
+        """
         target_dist = df_processed['target'].value_counts()
         print("\n🎯 DISTRIBUCIÓN DEL TARGET:")
         for label, count in target_dist.items():
             percentage = (count / len(df_processed)) * 100
             print(f"   - {label}: {count} ({percentage:.1f}%)")
-        
-        return df_processed
\ No newline at end of file
+
+    @classmethod
+    def check_graph_parity(cls, df, date_column='date'):
+        """
+        Compara el backend 'graph' contra el backend pandas sobre el mismo
+        histórico: mismas columnas en el mismo orden, mismas filas y mismos
+        valores. Devuelve el error absoluto máximo por feature y lanza
+        AssertionError si algo difiere.
+        """
+        reference = cls().prepare_features(df.copy(), date_column=date_column)
+        graph = cls(backend='graph', use_cache=False).prepare_features(df.copy(), date_column=date_column)
+
+        if list(reference.columns) != list(graph.columns):
+            raise AssertionError(f"El backend graph genera otras columnas u otro orden: {list(graph.columns)}")
+        if not reference.index.equals(graph.index):
+            raise AssertionError("El backend graph conserva filas distintas")
+        if not np.array_equal(reference['target_encoded'].to_numpy(), graph['target_encoded'].to_numpy()):
+            raise AssertionError("El backend graph cambia el target")
+
+        columns = cls().get_feature_columns() + ['return_t1']
+        expected = reference[columns].to_numpy(dtype=np.float64)
+        actual = graph[columns].to_numpy(dtype=np.float64)
+        errors = pd.Series(np.nanmax(np.abs(actual - expected), axis=0), index=columns)
+
+        mismatched = ~np.isclose(actual, expected, rtol=0, atol=0, equal_nan=True)
+        if mismatched.any():
+            column = columns[int(np.argmax(mismatched.any(axis=0)))]
+            raise AssertionError(
+                f"Backend graph distinto en '{column}' (error absoluto {errors[column]:.2e})"
+            )
+        return errors
+
+    @classmethod
+    def check_compact_precision(cls, df, date_column='date', rtol=1e-6, atol=1e-9):
+        """
+        Compara el modo compacto contra el modo float64 sobre el mismo histórico y
+        devuelve el error absoluto máximo por feature.
+
+        Las features se calculan en float64 y solo se redondean a float32 al
+        guardarlas, así que el error esperado es el de ese redondeo: relativo
+        <= 2**-24 (~6e-8) por valor. Se exige |a - b| <= atol + rtol * |b| con
+        rtol=1e-6, y que las filas conservadas y el target sean idénticos.
+        Lanza AssertionError si no se cumple.
+        """
+        reference = cls().prepare_features(df.copy(), date_column=date_column)
+        compact = cls(compact=True).prepare_features(df.copy(), date_column=date_column)
+
+        if not reference.index.equals(compact.index):
+            raise AssertionError("El modo compacto conserva filas distintas")
+        if not np.array_equal(reference['target_encoded'].to_numpy(), compact['target_encoded'].to_numpy()):
+            raise AssertionError("El modo compacto cambia el target")
+
+        columns = cls().get_feature_columns() + ['return_t1']
+        expected = reference[columns].to_numpy(dtype=np.float64)
+        actual = compact[columns].to_numpy(dtype=np.float64)
+        # return_t1 es NaN en la última barra (sin cierre T+1) en ambos modos
+        errors = pd.Series(np.nanmax(np.abs(actual - expected), axis=0), index=columns)
+
+        mismatched = ~np.isclose(actual, expected, rtol=rtol, atol=atol, equal_nan=True)
+        if mismatched.any():
+            column = columns[int(np.argmax(mismatched.any(axis=0)))]
+            raise AssertionError(
+                f"Modo compacto fuera de tolerancia en '{column}' (error absoluto {errors[column]:.2e})"
+            )
+        return errors
@@ -0,0 +1,188 @@
+import math
+
+import polars as pl
+
+from modules.data.pre_processing import TARGET_ORDER, TECHNICAL_ORDER, TEMPORAL_ORDER
+
+
+class PolarsFeatureBuilder:
+    """
+    Implementación de las features de ForexFeatureEngineer sobre un LazyFrame de Polars.
+
+    Todas las transformaciones se declaran como expresiones dentro de un único plan
+    lazy, de modo que el optimizador fusiona las ventanas móviles y las ejecuta en
+    paralelo sin copias intermedias del DataFrame. Si se indica `group_column`
+    (ej. 'symbol'), las ventanas se calculan por grupo con .over().
+    """
+
+    def __init__(self, group_column: str = None):
+        self.group_column = group_column
+
+    def _over(self, expr: pl.Expr) -> pl.Expr:
+        if self.group_column is None:
+            return expr
+        return expr.over(self.group_column)
+
+    def _row_number(self) -> pl.Expr:
+        return self._over(pl.int_range(pl.len()))
+
+    def _rolling_slope(self, column: str, window: int) -> pl.Expr:
+        """
+        Pendiente OLS móvil contra x = 0..window-1 como combinación lineal de shifts.
+        """
+        x_mean = (window - 1) / 2.0
+        sxx = window * (window * window - 1) / 12.0
+        terms = [
+            (k - x_mean) * pl.col(column).shift(window - 1 - k)
+            for k in range(window)
+        ]
+        return self._over(pl.sum_horizontal(terms) / sxx).alias(f"{column}_slope")
+
+    def create_technical_features(self, lf: pl.LazyFrame) -> pl.LazyFrame:
+        """
+        Crear features técnicas (equivalentes a las de ta) como expresiones lazy.
+        """
+        print("Creando features técnicas (polars)...")
+
+        columns = lf.collect_schema().names()
+        required_columns = ['open', 'high', 'low', 'close']
+        for col in required_columns:
+            if col not in columns:
+                raise ValueError(f"Columna requerida '{col}' no encontrada en el DataFrame")
+
+        if 'volume' not in columns:
+            print("⚠️  Columna 'volume' no encontrada. Creando volume sintético...")
+            lf = lf.with_columns(
+                (((pl.col('high') - pl.col('low')) / pl.col('close')) * 1000000).alias('volume')
+            )
+
+        close = pl.col('close')
+        prev_close = self._over(close.shift(1))
+        row = self._row_number()
+
+        # Bloque 1: columnas base (retornos, diferencias, true range)
+        lf = lf.with_columns(
+            self._over(close.pct_change()).alias('return_t'),
+            self._over(close.diff()).alias('_diff'),
+            pl.max_horizontal(
+                pl.col('high') - pl.col('low'),
+                (pl.col('high') - prev_close).abs(),
+                (pl.col('low') - prev_close).abs(),
+            ).alias('_true_range'),
+        )
+
+        diff = pl.col('_diff').fill_null(0.0)
+        up = pl.when(diff > 0).then(diff).otherwise(0.0)
+        down = pl.when(diff < 0).then(-diff).otherwise(0.0)
+        rsi_alpha = 1 / 14
+
+        # ATR de Wilder: semilla = media de los primeros 14 TR, luego ewm(alpha=1/14)
+        tr_seeded = (
+            pl.when(row < 13).then(None)
+            .when(row == 13).then(self._over(pl.col('_true_range').rolling_mean(14)))
+            .otherwise(pl.col('_true_range'))
+        )
+
+        # Bloque 2: indicadores (todas las ventanas en una sola proyección)
+        lf = lf.with_columns(
+            self._over(close.rolling_mean(30)).alias('SMA_30'),
+            self._over(close.rolling_mean(90)).alias('SMA_90'),
+            self._over(up.ewm_mean(alpha=rsi_alpha, adjust=False)).alias('_ema_up'),
+            self._over(down.ewm_mean(alpha=rsi_alpha, adjust=False)).alias('_ema_down'),
+            self._over(tr_seeded.ewm_mean(alpha=1 / 14, adjust=False)).alias('_atr'),
+            self._over(pl.col('return_t').rolling_std(30)).alias('volatility_30d'),
+            self._over(pl.col('return_t').rolling_std(10)).alias('volatility_rolling'),
+            (pl.col('volume') / self._over(pl.col('volume').rolling_mean(30))).alias('volume_ratio'),
+            self._rolling_slope('volume', 5).alias('volume_trend'),
+        )
+
+        # Bloque 3: features derivadas
+        lf = lf.with_columns(
+            (pl.col('SMA_30') - pl.col('SMA_90')).alias('SMA_crossover'),
+            (pl.col('SMA_30') / pl.col('SMA_90')).alias('sma_ratio'),
+            pl.when(row < 13).then(None)
+            .when(pl.col('_ema_down') == 0).then(100.0)
+            .otherwise(100 - (100 / (1 + pl.col('_ema_up') / pl.col('_ema_down'))))
+            .alias('RSI'),
+            # ta devuelve 0 (no NaN) antes de completar la ventana del ATR
+            pl.when(row < 13).then(0.0).otherwise(pl.col('_atr')).alias('ATR'),
+        )
+
+        return lf.drop(['_diff', '_true_range', '_ema_up', '_ema_down', '_atr'])
+
+    def create_temporal_features(self, lf: pl.LazyFrame, date_column: str = 'date') -> pl.LazyFrame:
+        """
+        Crear features temporales a partir de la columna de fecha.
+        """
+        print("Creando features temporales (polars)...")
+
+        schema = lf.collect_schema()
+        if date_column not in schema.names():
+            raise ValueError(f"Columna de fecha '{date_column}' no encontrada")
+
+        if not schema[date_column].is_temporal():
+            lf = lf.with_columns(pl.col(date_column).str.to_datetime())
+
+        date = pl.col(date_column)
+        lf = lf.with_columns(
+            date.dt.month().cast(pl.Int32).alias('month'),
+            date.dt.quarter().cast(pl.Int32).alias('quarter'),
+            (date.dt.weekday() - 1).cast(pl.Int32).alias('day_of_week'),  # 0=Lunes, 6=Domingo
+            (date.dt.date() == date.dt.month_end().dt.date()).cast(pl.Int64).alias('is_month_end'),
+        )
+
+        two_pi = 2 * math.pi
+        return lf.with_columns(
+            (two_pi * pl.col('month') / 12).sin().alias('month_sin'),
+            (two_pi * pl.col('month') / 12).cos().alias('month_cos'),
+            (two_pi * pl.col('day_of_week') / 7).sin().alias('day_sin'),
+            (two_pi * pl.col('day_of_week') / 7).cos().alias('day_cos'),
+        )
+
+    def create_target(self, lf: pl.LazyFrame) -> pl.LazyFrame:
+        """
+        Crear target de clasificación ternaria.
+        """
+        print("Creando variable target (polars)...")
+
+        lf = lf.with_columns(
+            (self._over(pl.col('close').shift(-1)) / pl.col('close') - 1).alias('return_t1')
+        )
+        return_t1 = pl.col('return_t1')
+        lf = lf.with_columns(
+            pl.when(return_t1 > 0.001).then(pl.lit('up'))
+            .when(return_t1 < -0.001).then(pl.lit('down'))
+            .otherwise(pl.lit('neutral'))
+            .alias('target')
+        )
+        target_map = {'down': 0, 'neutral': 1, 'up': 2}
+        return lf.with_columns(
+            pl.col('target').replace_strict(target_map, return_dtype=pl.Int64).alias('target_encoded')
+        )
+
+    def build(self, lf: pl.LazyFrame, feature_columns: list, date_column: str = 'date') -> pl.LazyFrame:
+        """
+        Plan lazy completo: features técnicas, temporales, target y limpieza de NaN/inf.
+        """
+        input_columns = lf.collect_schema().names()
+
+        lf = self.create_technical_features(lf)
+        lf = self.create_temporal_features(lf, date_column)
+        lf = self.create_target(lf)
+
+        # Mismo orden de columnas que el backend pandas
+        new_columns = [c for c in lf.collect_schema().names() if c not in input_columns]
+        if 'volume' in new_columns:
+            input_columns.append('volume')
+        ordered = [c for c in TECHNICAL_ORDER + TEMPORAL_ORDER + TARGET_ORDER if c in new_columns]
+        lf = lf.select(input_columns + ordered)
+
+        # Unificar NaN/inf con null para poder filtrar en un solo paso
+        float_columns = [
+            name for name, dtype in lf.collect_schema().items() if dtype.is_float()
+        ]
+        lf = lf.with_columns(
+            pl.when(pl.col(c).is_finite()).then(pl.col(c)).otherwise(None).alias(c)
+            for c in float_columns
+        )
+        return lf.drop_nulls(subset=feature_columns + ['target_encoded'])
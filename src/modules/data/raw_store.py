@@ -0,0 +1,232 @@
+import os
+import glob
+import logging
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+
+
+PRICE_COLUMNS = ["open", "high", "low", "close"]
+
+# upsert() compacta los deltas en un nuevo base al superar cualquiera de los dos umbrales
+MAX_DELTAS = 30
+MAX_DELTA_FRACTION = 0.25
+
+
+def drop_open_bar(df: pd.DataFrame, date_column: str = "date", now=None) -> pd.DataFrame:
+    """
+    Descarta las barras diarias todavía abiertas. FX_DAILY incluye la barra del
+    día UTC en curso con un cierre parcial que la API sigue revisando: una barra
+    con fecha D recién es final a partir de las 00:00 UTC de D+1.
+
+    Args:
+        now: Instante de referencia (por defecto ahora, UTC)
+    """
+    today = pd.Timestamp(now if now is not None else datetime.now(timezone.utc))
+    if today.tzinfo is not None:
+        today = today.tz_convert("UTC").tz_localize(None)
+    closed = pd.to_datetime(df[date_column]) < today.normalize()
+    if closed.all():
+        return df
+    logging.info(f"Se descartan {int((~closed).sum())} barras del día en curso (cierre parcial)")
+    return df[closed]
+
+
+class RawHistoryStore:
+    """
+    Store append-only del histórico crudo de un par.
+
+    El histórico se compone de un snapshot base más segmentos delta con solo
+    las barras nuevas de cada ingesta:
+
+        data/raw/<name>/base_<ts>.parquet
+        data/raw/<name>/delta_<ts>.parquet
+
+    La lectura concatena base + deltas y deduplica por timestamp (gana la
+    última escritura). upsert() agrega como delta solo las barras nuevas o
+    revisadas, sin borrar las anteriores a la ventana recibida, y compacta los
+    deltas en un nuevo base cuando se acumulan; rewrite() genera un nuevo base y
+    elimina los anteriores (snapshot inicial o compactación).
+    """
+
+    def __init__(self, name: str, raw_storage_root: str = "./data/raw/"):
+        self.name = name
+        self.store_dir = os.path.join(raw_storage_root, name)
+        os.makedirs(self.store_dir, exist_ok=True)
+
+    def _files(self, prefix: str) -> list:
+        return sorted(glob.glob(os.path.join(self.store_dir, f"{prefix}_*.parquet")))
+
+    def _segments(self) -> list:
+        """
+        Archivos vigentes: el último base y los deltas posteriores a él.
+        """
+        bases = self._files("base")
+        if not bases:
+            return []
+        base = bases[-1]
+        deltas = [d for d in self._files("delta") if os.path.basename(d)[6:] > os.path.basename(base)[5:]]
+        return [base] + deltas
+
+    def exists(self) -> bool:
+        return bool(self._files("base"))
+
+    def version(self) -> list:
+        """
+        Archivos vigentes (base + deltas): cambian con cada rewrite() o append(),
+        así que identifican el estado del histórico sin leerlo.
+        """
+        return [os.path.basename(path) for path in self._segments()]
+
+    def load(self) -> pd.DataFrame:
+        """
+        Devuelve el histórico completo deduplicado y ordenado por fecha.
+        """
+        segments = self._segments()
+        if not segments:
+            raise FileNotFoundError(f"No hay histórico crudo para '{self.name}' en {self.store_dir}")
+        df = pd.concat([pd.read_parquet(path) for path in segments], ignore_index=True)
+        df = df.drop_duplicates(subset="date", keep="last")
+        return df.sort_values("date").reset_index(drop=True)
+
+    def iter_chunks(self, chunk_size: int = 1_000_000):
+        """
+        Recorre el histórico en orden cronológico en bloques de hasta chunk_size
+        barras del base (más las barras de los deltas que caen en ese rango),
+        leyendo el base por row batches (sin cargarlo completo).
+        Igual que en load(), gana la última escritura de cada fecha: los deltas
+        (barras nuevas y revisadas, acotados por la ventana de la API) se leen
+        en memoria y reemplazan o intercalan sus barras en el bloque que corresponde.
+        """
+        import pyarrow.parquet as pq
+
+        segments = self._segments()
+        if not segments:
+            raise FileNotFoundError(f"No hay histórico crudo para '{self.name}' en {self.store_dir}")
+        overrides = None
+        if len(segments) > 1:
+            overrides = pd.concat([pd.read_parquet(path) for path in segments[1:]], ignore_index=True)
+            overrides = overrides.drop_duplicates(subset="date", keep="last").sort_values("date")
+            overrides = overrides.reset_index(drop=True)
+
+        consumed = 0
+        for batch in pq.ParquetFile(segments[0]).iter_batches(batch_size=chunk_size):
+            chunk = batch.to_pandas()
+            if overrides is not None and not chunk.empty:
+                end = int(overrides["date"].searchsorted(chunk["date"].iloc[-1], side="right"))
+                pending = overrides.iloc[consumed:end]
+                if not pending.empty:
+                    chunk = chunk[~chunk["date"].isin(pending["date"])]
+                    chunk = pd.concat([chunk, pending], ignore_index=True).sort_values("date", kind="stable")
+                consumed = max(consumed, end)
+            if not chunk.empty:
+                yield chunk.reset_index(drop=True)
+
+        if overrides is not None:
+            for start in range(consumed, len(overrides), chunk_size):
+                yield overrides.iloc[start:start + chunk_size].reset_index(drop=True)
+
+    def load_since(self, start_date) -> pd.DataFrame:
+        """
+        Barras con fecha >= start_date (filtro por row groups, sin leer todo el histórico).
+        """
+        start_date = pd.Timestamp(start_date)
+        frames = [pd.read_parquet(path, filters=[("date", ">=", start_date.to_pydatetime())])
+                  for path in self._segments()]
+        if not frames:
+            raise FileNotFoundError(f"No hay histórico crudo para '{self.name}' en {self.store_dir}")
+        df = pd.concat(frames, ignore_index=True).drop_duplicates(subset="date", keep="last")
+        return df.sort_values("date").reset_index(drop=True)
+
+    def last_date(self):
+        """
+        Última fecha almacenada, leyendo solo la columna 'date' de cada segmento.
+        """
+        import pyarrow.compute as pc
+        import pyarrow.parquet as pq
+
+        if not self.exists():
+            return None
+        return max(pd.Timestamp(pc.max(pq.read_table(path, columns=["date"])["date"]).as_py())
+                   for path in self._segments())
+
+    @staticmethod
+    def _stamp() -> str:
+        return datetime.now().strftime("%Y%m%d_%H%M%S_%f")
+
+    def rewrite(self, df: pd.DataFrame) -> str:
+        """
+        Escribe un snapshot base completo y elimina los archivos anteriores.
+        Descarta las barras que no estén en `df`: para actualizar usar upsert()
+        (la compactación pasa el histórico completo de load()).
+        """
+        old_files = self._files("base") + self._files("delta")
+        path = os.path.join(self.store_dir, f"base_{self._stamp()}.parquet")
+        df.sort_values("date").to_parquet(path, index=False)
+        for old in old_files:
+            os.remove(old)
+        logging.info(f"Histórico crudo reescrito en {path} ({len(df)} barras)")
+        return path
+
+    def append(self, df: pd.DataFrame) -> str:
+        """
+        Agrega un segmento delta con barras nuevas.
+        """
+        path = os.path.join(self.store_dir, f"delta_{self._stamp()}.parquet")
+        df.sort_values("date").to_parquet(path, index=False)
+        logging.info(f"Segmento delta agregado en {path} ({len(df)} barras)")
+        return path
+
+    def upsert(self, df: pd.DataFrame) -> tuple:
+        """
+        Upsert por fecha: agrega como delta las barras de `df` que no existían o
+        que existían con precios distintos. Las barras almacenadas fuera de la
+        ventana de `df` no se tocan.
+
+        Returns:
+            (barras nuevas, barras revisadas)
+        """
+        if not self.exists():
+            self.rewrite(df)
+            return len(df), 0
+        history = self.load_since(df["date"].min())
+        revisions = self.find_revisions(history, df)
+        is_new = ~df["date"].isin(history["date"])
+        delta = df[is_new | df["date"].isin(revisions["date"])]
+        if not delta.empty:
+            self.append(delta)
+            self.compact_if_needed()
+        return int(is_new.sum()), len(revisions)
+
+    def compact_if_needed(self, max_deltas: int = MAX_DELTAS, max_fraction: float = MAX_DELTA_FRACTION) -> bool:
+        """
+        Reescribe base + deltas como un único base (load() ya deduplicado) si hay
+        más de `max_deltas` deltas o si ocupan más de `max_fraction` del base,
+        para que las lecturas no abran una lista de archivos que crece con cada ingesta.
+
+        Returns:
+            True si compactó
+        """
+        segments = self._segments()
+        deltas = segments[1:]
+        if not deltas:
+            return False
+        delta_bytes = sum(os.path.getsize(path) for path in deltas)
+        if len(deltas) <= max_deltas and delta_bytes <= max_fraction * os.path.getsize(segments[0]):
+            return False
+        logging.info(f"Compactando {len(deltas)} deltas de '{self.name}' ({delta_bytes} bytes)")
+        self.rewrite(self.load())
+        return True
+
+    def find_revisions(self, history: pd.DataFrame, update: pd.DataFrame, rtol: float = 1e-9) -> pd.DataFrame:
+        """
+        Barras del update que ya existían en el histórico con precios distintos.
+        """
+        overlap = update.merge(history, on="date", suffixes=("", "_stored"))
+        if overlap.empty:
+            return overlap
+        changed = np.zeros(len(overlap), dtype=bool)
+        for col in PRICE_COLUMNS:
+            changed |= ~np.isclose(overlap[col], overlap[f"{col}_stored"], rtol=rtol, atol=0)
+        return overlap.loc[changed, ["date"] + PRICE_COLUMNS]
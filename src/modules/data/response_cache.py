@@ -0,0 +1,156 @@
+import os
+import json
+import time
+import hashlib
+import logging
+import threading
+from datetime import datetime, timedelta, timezone
+
+
+HTTP_CACHE_DIR = "data/cache/http"
+
+# Parámetros que no forman parte de la clave (credenciales)
+EXCLUDED_PARAMS = {"apikey", "api_key"}
+
+
+def next_daily_close(now: datetime = None, close_hour_utc: int = 0) -> datetime:
+    """
+    Próximo cierre diario (UTC). Los datos FX_DAILY solo cambian después de ese momento.
+    """
+    now = now or datetime.now(timezone.utc)
+    close = now.replace(hour=close_hour_utc, minute=0, second=0, microsecond=0)
+    if close <= now:
+        close += timedelta(days=1)
+    return close
+
+
+class ResponseCache:
+    """
+    Cache en disco de respuestas HTTP crudas de Alpha Vantage.
+
+    - Clave: hash de la URL y los parámetros del request (sin el API key).
+    - Expiración: por defecto en el próximo cierre diario (close_hour_utc);
+      con ttl_seconds se usa un TTL fijo.
+    - Evicción LRU por tamaño total (max_bytes), usando el mtime como último acceso.
+    - Contadores de hits / misses / evictions en stats().
+    """
+
+    def __init__(self, cache_dir: str = None, max_bytes: int = 512 * 1024 * 1024,
+                 ttl_seconds: int = None, close_hour_utc: int = 0):
+        self.cache_dir = cache_dir or os.getenv("HTTP_CACHE_DIR", HTTP_CACHE_DIR)
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.close_hour_utc = close_hour_utc
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_key(url: str, params: dict) -> str:
+        cleaned = {k: v for k, v in params.items() if k.lower() not in EXCLUDED_PARAMS}
+        payload = json.dumps({"url": url, "params": cleaned}, sort_keys=True)
+        return hashlib.sha256(payload.encode()).hexdigest()
+
+    def _paths(self, key: str):
+        return (os.path.join(self.cache_dir, f"{key}.body"),
+                os.path.join(self.cache_dir, f"{key}.meta.json"))
+
+    def _expires_at(self) -> float:
+        if self.ttl_seconds is not None:
+            return time.time() + self.ttl_seconds
+        return next_daily_close(close_hour_utc=self.close_hour_utc).timestamp()
+
+    def get(self, url: str, params: dict):
+        """
+        Devuelve el cuerpo cacheado (str) o None si no existe o expiró.
+        """
+        key = self.make_key(url, params)
+        body_path, meta_path = self._paths(key)
+        try:
+            with open(meta_path) as f:
+                meta = json.load(f)
+            if meta["expires_at"] <= time.time():
+                self._remove(key)
+                raise FileNotFoundError(key)
+            with open(body_path, encoding="utf-8") as f:
+                body = f.read()
+        except (FileNotFoundError, json.JSONDecodeError, KeyError):
+            with self._lock:
+                self.misses += 1
+            return None
+
+        # Marca de último acceso para el LRU
+        os.utime(meta_path)
+        with self._lock:
+            self.hits += 1
+        logging.info(f"Cache HIT {key[:12]} ({meta.get('params')})")
+        return body
+
+    def put(self, url: str, params: dict, body: str):
+        """
+        Guarda el cuerpo de la respuesta de forma atómica y aplica la evicción LRU.
+        """
+        key = self.make_key(url, params)
+        body_path, meta_path = self._paths(key)
+        meta = {
+            "params": {k: v for k, v in params.items() if k.lower() not in EXCLUDED_PARAMS},
+            "created_at": time.time(),
+            "expires_at": self._expires_at(),
+            "size": len(body.encode("utf-8")),
+        }
+
+        for path, content in ((body_path, body), (meta_path, json.dumps(meta))):
+            tmp_path = f"{path}.{threading.get_ident()}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                f.write(content)
+            os.replace(tmp_path, path)
+
+        self._evict()
+
+    def _remove(self, key: str):
+        for path in self._paths(key):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    def _evict(self):
+        entries = []
+        total = 0
+        for name in os.listdir(self.cache_dir):
+            if not name.endswith(".meta.json"):
+                continue
+            key = name[: -len(".meta.json")]
+            body_path, meta_path = self._paths(key)
+            try:
+                size = os.path.getsize(body_path)
+                last_access = os.path.getmtime(meta_path)
+            except FileNotFoundError:
+                continue
+            entries.append((last_access, key, size))
+            total += size
+
+        entries.sort()
+        while total > self.max_bytes and entries:
+            _, key, size = entries.pop(0)
+            self._remove(key)
+            total -= size
+            with self._lock:
+                self.evictions += 1
+
+    def clear(self):
+        for name in os.listdir(self.cache_dir):
+            os.remove(os.path.join(self.cache_dir, name))
+
+    def stats(self) -> dict:
+        with self._lock:
+            requests = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / requests if requests else 0.0,
+            }
@@ -0,0 +1,71 @@
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+
+
+# Cantidad de ventanas procesadas por bloque (acota la memoria temporal)
+CHUNK_SIZE = 1 << 16
+
+
+def rolling_ols(series, window: int, chunk_size: int = CHUNK_SIZE) -> pd.DataFrame:
+    """
+    Regresión lineal móvil (OLS) vectorizada sobre una serie.
+
+    Para cada ventana de `window` valores ajusta y = intercept + slope * x con
+    x = 0, 1, ..., window - 1 (la misma convención que np.polyfit sobre
+    np.arange(window)) y devuelve pendiente, intercepto y R² en una sola pasada.
+
+    Las ventanas se obtienen con sliding_window_view (sin copias) y se centran
+    bloque a bloque, lo que evita la cancelación numérica de las sumas acumuladas
+    en historias largas.
+
+    Args:
+        series: pd.Series (o array 1D) con los valores a regresar
+        window: Tamaño de la ventana móvil
+        chunk_size: Ventanas procesadas por bloque
+
+    Returns:
+        DataFrame con columnas 'slope', 'intercept' y 'r2', alineado con la serie.
+        Las primeras window - 1 filas y las ventanas con NaN quedan en NaN.
+    """
+    if window < 2:
+        raise ValueError("La ventana debe ser de al menos 2 observaciones")
+
+    index = series.index if isinstance(series, pd.Series) else None
+    values = np.asarray(series, dtype=np.float64)
+    n = values.shape[0]
+
+    slope = np.full(n, np.nan)
+    intercept = np.full(n, np.nan)
+    r2 = np.full(n, np.nan)
+
+    if n >= window:
+        x = np.arange(window, dtype=np.float64)
+        x_mean = x.mean()
+        x_centered = x - x_mean
+        sxx = x_centered @ x_centered
+
+        windows = sliding_window_view(values, window)
+        for start in range(0, windows.shape[0], chunk_size):
+            block = windows[start:start + chunk_size]
+            y_mean = block.mean(axis=1)
+            y_centered = block - y_mean[:, None]
+
+            b = (y_centered @ x_centered) / sxx
+            sst = np.einsum("ij,ij->i", y_centered, y_centered)
+
+            out = slice(start + window - 1, start + window - 1 + block.shape[0])
+            slope[out] = b
+            intercept[out] = y_mean - b * x_mean
+            with np.errstate(divide="ignore", invalid="ignore"):
+                r2[out] = np.where(sst > 0, (b * b * sxx) / sst, np.nan)
+
+    return pd.DataFrame({"slope": slope, "intercept": intercept, "r2": r2}, index=index)
+
+
+def rolling_slope(series, window: int) -> pd.Series:
+    """
+    Atajo que devuelve solo la pendiente de rolling_ols.
+    """
+    result = rolling_ols(series, window)
+    return result["slope"].rename(getattr(series, "name", None))
@@ -0,0 +1,420 @@
+import os
+import json
+import math
+import logging
+from collections import deque
+
+import numpy as np
+import pandas as pd
+
+from modules.data.pre_processing import ForexFeatureEngineer
+from modules.data.raw_store import drop_open_bar
+
+
+STATE_DIR = "artifacts/state"
+STATE_VERSION = 1
+
+
+class RollingWindow:
+    """
+    Ventana móvil de tamaño fijo con suma y suma de cuadrados acumuladas.
+
+    Cada push es O(1). Para acotar el error de redondeo de las sumas
+    corridas, se recalculan desde el buffer cada `window` inserciones
+    (costo amortizado O(1)).
+    """
+
+    def __init__(self, window: int, values=None):
+        self.window = window
+        self.buffer = deque(maxlen=window)
+        self.total = 0.0
+        self.total_sq = 0.0
+        self._pushes = 0
+        for value in values or []:
+            self.push(value)
+
+    def push(self, value: float):
+        if len(self.buffer) == self.window:
+            old = self.buffer[0]
+            self.total -= old
+            self.total_sq -= old * old
+        self.buffer.append(value)
+        self.total += value
+        self.total_sq += value * value
+
+        self._pushes += 1
+        if self._pushes >= self.window:
+            self._resync()
+
+    def _resync(self):
+        self.total = math.fsum(self.buffer)
+        self.total_sq = math.fsum(v * v for v in self.buffer)
+        self._pushes = 0
+
+    @property
+    def full(self) -> bool:
+        return len(self.buffer) == self.window
+
+    def mean(self) -> float:
+        if not self.full:
+            return np.nan
+        return self.total / self.window
+
+    def std(self) -> float:
+        """Desvío estándar muestral (ddof=1), igual que pandas rolling().std()."""
+        if not self.full:
+            return np.nan
+        n = self.window
+        var = (self.total_sq - self.total * self.total / n) / (n - 1)
+        return math.sqrt(max(var, 0.0))
+
+    def slope(self) -> float:
+        """Pendiente OLS de la ventana contra x = 0..window-1."""
+        if not self.full:
+            return np.nan
+        n = self.window
+        x_mean = (n - 1) / 2.0
+        sxx = n * (n * n - 1) / 12.0
+        y_mean = self.total / n
+        sxy = sum((i - x_mean) * (v - y_mean) for i, v in enumerate(self.buffer))
+        return sxy / sxx
+
+
+class StreamingFeatureEngine:
+    """
+    Motor de features incremental para la inferencia diaria.
+
+    Mantiene el estado de las ventanas móviles (SMAs, volatilidades, volumen),
+    los acumuladores de Wilder del RSI y el ATR y el último cierre, de modo que
+    cada nueva barra actualiza todas las features de get_feature_columns() en O(1)
+    sin volver a procesar el histórico.
+
+    El estado se guarda como JSON junto a los artifacts del modelo.
+    """
+
+    SMA_FAST = 30
+    SMA_SLOW = 90
+    RSI_WINDOW = 14
+    ATR_WINDOW = 14
+    VOL_LONG = 30
+    VOL_SHORT = 10
+    VOLUME_WINDOW = 30
+    VOLUME_TREND_WINDOW = 5
+
+    def __init__(self, symbol: str = "EURGBP"):
+        self.symbol = symbol
+        self.feature_columns = ForexFeatureEngineer().get_feature_columns()
+
+        self.n_bars = 0
+        self.last_date = None
+        self.prev_close = None
+        self.last_features = None
+
+        self.close_fast = RollingWindow(self.SMA_FAST)
+        self.close_slow = RollingWindow(self.SMA_SLOW)
+        self.returns_long = RollingWindow(self.VOL_LONG)
+        self.returns_short = RollingWindow(self.VOL_SHORT)
+        self.volume_long = RollingWindow(self.VOLUME_WINDOW)
+        self.volume_trend = RollingWindow(self.VOLUME_TREND_WINDOW)
+
+        # Wilder (RSI): ewm(alpha=1/window, adjust=False)
+        self.rsi_up = None
+        self.rsi_down = None
+
+        # Wilder (ATR): primera media simple de los TR, luego suavizado
+        self.atr = None
+        self.atr_seed = []
+
+    # ------------------------------------------------------------------
+    # Actualización
+    # ------------------------------------------------------------------
+    def update(self, bar) -> dict:
+        """
+        Incorpora una nueva barra (dict o fila con date, open, high, low, close
+        y opcionalmente volume) y devuelve las features de esa barra.
+
+        Las barras con fecha igual o anterior a la última procesada se ignoran
+        y devuelven None: solo se deben pasar barras cerradas (ver drop_open_bar).
+        """
+        date = pd.Timestamp(bar["date"])
+        if self.last_date is not None and date <= self.last_date:
+            if date == self.last_date and not math.isclose(float(bar["close"]), self.prev_close, rel_tol=1e-9):
+                logging.warning(f"Barra {date.date()} de {self.symbol} revisada después de procesarla; se ignora.")
+            else:
+                logging.info(f"Barra {date.date()} ya procesada para {self.symbol}, se ignora.")
+            return None
+
+        open_ = float(bar["open"])
+        high = float(bar["high"])
+        low = float(bar["low"])
+        close = float(bar["close"])
+        volume = bar.get("volume") if hasattr(bar, "get") else None
+        if volume is None or pd.isna(volume):
+            # Mismo volume sintético que ForexFeatureEngineer
+            volume = ((high - low) / close) * 1000000
+        volume = float(volume)
+
+        # Retorno del día
+        if self.prev_close is None:
+            ret = np.nan
+            true_range = high - low
+            diff = 0.0
+        else:
+            ret = close / self.prev_close - 1
+            true_range = max(high - low, abs(high - self.prev_close), abs(low - self.prev_close))
+            diff = close - self.prev_close
+
+        # SMAs
+        self.close_fast.push(close)
+        self.close_slow.push(close)
+
+        # Volatilidades (solo con retornos definidos, como rolling().std())
+        if not np.isnan(ret):
+            self.returns_long.push(ret)
+            self.returns_short.push(ret)
+
+        # Volumen
+        self.volume_long.push(volume)
+        self.volume_trend.push(volume)
+
+        # RSI
+        up = diff if diff > 0 else 0.0
+        down = -diff if diff < 0 else 0.0
+        alpha = 1.0 / self.RSI_WINDOW
+        if self.rsi_up is None:
+            self.rsi_up, self.rsi_down = up, down
+        else:
+            self.rsi_up = (1 - alpha) * self.rsi_up + alpha * up
+            self.rsi_down = (1 - alpha) * self.rsi_down + alpha * down
+
+        # ATR
+        if self.atr is None:
+            self.atr_seed.append(true_range)
+            if len(self.atr_seed) == self.ATR_WINDOW:
+                self.atr = float(np.mean(self.atr_seed))
+                self.atr_seed = []
+        else:
+            self.atr = (self.atr * (self.ATR_WINDOW - 1) + true_range) / float(self.ATR_WINDOW)
+
+        self.n_bars += 1
+        self.prev_close = close
+        self.last_date = date
+
+        features = {
+            "date": date,
+            "open": open_,
+            "high": high,
+            "low": low,
+            "close": close,
+            "volume": volume,
+        }
+        features.update(self._technical_features(ret))
+        features.update(self._temporal_features(date))
+        self.last_features = features
+        return features
+
+    def _technical_features(self, ret: float) -> dict:
+        sma_30 = self.close_fast.mean()
+        sma_90 = self.close_slow.mean()
+
+        if self.n_bars >= self.RSI_WINDOW:
+            if self.rsi_down == 0:
+                rsi = 100.0
+            else:
+                rsi = 100 - (100 / (1 + self.rsi_up / self.rsi_down))
+        else:
+            rsi = np.nan
+
+        volume_mean = self.volume_long.mean()
+        last_volume = self.volume_long.buffer[-1]
+
+        return {
+            "SMA_30": sma_30,
+            "SMA_90": sma_90,
+            "SMA_crossover": sma_30 - sma_90,
+            "sma_ratio": sma_30 / sma_90,
+            "RSI": rsi,
+            # ta devuelve 0 (no NaN) antes de completar la ventana del ATR
+            "ATR": self.atr if self.atr is not None else 0.0,
+            "volatility_30d": self.returns_long.std(),
+            "volatility_rolling": self.returns_short.std(),
+            "volume_ratio": last_volume / volume_mean,
+            "volume_trend": self.volume_trend.slope(),
+            "return_t": ret,
+        }
+
+    @staticmethod
+    def _temporal_features(date: pd.Timestamp) -> dict:
+        month = date.month
+        day_of_week = date.dayofweek
+        return {
+            "month": month,
+            "quarter": date.quarter,
+            "day_of_week": day_of_week,
+            "is_month_end": int(date.is_month_end),
+            "month_sin": np.sin(2 * np.pi * month / 12),
+            "month_cos": np.cos(2 * np.pi * month / 12),
+            "day_sin": np.sin(2 * np.pi * day_of_week / 7),
+            "day_cos": np.cos(2 * np.pi * day_of_week / 7),
+        }
+
+    @property
+    def is_ready(self) -> bool:
+        """True cuando todas las ventanas están completas (features sin NaN)."""
+        return self.close_slow.full and self.returns_long.full
+
+    def update_many(self, df: pd.DataFrame, date_column: str = "date") -> pd.DataFrame:
+        """
+        Procesa en orden todas las barras de un DataFrame y devuelve sus features.
+        """
+        rows = []
+        for record in df.sort_values(date_column).to_dict("records"):
+            record["date"] = record[date_column]
+            features = self.update(record)
+            if features is not None:
+                rows.append(features)
+        return pd.DataFrame(rows)
+
+    @classmethod
+    def from_history(cls, df: pd.DataFrame, symbol: str = "EURGBP", date_column: str = "date", now=None):
+        """
+        Crea el motor y lo calienta con el histórico completo, sin la barra del
+        día en curso: su versión final se procesa cuando llega, al día siguiente.
+        """
+        engine = cls(symbol=symbol)
+        engine.update_many(drop_open_bar(df, date_column, now=now), date_column=date_column)
+        return engine
+
+    # ------------------------------------------------------------------
+    # Persistencia
+    # ------------------------------------------------------------------
+    def get_state(self) -> dict:
+        windows = {
+            name: list(getattr(self, name).buffer)
+            for name in ("close_fast", "close_slow", "returns_long",
+                         "returns_short", "volume_long", "volume_trend")
+        }
+        return {
+            "version": STATE_VERSION,
+            "symbol": self.symbol,
+            "n_bars": self.n_bars,
+            "last_date": self.last_date.isoformat() if self.last_date is not None else None,
+            "prev_close": self.prev_close,
+            "windows": windows,
+            "rsi_up": self.rsi_up,
+            "rsi_down": self.rsi_down,
+            "atr": self.atr,
+            "atr_seed": self.atr_seed,
+            "last_features": self._serialize_features(self.last_features),
+        }
+
+    @staticmethod
+    def _serialize_features(features):
+        if features is None:
+            return None
+        return {k: (v.isoformat() if isinstance(v, pd.Timestamp) else float(v)) for k, v in features.items()}
+
+    @classmethod
+    def from_state(cls, state: dict):
+        if state.get("version") != STATE_VERSION:
+            raise ValueError(f"Versión de estado no soportada: {state.get('version')}")
+
+        engine = cls(symbol=state["symbol"])
+        engine.n_bars = state["n_bars"]
+        engine.last_date = pd.Timestamp(state["last_date"]) if state["last_date"] else None
+        engine.prev_close = state["prev_close"]
+        for name, values in state["windows"].items():
+            window = getattr(engine, name)
+            setattr(engine, name, RollingWindow(window.window, values))
+        engine.rsi_up = state["rsi_up"]
+        engine.rsi_down = state["rsi_down"]
+        engine.atr = state["atr"]
+        engine.atr_seed = state["atr_seed"]
+        last_features = state.get("last_features")
+        if last_features is not None:
+            last_features["date"] = pd.Timestamp(last_features["date"])
+        engine.last_features = last_features
+        return engine
+
+    @staticmethod
+    def state_path(symbol: str, state_dir: str = STATE_DIR) -> str:
+        return os.path.join(state_dir, f"feature_state_{symbol.lower()}.json")
+
+    def save(self, state_dir: str = STATE_DIR) -> str:
+        os.makedirs(state_dir, exist_ok=True)
+        path = self.state_path(self.symbol, state_dir)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self.get_state(), f)
+        os.replace(tmp_path, path)
+        logging.info(f"Estado de features guardado en {path}")
+        return path
+
+    @classmethod
+    def load(cls, symbol: str, state_dir: str = STATE_DIR):
+        path = cls.state_path(symbol, state_dir)
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"No existe estado de features para {symbol} en {state_dir}")
+        with open(path) as f:
+            return cls.from_state(json.load(f))
+
+    # ------------------------------------------------------------------
+    # Verificación
+    # ------------------------------------------------------------------
+    @classmethod
+    def compare_with_batch(cls, df: pd.DataFrame, date_column: str = "date",
+                           rtol: float = 1e-9, atol: float = 1e-12) -> pd.Series:
+        """
+        Calcula las features en batch (ForexFeatureEngineer) y en streaming sobre
+        el mismo histórico y devuelve el error absoluto máximo por feature.
+        Lanza AssertionError si alguna no cumple |a - b| <= atol + rtol * |b|.
+        """
+        batch = ForexFeatureEngineer().prepare_features(df, date_column=date_column)
+        streamed = cls().update_many(df, date_column=date_column)
+        return cls._compare(batch, streamed, date_column, rtol, atol)
+
+    @classmethod
+    def compare_revised_last_bar(cls, df: pd.DataFrame, date_column: str = "date",
+                                 rtol: float = 1e-9, atol: float = 1e-12) -> pd.Series:
+        """
+        Simula la barra del día en curso: el motor se calienta (from_history)
+        con el histórico hasta la anteúltima barra de `df` tal como se ve ese
+        día, con un cierre parcial; al día siguiente recibe su versión final y
+        la barra nueva. Las features de la barra revisada deben coincidir con
+        el batch sobre el histórico final (misma tolerancia que compare_with_batch).
+        """
+        df = df.sort_values(date_column).reset_index(drop=True)
+        seen = df.iloc[:-1].copy()
+        open_date = pd.Timestamp(seen[date_column].iloc[-1])
+        seen.loc[seen.index[-1], "close"] = seen["open"].iloc[-1]
+
+        engine = cls.from_history(seen, date_column=date_column, now=open_date)
+        if engine.last_date is not None and engine.last_date >= open_date:
+            raise AssertionError(f"El estado incluye la barra abierta {open_date.date()}")
+        streamed = engine.update_many(df.iloc[-2:], date_column=date_column)
+
+        batch = ForexFeatureEngineer().prepare_features(df, date_column=date_column)
+        batch = batch[pd.to_datetime(batch[date_column]) == open_date]
+        if batch.empty:
+            raise ValueError(f"El batch no tiene features para {open_date.date()}")
+        return cls._compare(batch, streamed, date_column, rtol, atol)
+
+    @staticmethod
+    def _compare(batch: pd.DataFrame, streamed: pd.DataFrame, date_column: str,
+                 rtol: float, atol: float) -> pd.Series:
+        streamed.index = pd.to_datetime(streamed["date"])
+
+        batch_dates = pd.to_datetime(batch[date_column])
+        columns = ForexFeatureEngineer().get_feature_columns()
+        expected = batch[columns].to_numpy(dtype=np.float64)
+        actual = streamed.loc[batch_dates, columns].to_numpy(dtype=np.float64)
+
+        errors = pd.Series(np.max(np.abs(actual - expected), axis=0), index=columns)
+
+        mismatched = ~np.isclose(actual, expected, rtol=rtol, atol=atol)
+        if mismatched.any():
+            column = columns[int(np.argmax(mismatched.any(axis=0)))]
+            raise AssertionError(
+                f"Streaming y batch difieren en '{column}' (error absoluto {errors[column]:.2e})"
+            )
+        return errors
@@ -1,65 +1,230 @@
 import os
+import shutil
 import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
 from datetime import datetime
 
+
+# Columnas de partición del store (hive: symbol=EURGBP/year=2024)
+PARTITION_SCHEMA = pa.schema([("symbol", pa.string()), ("year", pa.int32())])
+PARTITION_COLUMNS = PARTITION_SCHEMA.names
+
+
 class FeatureStoreManager:
     """
-    Clase para gestionar el almacenamiento y carga de features preprocesados
+    Clase para gestionar el almacenamiento y carga de features preprocesados.
+
+    Los features se guardan como un dataset Parquet (compresión zstd) particionado
+    por símbolo y año, con tipos preservados (la columna de fecha vuelve como datetime).
+    Cada versión es un directorio propio:
+
+        data/preprocessed/<name>/<version>/symbol=EURGBP/year=2024/part-0.parquet
+
+    Las lecturas permiten proyectar columnas y filtrar por símbolo y rango de fechas,
+    de modo que solo se leen las particiones y row groups necesarios.
     """
 
-    def __init__(self, root_path: str):
+    def __init__(self, root_path: str, compression: str = "zstd"):
         self.root_path = root_path
         self.preprocessed_dir = os.path.join(root_path, "data", "preprocessed")
+        self.compression = compression
         os.makedirs(self.preprocessed_dir, exist_ok=True)
 
-    def _generate_filename(self, name: str = "forex_features", versioned: bool = True) -> str:
+    def _dataset_dir(self, name: str) -> str:
+        return os.path.join(self.preprocessed_dir, name)
+
+    def _generate_version(self, versioned: bool = True) -> str:
         """
-        Genera el nombre de archivo (con versión timestamp opcional)
+        Genera el nombre de la versión (timestamp) o 'current' si no se versiona
         """
         if versioned:
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            filename = f"{name}_{timestamp}.csv"
-        else:
-            filename = f"{name}.csv"
-        return os.path.join(self.preprocessed_dir, filename)
+            return datetime.now().strftime("%Y%m%d_%H%M%S")
+        return "current"
 
-    def save_features(self, df: pd.DataFrame, name: str = "forex_features", versioned: bool = True) -> str:
+    def _to_table(self, df: pd.DataFrame, symbol: str, date_column: str) -> pa.Table:
         """
-        Guarda el DataFrame de features como CSV.
+        Convierte el DataFrame a una tabla Arrow tipada con las columnas de partición.
         """
-        filepath = self._generate_filename(name, versioned)
-        df.to_csv(filepath, index=False)
-        print(f"Features guardados en: {filepath}")
-        return filepath
+        if date_column not in df.columns:
+            raise ValueError(f"Columna de fecha '{date_column}' no encontrada")
+
+        dates = df[date_column]
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        if not pd.api.types.is_datetime64_any_dtype(dates):
+            # Fechas como string (ej. CSV) -> timestamp tipado
+            dates = pd.to_datetime(dates)
+            date_index = table.schema.get_field_index(date_column)
+            table = table.set_column(date_index, date_column, pa.array(dates))
+
+        symbols = df["symbol"] if "symbol" in df.columns else pd.Series(symbol, index=df.index)
+        if "symbol" in df.columns:
+            table = table.drop(["symbol"])
+        table = table.append_column("symbol", pa.array(symbols.astype(str), type=pa.string()))
+        table = table.append_column("year", pa.array(dates.dt.year.to_numpy(), type=pa.int32()))
+        return table
+
+    def save_features(self, df: pd.DataFrame, name: str = "forex_features", versioned: bool = True,
+                      symbol: str = "EURGBP", date_column: str = "date") -> str:
+        """
+        Guarda el DataFrame de features como dataset Parquet particionado por símbolo y año.
+        Si el DataFrame tiene columna 'symbol' se usa esa; si no, el parámetro `symbol`.
+
+        Returns:
+            Ruta del directorio de la versión guardada
+        """
+        version = self._generate_version(versioned)
+        version_dir = os.path.join(self._dataset_dir(name), version)
+
+        table = self._to_table(df, symbol, date_column)
+        ds.write_dataset(
+            table,
+            version_dir,
+            format="parquet",
+            partitioning=ds.partitioning(PARTITION_SCHEMA, flavor="hive"),
+            existing_data_behavior="delete_matching",
+            file_options=ds.ParquetFileFormat().make_write_options(compression=self.compression),
+            basename_template="part-{i}.parquet",
+        )
+        print(f"Features guardados en: {version_dir}")
+        return version_dir
+
+    def create_version(self, name: str = "forex_features", versioned: bool = True) -> str:
+        """
+        Crea un directorio de versión vacío para escribir por partes con append_features.
+        Si no se versiona, se reemplaza el contenido de 'current'.
+        """
+        version_dir = os.path.join(self._dataset_dir(name), self._generate_version(versioned))
+        if not versioned:
+            shutil.rmtree(version_dir, ignore_errors=True)
+        os.makedirs(version_dir, exist_ok=True)
+        return version_dir
+
+    def append_features(self, df: pd.DataFrame, version_dir: str, part: int, symbol: str = "EURGBP",
+                        date_column: str = "date") -> int:
+        """
+        Agrega un bloque de features a una versión existente (ej. un chunk del
+        procesamiento out-of-core) sin leer ni reescribir lo ya guardado.
+        Cada bloque escribe archivos propios: part-<symbol>-<part>-<i>.parquet.
+
+        Returns:
+            Cantidad de filas escritas
+        """
+        if df.empty:
+            return 0
+        table = self._to_table(df, symbol, date_column)
+        ds.write_dataset(
+            table,
+            version_dir,
+            format="parquet",
+            partitioning=ds.partitioning(PARTITION_SCHEMA, flavor="hive"),
+            existing_data_behavior="overwrite_or_ignore",
+            file_options=ds.ParquetFileFormat().make_write_options(compression=self.compression),
+            basename_template=f"part-{symbol}-{part}-{{i}}.parquet",
+        )
+        return len(df)
 
     def list_feature_versions(self, name: str = "forex_features") -> list:
         """
-        Lista todas las versiones guardadas de un dataset de features.
+        Lista todas las versiones guardadas de un dataset de features (más reciente primero).
+        Incluye los CSV del formato anterior si existen.
         """
-        files = [
+        versions = []
+        dataset_dir = self._dataset_dir(name)
+        if os.path.isdir(dataset_dir):
+            versions = [
+                v for v in os.listdir(dataset_dir)
+                if os.path.isdir(os.path.join(dataset_dir, v))
+            ]
+        # Por fecha de escritura: 'current' (no versionado) compite con los timestamps
+        versions.sort(key=lambda v: os.path.getmtime(os.path.join(dataset_dir, v)), reverse=True)
+
+        legacy = [
             f for f in os.listdir(self.preprocessed_dir)
             if f.startswith(name) and f.endswith(".csv")
         ]
-        files.sort(reverse=True)
-        return files
+        legacy.sort(reverse=True)
+        return versions + legacy
+
+    def _read(self, path: str, columns=None, symbols=None, start_date=None, end_date=None,
+              date_column: str = "date") -> pd.DataFrame:
+        """
+        Lee una versión aplicando proyección de columnas y filtros (predicate pushdown).
+        """
+        if path.endswith(".csv"):
+            df = pd.read_csv(path, usecols=columns)
+            if date_column in df.columns:
+                df[date_column] = pd.to_datetime(df[date_column])
+                if start_date is not None:
+                    df = df[df[date_column] >= pd.Timestamp(start_date)]
+                if end_date is not None:
+                    df = df[df[date_column] <= pd.Timestamp(end_date)]
+            return df.reset_index(drop=True)
+
+        dataset = ds.dataset(path, format="parquet",
+                             partitioning=ds.partitioning(PARTITION_SCHEMA, flavor="hive"))
+
+        filters = []
+        if symbols is not None:
+            symbols = [symbols] if isinstance(symbols, str) else list(symbols)
+            filters.append(ds.field("symbol").isin(symbols))
+        if start_date is not None:
+            start_date = pd.Timestamp(start_date)
+            filters.append(ds.field("year") >= start_date.year)
+            filters.append(ds.field(date_column) >= pa.scalar(start_date.to_pydatetime()))
+        if end_date is not None:
+            end_date = pd.Timestamp(end_date)
+            filters.append(ds.field("year") <= end_date.year)
+            filters.append(ds.field(date_column) <= pa.scalar(end_date.to_pydatetime()))
 
-    def load_latest_features(self, name: str = "forex_features") -> pd.DataFrame:
+        expression = None
+        for f in filters:
+            expression = f if expression is None else expression & f
+
+        if columns is None:
+            read_columns = [c for c in dataset.schema.names if c not in PARTITION_COLUMNS]
+        else:
+            read_columns = list(columns)
+
+        table = dataset.to_table(columns=read_columns, filter=expression)
+        df = table.to_pandas()
+        if date_column in df.columns:
+            df = df.sort_values(date_column, kind="stable").reset_index(drop=True)
+        return df
+
+    def load_latest_features(self, name: str = "forex_features", columns=None, symbols=None,
+                             start_date=None, end_date=None, date_column: str = "date") -> pd.DataFrame:
         """
-        Carga el CSV más reciente (última versión).
+        Carga la versión más reciente.
+
+        Args:
+            columns: Columnas a leer (por defecto todas menos las de partición)
+            symbols: Símbolo o lista de símbolos a leer
+            start_date, end_date: Rango de fechas (inclusive) sobre `date_column`
         """
-        files = self.list_feature_versions(name)
-        if not files:
+        versions = self.list_feature_versions(name)
+        if not versions:
             raise FileNotFoundError(f"No se encontraron versiones para '{name}' en {self.preprocessed_dir}")
-        latest_file = os.path.join(self.preprocessed_dir, files[0])
-        print(f"Cargando última versión: {latest_file}")
-        return pd.read_csv(latest_file)
+        return self.load_specific_version(versions[0], name, columns, symbols, start_date, end_date, date_column)
 
-    def load_specific_version(self, filename: str) -> pd.DataFrame:
+    def load_specific_version(self, version: str, name: str = "forex_features", columns=None, symbols=None,
+                              start_date=None, end_date=None, date_column: str = "date") -> pd.DataFrame:
         """
-        Carga una versión específica del archivo de features.
+        Carga una versión específica (directorio de versión o CSV del formato anterior).
         """
-        filepath = os.path.join(self.preprocessed_dir, filename)
+        if version.endswith(".csv"):
+            filepath = os.path.join(self.preprocessed_dir, version)
+        else:
+            filepath = os.path.join(self._dataset_dir(name), version)
         if not os.path.exists(filepath):
-            raise FileNotFoundError(f"El archivo {filename} no existe en {self.preprocessed_dir}")
-        print(f"Cargando versión específica: {filepath}")
-        return pd.read_csv(filepath)
+            raise FileNotFoundError(f"La versión {version} no existe en {self.preprocessed_dir}")
+        print(f"Cargando versión: {filepath}")
+        return self._read(filepath, columns, symbols, start_date, end_date, date_column)
+
+    def delete_version(self, version: str, name: str = "forex_features"):
+        """
+        Elimina una versión del dataset.
+        """
+        path = os.path.join(self._dataset_dir(name), version)
+        if os.path.isdir(path):
+            shutil.rmtree(path)
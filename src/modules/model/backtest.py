@@ -0,0 +1,181 @@
+import os
+import json
+import time
+import logging
+from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+import pandas as pd
+from sklearn.base import clone
+
+from modules.model.matrix_cache import FeatureMatrixCache
+from modules.model.pre_processor import Preprocessor
+from modules.model.tester import ModelTester
+from modules.model.trainer import ModelTrainer
+
+
+BACKTEST_DIR = "artifacts/backtests"
+YEAR_END_TOLERANCE_BDAYS = 5
+
+
+def _years(dates) -> np.ndarray:
+    return dates.astype("datetime64[Y]").astype(int) + 1970
+
+
+def _year_complete(year: int, last_date) -> bool:
+    """
+    True si la última barra del año cae a menos de YEAR_END_TOLERANCE_BDAYS
+    días hábiles del 31 de diciembre (feriados de fin de año incluidos).
+    """
+    cutoff = np.busday_offset(np.datetime64(f"{year}-12-31"), -YEAR_END_TOLERANCE_BDAYS, roll="backward")
+    return np.datetime64(last_date, "D") >= cutoff
+
+
+def _run_fold(cache_root: str, key: str, fold: dict, model, target_col: str) -> dict:
+    """
+    Entrena y evalúa un fold dentro de un proceso worker.
+
+    El worker abre la matriz cacheada con memory-map (las páginas se comparten
+    vía page cache); solo viajan por pickle la definición del fold y el modelo
+    sin entrenar.
+    """
+    start = time.perf_counter()
+    matrix = FeatureMatrixCache(cache_root).load(key)
+
+    X_train = matrix.X[fold["train_start"]:fold["train_end"]]
+    y_train = matrix.y[fold["train_start"]:fold["train_end"]]
+    X_test = matrix.X[fold["test_start"]:fold["test_end"]]
+    y_test = matrix.y[fold["test_start"]:fold["test_end"]]
+
+    pre = Preprocessor(None, target_col=target_col)
+    X_train_scaled, X_test_scaled = pre.scale(X_train, X_test)
+
+    trainer = ModelTrainer(model=clone(model) if model is not None else None)
+    fitted = trainer.train(X_train_scaled, y_train)
+    y_pred = fitted.predict(X_test_scaled)
+
+    result = dict(fold)
+    result.update(ModelTester.compute_metrics(y_test, y_pred))
+    result["train_rows"] = int(len(y_train))
+    result["test_rows"] = int(len(y_test))
+    result["seconds"] = time.perf_counter() - start
+    return result
+
+
+class WalkForwardBacktester:
+    """
+    Backtest walk-forward por años sobre la matriz de features memory-mapped.
+
+    - mode='expanding': train = todos los años anteriores al año de test.
+    - mode='rolling':   train = los `train_years` años anteriores al año de test.
+
+    Cada fold es un par de slices contiguos de la matriz ordenada por fecha. Los
+    folds corren en paralelo en un ProcessPoolExecutor; cada worker mapea la misma
+    matriz desde disco en lugar de recibir el DataFrame por pickle.
+    """
+
+    def __init__(self, df: pd.DataFrame, feature_version: str, model=None, target_col="target_encoded",
+                 n_folds: int = 5, mode: str = "expanding", train_years: int = None,
+                 min_train_years: int = 3, max_workers: int = None, cache: FeatureMatrixCache = None):
+        if mode not in ("expanding", "rolling"):
+            raise ValueError(f"Modo '{mode}' no soportado. Opciones: expanding, rolling")
+        if mode == "rolling" and not train_years:
+            raise ValueError("El modo 'rolling' requiere train_years")
+
+        self.df = df
+        self.feature_version = feature_version
+        self.model = model
+        self.target_col = target_col
+        self.n_folds = n_folds
+        self.mode = mode
+        self.train_years = train_years
+        self.min_train_years = min_train_years
+        self.max_workers = max_workers or os.cpu_count()
+        self.cache = cache or FeatureMatrixCache()
+
+    def _matrix(self):
+        pre = Preprocessor(self.df, target_col=self.target_col)
+        return self.cache.get_or_create(self.feature_version, self.df, pre.get_feature_names(), self.target_col)
+
+    def generate_folds(self, dates) -> list:
+        """
+        Genera los últimos n_folds años completos como años de test. El último
+        año de los datos se descarta si todavía está en curso (ver _year_complete).
+        """
+        dates = np.asarray(dates)
+        years = _years(dates)
+        unique_years = np.unique(years)
+        first_year = unique_years[0]
+
+        candidates = [y for y in unique_years if y - first_year >= self.min_train_years]
+        if candidates and not _year_complete(candidates[-1], dates[-1]):
+            candidates = candidates[:-1]
+        test_years = candidates[-self.n_folds:] if self.n_folds else candidates
+
+        folds = []
+        for fold_id, test_year in enumerate(test_years):
+            train_from = first_year if self.mode == "expanding" else test_year - self.train_years
+            folds.append({
+                "fold": fold_id,
+                "test_year": int(test_year),
+                "train_from_year": int(max(train_from, first_year)),
+                "train_start": int(np.searchsorted(years, train_from, side="left")),
+                "train_end": int(np.searchsorted(years, test_year, side="left")),
+                "test_start": int(np.searchsorted(years, test_year, side="left")),
+                "test_end": int(np.searchsorted(years, test_year, side="right")),
+            })
+        return folds
+
+    def run(self, output_dir: str = BACKTEST_DIR) -> pd.DataFrame:
+        """
+        Ejecuta todos los folds en paralelo y guarda métricas por fold y agregadas.
+        """
+        matrix = self._matrix()
+        folds = self.generate_folds(matrix.dates)
+        if not folds:
+            raise ValueError("No hay suficientes años para generar folds")
+
+        logging.info(f"Backtest walk-forward ({self.mode}): {len(folds)} folds, {self.max_workers} workers")
+        print(f"Backtest walk-forward ({self.mode}): {len(folds)} folds en {self.max_workers} procesos...")
+
+        results = []
+        with ProcessPoolExecutor(max_workers=min(self.max_workers, len(folds))) as executor:
+            futures = {
+                executor.submit(_run_fold, self.cache.root_dir, matrix.key, fold, self.model, self.target_col): fold
+                for fold in folds
+            }
+            for future in as_completed(futures):
+                fold = futures[future]
+                try:
+                    results.append(future.result())
+                except Exception as e:
+                    logging.error(f"Fold {fold['fold']} ({fold['test_year']}) falló: {e}")
+                    results.append(dict(fold, error=str(e)))
+
+        folds_df = pd.DataFrame(results).sort_values("fold").reset_index(drop=True)
+        self.save_results(folds_df, output_dir)
+        return folds_df
+
+    def summarize(self, folds_df: pd.DataFrame) -> dict:
+        metric_columns = ["Balanced Accuracy", "F1 Macro"]
+        ok = folds_df.dropna(subset=[c for c in metric_columns if c in folds_df.columns])
+        summary = {"mode": self.mode, "folds": int(len(folds_df)), "failed_folds": int(len(folds_df) - len(ok))}
+        for col in metric_columns:
+            if col in ok.columns:
+                summary[f"{col} mean"] = float(ok[col].mean())
+                summary[f"{col} std"] = float(ok[col].std(ddof=0))
+        return summary
+
+    def save_results(self, folds_df: pd.DataFrame, output_dir: str = BACKTEST_DIR) -> str:
+        timestamp = datetime.now().strftime("%Y-%m-%d_%H%M%S")
+        run_dir = os.path.join(output_dir, f"backtest_{timestamp}")
+        os.makedirs(run_dir, exist_ok=True)
+
+        folds_df.to_csv(os.path.join(run_dir, "folds.csv"), index=False)
+        summary = self.summarize(folds_df)
+        with open(os.path.join(run_dir, "summary.json"), "w") as f:
+            json.dump(summary, f, indent=4)
+
+        print(f"Backtest guardado en {run_dir}: {summary}")
+        return run_dir
@@ -0,0 +1,241 @@
+import os
+import json
+import time
+import logging
+import threading
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+import numpy as np
+import pandas as pd
+
+from modules.data.raw_store import drop_open_bar
+from modules.data.streaming_features import StreamingFeatureEngine, STATE_DIR
+from modules.model.registry import ModelRegistry
+
+
+LABEL_NAMES = ["Down", "Uncertain", "Up"]
+PREDICTIONS_PATH = "outputs/predictions.csv"
+
+
+class InferenceService:
+    """
+    Servicio de inferencia de larga duración.
+
+    Carga una sola vez los modelos, scalers y el estado incremental de features
+    de cada símbolo y los mantiene en memoria. Cada predicción solo actualiza el
+    estado con las barras nuevas (O(1) por barra), escala y predice. Las
+    latencias de cada llamada quedan registradas para reportar p50/p99.
+
+    Con online=True cada barra nueva cuyo T+1 ya cerró actualiza modelo y
+    scaler en el lugar antes de predecir (ver OnlineModelUpdater).
+    """
+
+    def __init__(self, symbols=("EURGBP", "USDJPY"), state_dir: str = STATE_DIR,
+                 registry: ModelRegistry = None, online: bool = False):
+        self.symbols = [s.upper() for s in symbols]
+        self.state_dir = state_dir
+        self.registry = registry or ModelRegistry()
+        self.models = {}
+        self.scalers = {}
+        self.feature_names = {}
+        self.engines = {}
+        self.latencies = []
+        self._lock = threading.Lock()
+        self.fetcher = None
+        self.online = None
+        if online:
+            from modules.model.online import OnlineModelUpdater
+            self.online = OnlineModelUpdater(self.registry)
+
+        for symbol in self.symbols:
+            self._load_symbol(symbol)
+
+    def _load_model(self, symbol: str):
+        # Export plano (numpy) si existe; si no, el modelo joblib original
+        entry = self.registry.get_entry(symbol)
+        logging.info(f"Cargando modelo de {symbol} desde el registry ({entry['flat'] or entry['model']})")
+        self.models[symbol], self.scalers[symbol] = self.registry.load_best(symbol)
+        self.feature_names[symbol] = entry["feature_names"]
+
+    def _load_symbol(self, symbol: str):
+        self._load_model(symbol)
+        try:
+            self.engines[symbol] = StreamingFeatureEngine.load(symbol, self.state_dir)
+        except FileNotFoundError:
+            logging.warning(f"Sin estado de features para {symbol}; se calentará con la primera descarga.")
+            self.engines[symbol] = StreamingFeatureEngine(symbol=symbol)
+
+    def _feature_vector(self, symbol: str, features: dict) -> np.ndarray:
+        """
+        Arma el vector en el orden de entrenamiento. Falla si el modelo espera
+        columnas que el estado incremental no calcula (ej. un modelo entrenado
+        con return_t1, que solo se conoce después del cierre T+1).
+        """
+        names = self.feature_names[symbol]
+        missing = [name for name in names if name not in features]
+        if missing:
+            raise ValueError(f"El modelo de {symbol} usa features que no se calculan al predecir: {missing}. "
+                             f"Reentrenar con --train-model.")
+        return np.array([[features[name] for name in names]], dtype=np.float64)
+
+    def predict_from_bars(self, bars_by_symbol: dict) -> list:
+        """
+        Actualiza el estado con las barras recibidas y predice el movimiento T+1
+        de cada símbolo en una sola llamada.
+
+        Args:
+            bars_by_symbol: {"EURGBP": DataFrame o lista de dicts con date, open, high, low, close}
+
+        Returns:
+            Lista de dicts con symbol, date, prediction, label y probabilidades
+        """
+        start = time.perf_counter()
+        results = []
+        with self._lock:
+            for symbol, bars in bars_by_symbol.items():
+                symbol = symbol.upper()
+                if symbol not in self.models:
+                    self._load_symbol(symbol)
+                engine = self.engines[symbol]
+
+                bars = pd.DataFrame(bars)
+                if "date" not in bars.columns:
+                    bars = bars.rename_axis("date").reset_index()
+                # Solo barras cerradas: la del día en curso se procesa al día siguiente, ya final
+                bars = drop_open_bar(bars.assign(date=pd.to_datetime(bars["date"])))
+                previous = engine.last_features
+                new_rows = engine.update_many(bars, date_column="date")
+                if self.online is not None and not new_rows.empty:
+                    self._update_online(symbol, new_rows, previous)
+
+                if not engine.is_ready:
+                    results.append({"symbol": symbol, "error": f"estado incompleto ({engine.n_bars} barras)"})
+                    continue
+
+                features = engine.last_features
+                X = self.scalers[symbol].transform(self._feature_vector(symbol, features))
+                model = self.models[symbol]
+                prediction = int(model.predict(X)[0])
+
+                result = {
+                    "symbol": symbol,
+                    "date": features["date"].strftime("%Y-%m-%d"),
+                    "prediction": prediction,
+                    "label": LABEL_NAMES[prediction],
+                }
+                if hasattr(model, "predict_proba"):
+                    for label, p in zip(LABEL_NAMES, model.predict_proba(X)[0]):
+                        result[f"proba_{label.lower()}"] = float(p)
+                results.append(result)
+
+            self.latencies.append(time.perf_counter() - start)
+        return results
+
+    def _update_online(self, symbol: str, new_rows: pd.DataFrame, previous: dict):
+        # Un error de actualización no frena la predicción: se sigue con el modelo desplegado
+        try:
+            if self.online.observe(symbol, new_rows, previous=previous):
+                self._load_model(symbol)
+        except Exception as e:
+            logging.error(f"Actualización online de {symbol} falló: {e}")
+
+    def fetch_latest(self, force: bool = False, use_cache: bool = True) -> dict:
+        """
+        Descarga las barras diarias recientes de todos los símbolos (en paralelo).
+        """
+        from modules.data.fetch_data_for_predict import PredictionDataFetcher
+
+        if self.fetcher is None:
+            self.fetcher = PredictionDataFetcher()
+        return self.fetcher.fetch_latest_daily_many(self.symbols, force=force, use_cache=use_cache)
+
+    def predict_latest(self, force: bool = False) -> list:
+        """
+        Descarga las barras recientes de todos los símbolos (en paralelo) y predice.
+        """
+        latest = self.fetch_latest(force=force)
+        if not latest:
+            return []
+        return self.predict_from_bars(latest)
+
+    def save_state(self):
+        for engine in self.engines.values():
+            engine.save(self.state_dir)
+
+    def latency_stats(self) -> dict:
+        values = np.array(self.latencies) * 1000
+        if values.size == 0:
+            return {"calls": 0}
+        return {
+            "calls": int(values.size),
+            "p50_ms": float(np.percentile(values, 50)),
+            "p99_ms": float(np.percentile(values, 99)),
+            "max_ms": float(values.max()),
+        }
+
+    @staticmethod
+    def save_predictions(results: list, path: str = PREDICTIONS_PATH) -> str:
+        """
+        Agrega las predicciones al CSV de salida.
+        """
+        rows = [r for r in results if "error" not in r]
+        if not rows:
+            return path
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        df = pd.DataFrame(rows)
+        df.insert(0, "run_at", datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ"))
+        df.to_csv(path, mode="a", index=False, header=not os.path.exists(path))
+        return path
+
+    def serve(self, host: str = "127.0.0.1", port: int = 8080):
+        """
+        Expone el servicio por HTTP local:
+            GET  /predict?force=1   descarga y predice todos los símbolos
+            POST /predict           body {"EURGBP": [{"date": ..., "open": ...}, ...]}
+            GET  /stats             latencias p50/p99
+        """
+        service = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def _reply(self, status, payload):
+                body = json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_GET(self):
+                url = urlparse(self.path)
+                if url.path == "/stats":
+                    return self._reply(200, service.latency_stats())
+                if url.path == "/predict":
+                    force = parse_qs(url.query).get("force", ["0"])[0] == "1"
+                    return self._reply(200, service.predict_latest(force=force))
+                self._reply(404, {"error": "not found"})
+
+            def do_POST(self):
+                if urlparse(self.path).path != "/predict":
+                    return self._reply(404, {"error": "not found"})
+                try:
+                    length = int(self.headers.get("Content-Length", 0))
+                    payload = json.loads(self.rfile.read(length))
+                    self._reply(200, service.predict_from_bars(payload))
+                except Exception as e:
+                    logging.error(f"Error en /predict: {e}")
+                    self._reply(400, {"error": str(e)})
+
+            def log_message(self, format, *args):
+                logging.info(format % args)
+
+        server = ThreadingHTTPServer((host, port), Handler)
+        print(f"Servicio de inferencia escuchando en http://{host}:{port}")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
+            self.save_state()
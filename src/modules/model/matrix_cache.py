@@ -0,0 +1,134 @@
+import os
+import json
+import shutil
+import hashlib
+import logging
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+
+from modules.utils.stage_cache import hash_frame
+
+
+MATRIX_CACHE_DIR = "artifacts/matrix_cache"
+
+FeatureMatrix = namedtuple("FeatureMatrix", ["X", "y", "dates", "columns", "key"])
+
+
+class FeatureMatrixCache:
+    """
+    Cache de la matriz final de features (X), el target (y) y las fechas como
+    archivos .npy alineados y ordenados por fecha, para abrirlos con memory-map.
+
+    Cada entrada se identifica por la versión del feature set más un hash de las
+    columnas, el target y el contenido del DataFrame (filas, símbolos y valores),
+    por lo que entrenamiento, test y workers paralelos pueden mapear las mismas
+    páginas sin copiar ni volver a parsear el DataFrame, y una versión 'current'
+    reescrita o un subconjunto distinto de símbolos no reutilizan una matriz vieja.
+    Se conservan las `max_entries` entradas usadas más recientemente.
+
+        artifacts/matrix_cache/<key>/X.npy, y.npy, dates.npy, meta.json
+    """
+
+    def __init__(self, root_dir: str = MATRIX_CACHE_DIR, max_entries: int = 8):
+        self.root_dir = root_dir
+        self.max_entries = max_entries
+        os.makedirs(self.root_dir, exist_ok=True)
+
+    @staticmethod
+    def make_key(feature_version: str, columns: list, target_col: str, df: pd.DataFrame = None,
+                 date_column: str = "date") -> str:
+        """
+        Clave de la entrada: versión + hash de columnas y target y, con `df`,
+        del contenido que se materializa (fechas, símbolo si existe, features y target).
+        """
+        digest = hashlib.sha1(json.dumps([list(columns), target_col]).encode())
+        if df is not None:
+            content = [c for c in (date_column, "symbol") if c in df.columns] + list(columns) + [target_col]
+            digest.update(hash_frame(df, content).encode())
+        return f"{os.path.basename(str(feature_version).rstrip(os.sep))}_{digest.hexdigest()[:16]}"
+
+    def _entry_dir(self, key: str) -> str:
+        return os.path.join(self.root_dir, key)
+
+    def exists(self, key: str) -> bool:
+        return os.path.exists(os.path.join(self._entry_dir(key), "meta.json"))
+
+    def save(self, key: str, df: pd.DataFrame, columns: list, target_col: str,
+             date_column: str = "date") -> str:
+        """
+        Materializa X (float64), y y las fechas del DataFrame, ordenados por fecha.
+        Escribe columna a columna sobre el memmap para no duplicar el DataFrame en memoria.
+        """
+        entry_dir = self._entry_dir(key)
+        tmp_dir = f"{entry_dir}.tmp"
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        os.makedirs(tmp_dir)
+
+        order = np.argsort(df[date_column].to_numpy(), kind="stable")
+        n_rows = len(df)
+
+        X = np.lib.format.open_memmap(
+            os.path.join(tmp_dir, "X.npy"), mode="w+", dtype=np.float64, shape=(n_rows, len(columns))
+        )
+        for j, col in enumerate(columns):
+            X[:, j] = df[col].to_numpy(dtype=np.float64)[order]
+        X.flush()
+        del X
+
+        np.save(os.path.join(tmp_dir, "y.npy"), df[target_col].to_numpy()[order])
+        np.save(os.path.join(tmp_dir, "dates.npy"),
+                pd.to_datetime(df[date_column]).to_numpy(dtype="datetime64[ns]")[order])
+
+        with open(os.path.join(tmp_dir, "meta.json"), "w") as f:
+            json.dump({"key": key, "columns": list(columns), "target_col": target_col,
+                       "n_rows": n_rows}, f, indent=4)
+
+        shutil.rmtree(entry_dir, ignore_errors=True)
+        os.replace(tmp_dir, entry_dir)
+        logging.info(f"Matriz de features materializada en {entry_dir} ({n_rows} filas)")
+        self._evict()
+        return entry_dir
+
+    def _evict(self):
+        """
+        Elimina las entradas menos usadas (mtime de meta.json) por encima de max_entries.
+        """
+        entries = []
+        for name in os.listdir(self.root_dir):
+            meta_path = os.path.join(self.root_dir, name, "meta.json")
+            if not name.endswith(".tmp") and os.path.exists(meta_path):
+                entries.append((os.path.getmtime(meta_path), name))
+        for _, name in sorted(entries)[:-self.max_entries]:
+            shutil.rmtree(self._entry_dir(name), ignore_errors=True)
+            logging.info(f"Matriz de features '{name}' eliminada del cache")
+
+    def load(self, key: str) -> FeatureMatrix:
+        """
+        Abre la entrada en modo memory-map de solo lectura (sin copias).
+        """
+        entry_dir = self._entry_dir(key)
+        if not self.exists(key):
+            raise FileNotFoundError(f"No existe la matriz '{key}' en {self.root_dir}")
+
+        with open(os.path.join(entry_dir, "meta.json")) as f:
+            meta = json.load(f)
+
+        return FeatureMatrix(
+            X=np.load(os.path.join(entry_dir, "X.npy"), mmap_mode="r"),
+            y=np.load(os.path.join(entry_dir, "y.npy"), mmap_mode="r"),
+            dates=np.load(os.path.join(entry_dir, "dates.npy"), mmap_mode="r"),
+            columns=meta["columns"],
+            key=key,
+        )
+
+    def get_or_create(self, feature_version: str, df: pd.DataFrame, columns: list,
+                      target_col: str, date_column: str = "date") -> FeatureMatrix:
+        key = self.make_key(feature_version, columns, target_col, df, date_column)
+        if not self.exists(key):
+            self.save(key, df, columns, target_col, date_column)
+        else:
+            os.utime(os.path.join(self._entry_dir(key), "meta.json"))
+            logging.info(f"Reutilizando matriz de features cacheada '{key}'")
+        return self.load(key)
@@ -0,0 +1,265 @@
+import os
+import json
+import time
+import logging
+from datetime import datetime
+from multiprocessing import shared_memory
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+import pandas as pd
+from sklearn.base import clone
+
+from modules.model.matrix_cache import FeatureMatrixCache
+from modules.model.pre_processor import Preprocessor
+from modules.model.registry import ModelRegistry, REGISTRY_DIR
+from modules.model.tester import ModelTester
+from modules.model.trainer import ModelTrainer
+from modules.utils.tracing import Tracer, get_tracer
+
+
+SYMBOL_RUNS_DIR = "artifacts/symbol_runs"
+
+# Mismo split que Preprocessor.split_data: train = años < TEST_YEAR, test = TEST_YEAR
+TEST_YEAR = 2024
+
+
+def _allocate(shape: tuple, dtype) -> tuple:
+    """
+    Reserva un bloque de memoria compartida para un array.
+
+    Returns:
+        (SharedMemory, vista numpy, spec) donde spec (nombre, forma y dtype) es lo único que viaja al worker
+    """
+    dtype = np.dtype(dtype)
+    block = shared_memory.SharedMemory(create=True, size=max(int(np.prod(shape)) * dtype.itemsize, 1))
+    view = np.ndarray(shape, dtype=dtype, buffer=block.buf)
+    return block, view, {"name": block.name, "shape": tuple(shape), "dtype": dtype.str}
+
+
+def _attach(spec: dict) -> tuple:
+    block = shared_memory.SharedMemory(name=spec["name"])
+    return block, np.ndarray(spec["shape"], dtype=np.dtype(spec["dtype"]), buffer=block.buf)
+
+
+def _open_inputs(specs: dict, blocks: list) -> tuple:
+    """
+    (X, y, años) de un símbolo: la matriz cacheada con memory-map si el
+    entrenamiento tiene feature_version, o los bloques de memoria compartida.
+    """
+    if "matrix" in specs:
+        matrix = FeatureMatrixCache(specs["matrix"]["root"]).load(specs["matrix"]["key"])
+        return matrix.X, matrix.y, matrix.dates.astype("datetime64[Y]").astype(np.int32) + 1970
+    views = {}
+    for name, spec in specs.items():
+        block, views[name] = _attach(spec)
+        blocks.append(block)
+    return views["X"], views["y"], views["years"]
+
+
+def _train_symbol(symbol: str, specs: dict, feature_names: list, model, registry_root: str) -> dict:
+    """
+    Entrena y evalúa el modelo de un símbolo dentro de un proceso worker.
+
+    X, y y el año de cada fila se leen sin copia (matriz cacheada o memoria
+    compartida); por pickle solo viajan los nombres de los bloques y el modelo
+    sin entrenar. Los artifacts se guardan en el registry pero los alias los
+    escribe el proceso principal, una sola vez para todos los símbolos.
+    Las etapas (split, scale, train, save_artifacts, test) se miden con un
+    Tracer propio del worker y vuelven en result["spans"].
+    """
+    start = time.perf_counter()
+    tracer = Tracer(run_name=f"train_{symbol}")
+    blocks = []
+    try:
+        with tracer.span("train_symbol", symbol=symbol):
+            with tracer.span("split", symbol=symbol) as span:
+                X, y, years = _open_inputs(specs, blocks)
+                train_end = int(np.searchsorted(years, TEST_YEAR, side="left"))
+                test_end = int(np.searchsorted(years, TEST_YEAR, side="right"))
+                if train_end == 0 or test_end == train_end:
+                    raise ValueError(f"Sin filas de train (< {TEST_YEAR}) o de test ({TEST_YEAR})")
+                span.rows = len(y)
+
+            pre = Preprocessor(None)
+            with tracer.span("scale", rows=test_end, symbol=symbol):
+                X_train_scaled, X_test_scaled = pre.scale(X[:train_end], X[train_end:test_end])
+                y_train, y_test = np.array(y[:train_end]), np.array(y[train_end:test_end])
+            del X, y, years
+
+            trainer = ModelTrainer(model=clone(model) if model is not None else None,
+                                   registry=ModelRegistry(registry_root))
+            with tracer.span("train", rows=len(y_train), model=type(trainer.model).__name__, symbol=symbol):
+                fitted = trainer.train(X_train_scaled, y_train)
+            with tracer.span("save_artifacts", symbol=symbol):
+                entry = trainer.registry.store(fitted, pre.scaler, feature_names=feature_names)
+            with tracer.span("test", rows=len(y_test), symbol=symbol):
+                metrics = ModelTester.compute_metrics(y_test, fitted.predict(X_test_scaled))
+
+        result = {"symbol": symbol, "status": "ok"}
+        result.update(metrics)
+        result.update({
+            "train_rows": int(len(y_train)),
+            "test_rows": int(len(y_test)),
+            "model": entry["model"],
+            "seconds": time.perf_counter() - start,
+            "entry": entry,
+            "spans": tracer.summary(),
+        })
+        return result
+    finally:
+        for block in blocks:
+            try:
+                block.close()
+            except BufferError:
+                # Vistas todavía referenciadas por el traceback de un error: se liberan con el worker
+                pass
+
+
+class MultiSymbolTrainer:
+    """
+    Entrenamiento de un modelo por símbolo, con los símbolos en paralelo.
+
+    El DataFrame largo (columna 'symbol') se convierte, por símbolo, en una matriz
+    X (float64), y y el año de cada fila, ordenados por fecha, y se copian una sola
+    vez a memoria compartida. Cada worker de un ProcessPoolExecutor entrena su
+    símbolo leyendo esos bloques sin copia, así el universo completo tarda lo que
+    el símbolo más lento (con workers suficientes) y no la suma.
+
+    Con feature_version la matriz de cada símbolo se materializa en el
+    FeatureMatrixCache y los workers la abren con memory-map en lugar de
+    copiarla a memoria compartida.
+
+    Un símbolo que falla no detiene al resto: el reporte por símbolo (status,
+    error, métricas, filas, tiempo) se guarda en artifacts/symbol_runs y solo
+    los símbolos entrenados se registran como alias en el ModelRegistry.
+    """
+
+    def __init__(self, df: pd.DataFrame, symbols=None, model=None, target_col="target_encoded",
+                 symbol_column: str = "symbol", date_column: str = "date", max_workers: int = None,
+                 registry: ModelRegistry = None, feature_version: str = None, cache: FeatureMatrixCache = None):
+        """
+        Args:
+            symbols: Símbolos a entrenar (por defecto todos los del DataFrame)
+            model: Estimador sin entrenar; cada símbolo entrena un clone (por defecto el de ModelTrainer)
+            feature_version: Versión del feature set; si se indica se usa el FeatureMatrixCache
+        """
+        if symbol_column not in df.columns:
+            raise ValueError(f"Columna de símbolo '{symbol_column}' no encontrada")
+        self.df = df
+        self.symbol_column = symbol_column
+        self.date_column = date_column
+        self.symbols = [s.upper() for s in (symbols or df[symbol_column].astype(str).unique())]
+        self.model = model
+        self.target_col = target_col
+        self.max_workers = max_workers or os.cpu_count()
+        self.registry = registry or ModelRegistry(REGISTRY_DIR)
+        self.feature_version = feature_version
+        self.cache = cache or (FeatureMatrixCache() if feature_version is not None else None)
+
+    def _share_symbol(self, symbol: str, feature_names: list, blocks: list) -> dict:
+        """
+        Matrices de un símbolo, ordenadas por fecha: la entrada del FeatureMatrixCache
+        (con feature_version) o bloques de memoria compartida escritos columna a
+        columna, sin armar antes la matriz completa.
+        """
+        df = self.df[self.df[self.symbol_column].astype(str).str.upper() == symbol]
+        if df.empty:
+            raise ValueError(f"Sin filas para '{symbol}'")
+        if self.feature_version is not None:
+            with get_tracer().span("feature_matrix", rows=len(df), symbol=symbol):
+                matrix = self.cache.get_or_create(self.feature_version, df, feature_names,
+                                                  self.target_col, self.date_column)
+            return {"matrix": {"root": self.cache.root_dir, "key": matrix.key}}
+        dates = pd.to_datetime(df[self.date_column]).to_numpy()
+        order = np.argsort(dates, kind="stable")
+
+        y = df[self.target_col].to_numpy()
+        specs = {}
+        block, X, specs["X"] = _allocate((len(df), len(feature_names)), np.float64)
+        blocks.append(block)
+        for j, col in enumerate(feature_names):
+            X[:, j] = df[col].to_numpy(dtype=np.float64)[order]
+        block, view, specs["y"] = _allocate(y.shape, y.dtype)
+        blocks.append(block)
+        view[...] = y[order]
+        block, view, specs["years"] = _allocate(y.shape, np.int32)
+        blocks.append(block)
+        view[...] = dates[order].astype("datetime64[Y]").astype(np.int32) + 1970
+        del X, view
+        return specs
+
+    def run(self, output_dir: str = SYMBOL_RUNS_DIR) -> pd.DataFrame:
+        """
+        Entrena todos los símbolos en paralelo y devuelve el reporte por símbolo.
+        """
+        feature_names = Preprocessor(self.df, target_col=self.target_col).get_feature_names()
+        n_workers = max(1, min(self.max_workers, len(self.symbols)))
+        logging.info(f"Entrenamiento por símbolo: {len(self.symbols)} símbolos, {n_workers} workers")
+        print(f"Entrenamiento por símbolo: {self.symbols} en {n_workers} procesos...")
+
+        results, entries, blocks = [], {}, []
+        start = time.perf_counter()
+        try:
+            with ProcessPoolExecutor(max_workers=n_workers) as executor:
+                futures = {}
+                for symbol in self.symbols:
+                    try:
+                        specs = self._share_symbol(symbol, feature_names, blocks)
+                    except Exception as e:
+                        logging.error(f"No se pudo preparar {symbol}: {e}")
+                        results.append({"symbol": symbol, "status": "error", "error": f"{type(e).__name__}: {e}"})
+                        continue
+                    future = executor.submit(_train_symbol, symbol, specs, feature_names, self.model,
+                                             self.registry.root_dir)
+                    futures[future] = symbol
+
+                for future in as_completed(futures):
+                    symbol = futures[future]
+                    try:
+                        result = future.result()
+                        entries[symbol] = result.pop("entry")
+                        get_tracer().merge(result.pop("spans"))
+                        print(f"  {symbol}: OK en {result['seconds']:.1f}s "
+                              f"(Balanced Accuracy {result['Balanced Accuracy']:.3f})")
+                    except Exception as e:
+                        logging.error(f"Entrenamiento de {symbol} falló: {e}")
+                        print(f"  {symbol}: ERROR {e}")
+                        result = {"symbol": symbol, "status": "error", "error": f"{type(e).__name__}: {e}"}
+                    results.append(result)
+        finally:
+            for block in blocks:
+                block.close()
+                block.unlink()
+
+        if entries:
+            self.registry.set_aliases(entries)
+            logging.info(f"Modelos registrados para {sorted(entries)}")
+
+        report = pd.DataFrame(results)
+        report["symbol"] = pd.Categorical(report["symbol"], categories=self.symbols, ordered=True)
+        report = report.sort_values("symbol").reset_index(drop=True)
+        report["symbol"] = report["symbol"].astype(str)
+        run_dir = self.save_report(report, time.perf_counter() - start, output_dir)
+        report.attrs["report_path"] = os.path.join(run_dir, "report.csv")
+        return report
+
+    def save_report(self, report: pd.DataFrame, seconds: float, output_dir: str = SYMBOL_RUNS_DIR) -> str:
+        timestamp = datetime.now().strftime("%Y-%m-%d_%H%M%S_%f")
+        run_dir = os.path.join(output_dir, f"run_{timestamp}")
+        os.makedirs(run_dir, exist_ok=True)
+
+        report.to_csv(os.path.join(run_dir, "report.csv"), index=False)
+        failed = report.loc[report["status"] != "ok", "symbol"].tolist()
+        summary = {
+            "symbols": int(len(report)),
+            "trained": int(len(report) - len(failed)),
+            "failed": failed,
+            "wall_seconds": seconds,
+            "sum_symbol_seconds": float(report["seconds"].sum()) if "seconds" in report.columns else 0.0,
+        }
+        with open(os.path.join(run_dir, "summary.json"), "w") as f:
+            json.dump(summary, f, indent=4)
+
+        print(f"Reporte por símbolo guardado en {run_dir}: {summary}")
+        return run_dir
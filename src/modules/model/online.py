@@ -0,0 +1,398 @@
+import os
+import json
+import logging
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+
+from modules.data.raw_store import drop_open_bar
+from modules.model.pre_processor import LEAKAGE_COLUMNS
+from modules.model.registry import ModelRegistry
+from modules.model.tester import confusion, metrics_from_confusion
+
+
+ONLINE_DIR = "artifacts/online"
+
+# Misma regla que ForexFeatureEngineer.create_target: 0 = down, 1 = neutral, 2 = up
+TARGET_THRESHOLD = 0.001
+TARGET_CLASSES = np.array([0, 1, 2])
+# return_t1 y el target solo etiquetan la fila (y); nunca son features
+LABEL_COLUMNS = ["target_encoded"] + LEAKAGE_COLUMNS
+
+
+def label_return(return_t1: float) -> int:
+    if return_t1 > TARGET_THRESHOLD:
+        return 2
+    if return_t1 < -TARGET_THRESHOLD:
+        return 0
+    return 1
+
+
+def make_online_model(y=None, random_state: int = 42):
+    """
+    Estimador lineal con partial_fit, predict_proba y export plano
+    (SGDClassifier con log_loss). partial_fit no acepta class_weight='balanced':
+    con `y` se calculan esos mismos pesos y se fijan como dict.
+    """
+    from sklearn.linear_model import SGDClassifier
+    from sklearn.utils.class_weight import compute_class_weight
+
+    class_weight = None
+    if y is not None:
+        classes = np.unique(y)
+        weights = compute_class_weight("balanced", classes=classes, y=y)
+        class_weight = {int(c): float(w) for c, w in zip(classes, weights)}
+    return SGDClassifier(loss="log_loss", alpha=1e-4, class_weight=class_weight, random_state=random_state)
+
+
+class OnlineModelUpdater:
+    """
+    Actualización diaria de los modelos desplegados sin reentrenar todo el histórico.
+
+    Cada barra cerrada deja pendiente su vector de features; cuando el histórico
+    crudo tiene los cierres finales de T y T+1 se calcula return_t1 y el target,
+    y esa fila etiquetada actualiza en el lugar el scaler (StandardScaler.partial_fit:
+    momentos acumulados) y el modelo (partial_fit). Antes de aprender se predice la fila
+    (evaluación prequential), así el accuracy reciente mide al modelo desplegado.
+
+    Tras cada actualización se guarda un snapshot versionado en el ModelRegistry
+    (objetos por hash, alias al último) y una línea en
+    artifacts/online/<SYMBOL>/versions.jsonl; rollback() vuelve a cualquier versión.
+
+    Se reentrena desde cero (histórico crudo completo) solo si:
+    - el modelo desplegado no tiene partial_fit (ej. LogisticRegression del batch)
+    - el modelo usa como feature return_t1 o el target (registrado antes de excluirlos)
+    - el modelo usa features que el motor incremental no produce
+    - el balanced accuracy de las últimas `window` filas cae más de
+      `accuracy_drop` debajo del de referencia
+    - más de `feature_fraction` de las features se alejó más de `feature_z`
+      desvíos (en media de la ventana) de los momentos del último reentrenamiento
+    Las dos señales de drift esperan `cooldown` filas después de cada reentrenamiento.
+    """
+
+    def __init__(self, registry: ModelRegistry = None, state_dir: str = ONLINE_DIR, window: int = 60,
+                 accuracy_drop: float = 0.15, feature_z: float = 2.0, feature_fraction: float = 0.5,
+                 cooldown: int = 20, holdout: int = 250, history_loader=None):
+        """
+        Args:
+            window: Filas etiquetadas recientes usadas por los chequeos de drift
+            holdout: Filas finales del histórico para medir el accuracy de referencia al reentrenar
+            history_loader: Función symbol -> histórico crudo (por defecto ingesta incremental FX_DAILY)
+        """
+        self.registry = registry or ModelRegistry()
+        self.state_dir = state_dir
+        self.window = window
+        self.accuracy_drop = accuracy_drop
+        self.feature_z = feature_z
+        self.feature_fraction = feature_fraction
+        self.cooldown = cooldown
+        self.holdout = holdout
+        self.history_loader = history_loader or self._load_history
+        self.objects = {}
+        self.states = {}
+
+    # ------------------------------------------------------------------
+    # Estado
+    # ------------------------------------------------------------------
+    def _symbol_dir(self, symbol: str) -> str:
+        return os.path.join(self.state_dir, symbol)
+
+    def _state(self, symbol: str) -> dict:
+        if symbol not in self.states:
+            path = os.path.join(self._symbol_dir(symbol), "state.json")
+            if os.path.exists(path):
+                with open(path) as f:
+                    self.states[symbol] = json.load(f)
+                # Estados anteriores guardaban una sola barra pendiente
+                pending = self.states[symbol]["pending"]
+                self.states[symbol]["pending"] = [pending] if isinstance(pending, dict) else pending or []
+            else:
+                self.states[symbol] = {"version": 0, "pending": [], "outcomes": [], "recent": [],
+                                       "reference": None, "baseline": None, "updates_since_retrain": 0}
+        return self.states[symbol]
+
+    def _save_state(self, symbol: str):
+        os.makedirs(self._symbol_dir(symbol), exist_ok=True)
+        path = os.path.join(self._symbol_dir(symbol), "state.json")
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self.states[symbol], f)
+        os.replace(tmp_path, path)
+
+    def _objects(self, symbol: str) -> tuple:
+        """
+        (modelo, scaler, feature_names) sklearn originales del alias del símbolo.
+        """
+        if symbol not in self.objects:
+            model, scaler = self.registry.load(symbol)
+            self.objects[symbol] = (model, scaler, self.registry.get_entry(symbol)["feature_names"])
+        return self.objects[symbol]
+
+    @staticmethod
+    def _serialize(features: dict) -> dict:
+        return {k: (v.isoformat() if isinstance(v, pd.Timestamp) else float(v)) for k, v in features.items()}
+
+    @staticmethod
+    def _vector(features: dict, names: list) -> list:
+        """
+        Features de la fila en el orden de entrenamiento (NaN -> 0 como el fillna(0) del batch).
+        """
+        row = []
+        for name in names:
+            value = features[name]
+            row.append(0.0 if value is None or pd.isna(value) else float(value))
+        return row
+
+    # ------------------------------------------------------------------
+    # Actualización
+    # ------------------------------------------------------------------
+    def observe(self, symbol: str, rows: pd.DataFrame, previous: dict = None) -> bool:
+        """
+        Incorpora las features de barras nuevas (salida de StreamingFeatureEngine.update_many)
+        y aprende de las filas pendientes que ya se pueden etiquetar.
+
+        Args:
+            previous: Features de la última barra anterior a `rows` (estado del motor),
+                para etiquetarla si todavía no hay barras pendientes
+
+        Returns:
+            True si cambió el modelo desplegado (actualización o reentrenamiento)
+        """
+        symbol = symbol.upper()
+        state = self._state(symbol)
+        pending = state["pending"]
+        if not pending and previous is not None:
+            pending.append(self._serialize(previous))
+
+        for features in drop_open_bar(rows).to_dict("records"):
+            if not pending or pd.Timestamp(features["date"]) > pd.Timestamp(pending[-1]["date"]):
+                pending.append(self._serialize(features))
+
+        labeled = self._label(symbol, pending) if len(pending) > 1 else []
+        if not labeled:
+            self._save_state(symbol)
+            return False
+
+        model, scaler, names = self._objects(symbol)
+        reason = self._retrain_reason(model, names, rows.columns)
+        if reason is None:
+            X = np.array([self._vector(pending, names) for pending, _ in labeled], dtype=np.float64)
+            y = np.array([label_return(r) for _, r in labeled])
+            self._update(symbol, X, y)
+            reason = self.check_drift(symbol)
+            if reason is None:
+                self._snapshot(symbol, "partial_fit", rows=len(y), trained_through=labeled[-1][0]["date"][:10])
+                return True
+
+        logging.warning(f"Reentrenamiento completo de {symbol}: {reason}")
+        self.retrain(symbol, reason)
+        return True
+
+    def _label(self, symbol: str, pending: list) -> list:
+        """
+        Etiqueta (en el lugar) las barras pendientes con los cierres finales del
+        histórico crudo: return_t1 = cierre(T+1) / cierre(T) - 1, sin la barra
+        del día en curso. Las que todavía no tienen T+1 final siguen pendientes;
+        las que no están en el histórico se descartan.
+
+        Returns:
+            Lista de (features, return_t1)
+        """
+        since = pd.Timestamp(pending[0]["date"]).normalize()
+        history = drop_open_bar(self.history_loader(symbol))
+        history = history[pd.to_datetime(history["date"]) >= since]
+        closes = pd.Series(history["close"].to_numpy(dtype=np.float64),
+                           index=pd.DatetimeIndex(history["date"]).normalize())
+
+        labeled, waiting = [], []
+        for features in pending:
+            date = pd.Timestamp(features["date"]).normalize()
+            if closes.empty or date >= closes.index[-1]:
+                waiting.append(features)
+            elif date not in closes.index:
+                logging.warning(f"{symbol}: barra {date.date()} ausente del histórico crudo; no se etiqueta")
+            else:
+                position = closes.index.get_loc(date)
+                labeled.append((features, float(closes.iloc[position + 1] / closes.iloc[position] - 1)))
+        pending[:] = waiting
+        return labeled
+
+    @staticmethod
+    def _retrain_reason(model, names: list, available) -> str:
+        if not hasattr(model, "partial_fit"):
+            return f"{type(model).__name__} no soporta partial_fit"
+        leaked = [name for name in names if name in LABEL_COLUMNS]
+        if leaked:
+            return f"el modelo usa como features columnas del target: {leaked}"
+        missing = [name for name in names if name not in available]
+        if missing:
+            return f"features sin valor incremental: {missing}"
+        return None
+
+    def _update(self, symbol: str, X: np.ndarray, y: np.ndarray):
+        """
+        Predicción prequential y actualización en el lugar de scaler y modelo.
+        """
+        model, scaler, names = self._objects(symbol)
+        state = self._state(symbol)
+        if state["reference"] is None:
+            # Modelo de partial_fit entrenado por el batch: su scaler es la referencia
+            state["reference"] = {"mean": scaler.mean_.tolist(), "scale": scaler.scale_.tolist()}
+
+        y_pred = model.predict(scaler.transform(X))
+        state["outcomes"] = (state["outcomes"] + np.column_stack([y, y_pred]).tolist())[-self.window:]
+        state["recent"] = (state["recent"] + X.tolist())[-self.window:]
+        state["updates_since_retrain"] += len(y)
+
+        scaler.partial_fit(X)
+        model.partial_fit(scaler.transform(X), y, classes=TARGET_CLASSES)
+
+    def recent_accuracy(self, symbol: str):
+        outcomes = np.array(self._state(symbol)["outcomes"]).reshape(-1, 2)
+        if len(outcomes) == 0:
+            return None
+        cm, _ = confusion(outcomes[:, 0], outcomes[:, 1], labels=TARGET_CLASSES)
+        return metrics_from_confusion(cm)["Balanced Accuracy"]
+
+    def check_drift(self, symbol: str):
+        """
+        Motivo de reentrenamiento por drift (accuracy o features), o None.
+        """
+        state = self._state(symbol)
+        if state["updates_since_retrain"] < self.cooldown:
+            return None
+
+        if len(state["outcomes"]) >= self.window:
+            accuracy = self.recent_accuracy(symbol)
+            if state["baseline"] is None:
+                state["baseline"] = accuracy
+            elif accuracy < state["baseline"] - self.accuracy_drop:
+                return f"balanced accuracy {accuracy:.3f} < referencia {state['baseline']:.3f} - {self.accuracy_drop}"
+
+        reference = state["reference"]
+        if reference is not None and len(state["recent"]) >= self.window:
+            scale = np.asarray(reference["scale"])
+            scale = np.where(scale > 0, scale, 1.0)
+            z = np.abs(np.mean(state["recent"], axis=0) - np.asarray(reference["mean"])) / scale
+            drifted = z > self.feature_z
+            if drifted.mean() > self.feature_fraction:
+                names = self._objects(symbol)[2]
+                return f"drift en {int(drifted.sum())}/{len(names)} features (ej. {names[int(np.argmax(z))]})"
+        return None
+
+    # ------------------------------------------------------------------
+    # Reentrenamiento completo
+    # ------------------------------------------------------------------
+    @staticmethod
+    def _load_history(symbol: str) -> pd.DataFrame:
+        from modules.data.fetch_data import FetchData
+
+        return FetchData().ingest_incremental(
+            from_symbol=symbol[:3],
+            to_symbol=symbol[3:],
+            function="FX_DAILY",
+            name=f"{symbol[:3].lower()}_{symbol[3:].lower()}_daily"
+        )
+
+    def retrain(self, symbol: str, reason: str = "manual"):
+        """
+        Reentrena scaler y modelo (partial_fit) sobre el histórico completo, con
+        las mismas features que el batch (Preprocessor excluye return_t1 y el target).
+        El accuracy de referencia se mide en las últimas `holdout` filas con un
+        modelo entrenado sin ellas; el modelo desplegado se ajusta después sobre
+        todas las filas con un único scaler.
+        """
+        from sklearn.preprocessing import StandardScaler
+        from modules.data.pre_processing import ForexFeatureEngineer
+        from modules.model.pre_processor import Preprocessor
+
+        symbol = symbol.upper()
+        history = drop_open_bar(self.history_loader(symbol))
+        df = ForexFeatureEngineer().prepare_features(history, date_column="timestamp")
+        df = df.sort_values("date").fillna(0)
+        names = Preprocessor(df).get_feature_names()
+        X = df[names].to_numpy(dtype=np.float64)
+        y = df["target_encoded"].to_numpy(dtype=np.int64)
+
+        split = len(y) - self.holdout if len(y) > 2 * self.holdout else len(y) // 2
+        scaler = StandardScaler().fit(X[:split])
+        model = make_online_model(y[:split])
+        model.fit(scaler.transform(X[:split]), y[:split])
+
+        cm, _ = confusion(y[split:], model.predict(scaler.transform(X[split:])), labels=TARGET_CLASSES)
+        baseline = metrics_from_confusion(cm)["Balanced Accuracy"]
+
+        scaler = StandardScaler().fit(X)
+        model = make_online_model(y)
+        model.fit(scaler.transform(X), y)
+
+        self.objects[symbol] = (model, scaler, names)
+        state = self._state(symbol)
+        state.update({
+            "outcomes": [],
+            "recent": [],
+            "reference": {"mean": scaler.mean_.tolist(), "scale": scaler.scale_.tolist()},
+            "baseline": baseline,
+            "updates_since_retrain": 0,
+        })
+        print(f"{symbol}: reentrenado con {len(y)} filas ({reason}); balanced accuracy holdout {baseline:.3f}")
+        return self._snapshot(symbol, f"retrain: {reason}", rows=len(y),
+                              trained_through=df["date"].iloc[-1].strftime("%Y-%m-%d"))
+
+    # ------------------------------------------------------------------
+    # Snapshots
+    # ------------------------------------------------------------------
+    def _snapshot(self, symbol: str, update: str, rows: int, trained_through: str = None) -> dict:
+        """
+        Guarda modelo y scaler actuales como nueva versión y apunta el alias a ella.
+        """
+        model, scaler, names = self._objects(symbol)
+        state = self._state(symbol)
+        state["version"] += 1
+
+        entry = self.registry.store(model, scaler, feature_names=names)
+        entry.update({"online_version": state["version"], "update": update})
+        self.registry.set_aliases({symbol: entry})
+
+        record = {
+            "version": state["version"],
+            "update": update,
+            "rows": int(rows),
+            "trained_through": trained_through,
+            "recent_balanced_accuracy": self.recent_accuracy(symbol),
+            "baseline": state["baseline"],
+            "at": datetime.now(timezone.utc).isoformat(),
+            "entry": entry,
+        }
+        os.makedirs(self._symbol_dir(symbol), exist_ok=True)
+        with open(os.path.join(self._symbol_dir(symbol), "versions.jsonl"), "a") as f:
+            f.write(json.dumps(record) + "\n")
+        self._save_state(symbol)
+        logging.info(f"{symbol}: versión online {state['version']} ({update}, {rows} filas)")
+        return entry
+
+    def versions(self, symbol: str) -> pd.DataFrame:
+        path = os.path.join(self._symbol_dir(symbol.upper()), "versions.jsonl")
+        if not os.path.exists(path):
+            return pd.DataFrame()
+        with open(path) as f:
+            return pd.DataFrame([json.loads(line) for line in f])
+
+    def rollback(self, symbol: str, version: int) -> dict:
+        """
+        Vuelve el alias del símbolo a una versión anterior (si sus objetos siguen en el registry).
+        """
+        symbol = symbol.upper()
+        versions = self.versions(symbol)
+        match = versions[versions["version"] == version] if not versions.empty else versions
+        if match.empty:
+            raise KeyError(f"No existe la versión {version} de {symbol}")
+        entry = match.iloc[-1]["entry"]
+        for kind in ("model", "scaler"):
+            if not os.path.exists(self.registry.object_path(entry[kind])):
+                raise FileNotFoundError(f"Objeto {entry[kind]} eliminado del registry (garbage_collect)")
+        self.registry.set_aliases({symbol: entry})
+        self.objects.pop(symbol, None)
+        logging.info(f"{symbol}: rollback a la versión online {version}")
+        return entry
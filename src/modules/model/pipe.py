@@ -1,16 +1,15 @@
 import os
 import logging
 import pandas as pd
-from datetime import datetime
-from sklearn.preprocessing import StandardScaler
 
 from modules.model.pre_processor import Preprocessor
+from modules.model.matrix_cache import FeatureMatrixCache
 from modules.model.tester import ModelTester
 from modules.model.trainer import ModelTrainer
+from modules.utils.tracing import get_tracer
 
 
 MODEL_DIR_LOGS = "logs"
-os.makedirs(MODEL_DIR_LOGS, exist_ok=True)
 
 class PipelineRunner:
     """
@@ -22,13 +21,27 @@ class PipelineRunner:
     Evaluación y generación de métricas
     """
 
-    def __init__(self, df: pd.DataFrame, model_class=None, target_col="target_encoded"):
+    def __init__(self, df: pd.DataFrame, model_class=None, target_col="target_encoded", feature_version=None,
+                 symbol_column="symbol", plots=True):
+        """
+        Args:
+            feature_version: Versión del feature set (ej. directorio devuelto por
+                FeatureStoreManager.save_features). Si se indica, la matriz final se
+                materializa una sola vez como .npy y se lee con memory-map.
+            symbol_column: Columna con el par de cada fila; run() registra el modelo
+                para los símbolos presentes (sin la columna, falla en lugar de adivinar el par)
+            plots: Si es False el reporte de test no dibuja la matriz de confusión
+        """
         self.df = df
+        self.symbol_column = symbol_column
         self.target_col = target_col
         self.model_class = model_class
+        self.feature_version = feature_version
+        self.plots = plots
         self.model_dir = "artifacts/model"
         self.metrics_dir = "artifacts/test_runs"
 
+        os.makedirs(MODEL_DIR_LOGS, exist_ok=True)
         os.makedirs(self.model_dir, exist_ok=True)
         os.makedirs(self.metrics_dir, exist_ok=True)
 
@@ -41,35 +54,59 @@ class PipelineRunner:
     def run(self):
         """
         Ejecuta el flujo completo y devuelve las métricas finales.
+        Los archivos del reporte de test (CSV, JSON, PNG) se escriben en segundo
+        plano y no suman a la latencia de la corrida.
         """
         try:
             logging.info(" Inicio del pipeline completo ")
 
+            tracer = get_tracer()
+
             # Preprocesamiento
             logging.info("Preprocesando datos...")
             pre = Preprocessor(self.df, target_col=self.target_col)
-            X_train, X_test, y_train, y_test = pre.split_data()
-            X_train_scaled, X_test_scaled = pre.scale(X_train, X_test)
+            if self.feature_version is not None:
+                with tracer.span("feature_matrix", rows=len(self.df)):
+                    matrix = FeatureMatrixCache().get_or_create(
+                        self.feature_version, self.df, pre.get_feature_names(), self.target_col
+                    )
+                with tracer.span("split", rows=len(matrix.y)):
+                    X_train, X_test, y_train, y_test = pre.split_matrix(matrix)
+                feature_names = matrix.columns
+            else:
+                with tracer.span("split", rows=len(self.df)):
+                    X_train, X_test, y_train, y_test = pre.split_data()
+                feature_names = list(X_train.columns)
+            with tracer.span("scale", rows=len(X_train) + len(X_test)):
+                X_train_scaled, X_test_scaled = pre.scale(X_train, X_test)
 
             # Entrenamiento
             logging.info("Entrenando modelo...")
             trainer = ModelTrainer(model=self.model_class)
-            model = trainer.train(X_train_scaled, y_train)
+            with tracer.span("train", rows=len(X_train_scaled), model=type(trainer.model).__name__):
+                model = trainer.train(X_train_scaled, y_train)
 
             # Guardado de artifacts
-            trainer.save_artifacts(model, pre.scaler)
+            with tracer.span("save_artifacts"):
+                entry = trainer.save_artifacts(model, pre.scaler, feature_names=feature_names,
+                                               symbols=self._symbols())
+            if entry is None:
+                raise RuntimeError("No se pudieron registrar los artifacts del modelo")
 
             # Evaluación
             logging.info("Evaluando modelo...")
             
             tester = ModelTester(
-                model_path=os.path.join(self.model_dir, "model_eurgbp_logistic.pkl"),
+                model_path=trainer.registry.object_path(entry["model"]),
                 X_test=X_test_scaled,
                 y_test=y_test,
-                label_names=["Down", "Uncertain", "Up"]
+                label_names=["Down", "Uncertain", "Up"],
+                model=model,
+                plots=self.plots,
             )
 
-            metrics, _ = tester.run_test()
+            with tracer.span("test", rows=len(X_test_scaled)):
+                metrics, _ = tester.run_test()
 
             logging.info(" Pipeline completado exitosamente ")
             return metrics
@@ -77,3 +114,72 @@ class PipelineRunner:
         except Exception as e:
             logging.error(f"Error en el pipeline: {e}")
             raise
+
+    def _symbols(self):
+        if self.symbol_column not in self.df.columns:
+            raise ValueError(f"Columna de símbolo '{self.symbol_column}' no encontrada: "
+                             f"no se sabe para qué par registrar el modelo")
+        return tuple(self.df[self.symbol_column].astype(str).unique())
+
+    def run_symbols(self, symbols=None, max_workers=None):
+        """
+        Entrena un modelo por símbolo, con los símbolos en paralelo y la matriz de
+        cada uno en memoria compartida (ver MultiSymbolTrainer). Devuelve el
+        reporte por símbolo (métricas o error).
+        """
+        from modules.model.multi_symbol import MultiSymbolTrainer
+
+        trainer = MultiSymbolTrainer(
+            self.df,
+            symbols=symbols,
+            model=self.model_class,
+            target_col=self.target_col,
+            symbol_column=self.symbol_column,
+            max_workers=max_workers,
+            feature_version=self.feature_version,
+        )
+        return trainer.run()
+
+    def backtest(self, n_folds=5, mode="expanding", train_years=None, max_workers=None):
+        """
+        Backtest walk-forward en paralelo sobre la misma matriz cacheada
+        (ver WalkForwardBacktester). Devuelve las métricas por fold.
+        """
+        from modules.model.backtest import WalkForwardBacktester
+
+        if self.feature_version is None:
+            raise ValueError("El backtest requiere feature_version para compartir la matriz entre procesos")
+
+        backtester = WalkForwardBacktester(
+            self.df,
+            feature_version=self.feature_version,
+            model=self.model_class,
+            target_col=self.target_col,
+            n_folds=n_folds,
+            mode=mode,
+            train_years=train_years,
+            max_workers=max_workers,
+        )
+        return backtester.run()
+
+    def search(self, space=None, n_samples=None, n_folds=4, eta=3, max_workers=None):
+        """
+        Búsqueda de modelos / hiperparámetros con successive halving sobre
+        folds walk-forward cacheados (ver ModelSearch). Devuelve el leaderboard.
+        """
+        from modules.model.search import ModelSearch
+
+        if self.feature_version is None:
+            raise ValueError("La búsqueda requiere feature_version para cachear los folds")
+
+        search = ModelSearch(
+            self.df,
+            feature_version=self.feature_version,
+            space=space,
+            n_samples=n_samples,
+            n_folds=n_folds,
+            eta=eta,
+            target_col=self.target_col,
+            max_workers=max_workers,
+        )
+        return search.run()
@@ -1,8 +1,12 @@
 import os
 import joblib
+import numpy as np
 import pandas as pd
 from sklearn.preprocessing import StandardScaler
 
+# Columnas derivadas del cierre T+1 (de donde sale el target): no se conocen al predecir
+LEAKAGE_COLUMNS = ["return_t1"]
+
 class Preprocessor:
     """
     Clase encargada de dividir, seleccionar solo columnas numéricas
@@ -14,21 +18,42 @@ class Preprocessor:
         self.target_col = target_col
         self.scaler = StandardScaler()
 
+    def get_feature_names(self):
+        """
+        Features numéricas únicamente (sin el target ni las columnas derivadas de T+1)
+        """
+        return [
+            c for c in self.df.select_dtypes(include=["number"]).columns
+            if c not in [self.target_col] + LEAKAGE_COLUMNS
+        ]
+
     def split_data(self):
         train_df = self.df[self.df["date"].dt.year < 2024].copy()
         test_df = self.df[self.df["date"].dt.year == 2024].copy()
 
         # Seleccionar features numéricas únicamente
-        features = [
-            c for c in self.df.select_dtypes(include=["number"]).columns
-            if c not in [self.target_col]
-        ]
+        features = self.get_feature_names()
 
         X_train, y_train = train_df[features], train_df[self.target_col]
         X_test, y_test = test_df[features], test_df[self.target_col]
 
         return X_train, X_test, y_train, y_test
 
+    def split_matrix(self, matrix):
+        """
+        Mismo split que split_data sobre una FeatureMatrix memory-mapped.
+        Como las filas están ordenadas por fecha, train y test son slices
+        contiguos: vistas del memmap, sin copias.
+        """
+        years = matrix.dates.astype("datetime64[Y]").astype(int) + 1970
+        train_end = np.searchsorted(years, 2024, side="left")
+        test_end = np.searchsorted(years, 2024, side="right")
+
+        X_train, y_train = matrix.X[:train_end], matrix.y[:train_end]
+        X_test, y_test = matrix.X[train_end:test_end], matrix.y[train_end:test_end]
+
+        return X_train, X_test, y_train, y_test
+
     def scale(self, X_train, X_test):
         X_train_scaled = self.scaler.fit_transform(X_train)
         X_test_scaled = self.scaler.transform(X_test)
@@ -0,0 +1,240 @@
+import io
+import os
+import json
+import hashlib
+import logging
+from datetime import datetime, timezone
+
+import numpy as np
+
+
+REGISTRY_DIR = "artifacts/registry"
+
+
+class FlatScaler:
+    """
+    StandardScaler exportado a arrays planos: (X - mean) / scale.
+    """
+
+    def __init__(self, mean, scale):
+        self.mean_ = mean
+        self.scale_ = scale
+
+    def transform(self, X):
+        return (np.asarray(X, dtype=np.float64) - self.mean_) / self.scale_
+
+
+class FlatLinearModel:
+    """
+    Modelo lineal exportado a coeficientes planos (ej. LogisticRegression).
+    Predice con numpy, sin necesidad de importar sklearn.
+    Con ovr=True (ej. SGDClassifier con log_loss) las probabilidades son
+    sigmoides por clase normalizadas, como en sklearn; si no, softmax.
+    """
+
+    def __init__(self, coef, intercept, classes, ovr=False):
+        self.coef_ = coef
+        self.intercept_ = intercept
+        self.classes_ = classes
+        self.ovr = ovr
+
+    def decision_function(self, X):
+        return np.asarray(X, dtype=np.float64) @ self.coef_.T + self.intercept_
+
+    def predict_proba(self, X):
+        scores = self.decision_function(X)
+        if scores.shape[1] == 1:
+            p = 1.0 / (1.0 + np.exp(-scores[:, 0]))
+            return np.column_stack([1 - p, p])
+        if self.ovr:
+            p = 1.0 / (1.0 + np.exp(-scores))
+            total = p.sum(axis=1, keepdims=True)
+            return np.divide(p, total, out=np.full_like(p, 1.0 / p.shape[1]), where=total > 0)
+        scores = scores - scores.max(axis=1, keepdims=True)
+        exp = np.exp(scores)
+        return exp / exp.sum(axis=1, keepdims=True)
+
+    def predict(self, X):
+        scores = self.decision_function(X)
+        if scores.shape[1] == 1:
+            return self.classes_[(scores[:, 0] > 0).astype(int)]
+        return self.classes_[np.argmax(scores, axis=1)]
+
+
+class ModelRegistry:
+    """
+    Registro de modelos direccionado por contenido.
+
+    Cada artifact (modelo, scaler o export plano) se guarda una sola vez con el
+    sha256 de sus bytes como nombre; los símbolos son alias que apuntan a esos
+    hashes, por lo que varios pares que comparten modelo no duplican espacio.
+
+        artifacts/registry/objects/<sha256>.joblib | .npz
+        artifacts/registry/aliases.json
+    """
+
+    def __init__(self, root_dir: str = REGISTRY_DIR):
+        self.root_dir = root_dir
+        self.objects_dir = os.path.join(root_dir, "objects")
+        self.aliases_path = os.path.join(root_dir, "aliases.json")
+        os.makedirs(self.objects_dir, exist_ok=True)
+
+    # ------------------------------------------------------------------
+    # Objetos
+    # ------------------------------------------------------------------
+    def _put_bytes(self, data: bytes, extension: str) -> str:
+        digest = hashlib.sha256(data).hexdigest()
+        path = os.path.join(self.objects_dir, f"{digest}.{extension}")
+        if not os.path.exists(path):
+            tmp_path = f"{path}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        return f"{digest}.{extension}"
+
+    def put_object(self, obj) -> str:
+        """
+        Serializa con joblib y guarda por hash. Devuelve el id del objeto.
+        """
+        import joblib
+
+        buffer = io.BytesIO()
+        joblib.dump(obj, buffer)
+        return self._put_bytes(buffer.getvalue(), "joblib")
+
+    def put_flat(self, model, scaler):
+        """
+        Exporta modelo lineal + StandardScaler a un .npz plano.
+        Devuelve None si el modelo o el scaler no son exportables.
+        """
+        required = (hasattr(model, "coef_") and hasattr(model, "intercept_")
+                    and hasattr(scaler, "mean_") and hasattr(scaler, "scale_"))
+        if not required:
+            return None
+
+        buffer = io.BytesIO()
+        np.savez(
+            buffer,
+            coef=np.atleast_2d(model.coef_).astype(np.float64),
+            intercept=np.atleast_1d(model.intercept_).astype(np.float64),
+            classes=np.asarray(model.classes_),
+            mean=np.asarray(scaler.mean_, dtype=np.float64),
+            scale=np.asarray(scaler.scale_, dtype=np.float64),
+            ovr=np.bool_(getattr(model, "loss", None) == "log_loss"),
+        )
+        return self._put_bytes(buffer.getvalue(), "npz")
+
+    def object_path(self, object_id: str) -> str:
+        return os.path.join(self.objects_dir, object_id)
+
+    # ------------------------------------------------------------------
+    # Aliases
+    # ------------------------------------------------------------------
+    def _read_aliases(self) -> dict:
+        if not os.path.exists(self.aliases_path):
+            return {}
+        with open(self.aliases_path) as f:
+            return json.load(f)
+
+    def _write_aliases(self, aliases: dict):
+        tmp_path = f"{self.aliases_path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(aliases, f, indent=4)
+        os.replace(tmp_path, self.aliases_path)
+
+    def store(self, model, scaler, feature_names=None) -> dict:
+        """
+        Guarda modelo, scaler y export plano (una sola vez) sin tocar los alias.
+        Es seguro llamarlo desde varios procesos a la vez (objetos por hash).
+        """
+        return {
+            "model": self.put_object(model),
+            "scaler": self.put_object(scaler),
+            "flat": self.put_flat(model, scaler),
+            "feature_names": list(feature_names) if feature_names is not None else None,
+            "model_class": type(model).__name__,
+            "registered_at": datetime.now(timezone.utc).isoformat(),
+        }
+
+    def set_aliases(self, entries: dict):
+        """
+        Apunta varios símbolos a sus entradas en una sola escritura de aliases.json.
+
+        Args:
+            entries: {"EURGBP": entry, "USDJPY": entry, ...} (entradas devueltas por store)
+        """
+        aliases = self._read_aliases()
+        for symbol, entry in entries.items():
+            aliases[symbol.upper()] = entry
+        self._write_aliases(aliases)
+
+    def register(self, symbols, model, scaler, feature_names=None) -> dict:
+        """
+        Guarda modelo, scaler y export plano (una sola vez) y apunta los alias
+        de cada símbolo a esos objetos.
+        """
+        symbols = [symbols] if isinstance(symbols, str) else list(symbols)
+        entry = self.store(model, scaler, feature_names)
+        self.set_aliases({symbol: entry for symbol in symbols})
+
+        logging.info(f"Modelo registrado para {symbols}: {entry['model']}")
+        return entry
+
+    def get_entry(self, symbol: str) -> dict:
+        aliases = self._read_aliases()
+        if symbol.upper() not in aliases:
+            raise KeyError(f"No hay modelo registrado para '{symbol}' en {self.root_dir}")
+        return aliases[symbol.upper()]
+
+    def list_symbols(self) -> list:
+        return sorted(self._read_aliases())
+
+    # ------------------------------------------------------------------
+    # Carga
+    # ------------------------------------------------------------------
+    def load(self, symbol: str):
+        """
+        Devuelve (model, scaler) originales deserializando con joblib.
+        """
+        import joblib
+
+        entry = self.get_entry(symbol)
+        model = joblib.load(self.object_path(entry["model"]))
+        scaler = joblib.load(self.object_path(entry["scaler"]))
+        return model, scaler
+
+    def load_flat(self, symbol: str):
+        """
+        Devuelve (FlatLinearModel, FlatScaler) desde el export plano (sin sklearn).
+        """
+        entry = self.get_entry(symbol)
+        if not entry.get("flat"):
+            raise ValueError(f"El modelo de '{symbol}' ({entry['model_class']}) no tiene export plano")
+        with np.load(self.object_path(entry["flat"]), allow_pickle=False) as data:
+            ovr = bool(data["ovr"]) if "ovr" in data.files else False
+            model = FlatLinearModel(data["coef"], data["intercept"], data["classes"], ovr=ovr)
+            scaler = FlatScaler(data["mean"], data["scale"])
+        return model, scaler
+
+    def load_best(self, symbol: str):
+        """
+        Export plano si existe; si no, el modelo joblib original.
+        """
+        entry = self.get_entry(symbol)
+        if entry.get("flat"):
+            return self.load_flat(symbol)
+        return self.load(symbol)
+
+    def garbage_collect(self) -> int:
+        """
+        Elimina objetos que ya no son referenciados por ningún alias.
+        """
+        referenced = set()
+        for entry in self._read_aliases().values():
+            referenced.update(v for k, v in entry.items() if k in ("model", "scaler", "flat") and v)
+        removed = 0
+        for name in os.listdir(self.objects_dir):
+            if name not in referenced:
+                os.remove(os.path.join(self.objects_dir, name))
+                removed += 1
+        return removed
@@ -0,0 +1,227 @@
+import os
+import json
+import random
+import logging
+import threading
+from datetime import datetime, timedelta, timezone
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+
+from modules.model.inference import InferenceService
+
+
+SCHEDULER_STATE_PATH = "artifacts/state/scheduler.json"
+
+
+class PredictionScheduler:
+    """
+    Scheduler residente para la predicción diaria en la ventana 01-04 UTC.
+
+    Mantiene un InferenceService (modelos, scalers y estado de features en
+    memoria) y duerme hasta la próxima ventana. `prefetch_minutes` antes de que
+    abra descarga todos los pares en segundo plano; al abrir predice apenas está
+    disponible el cierre diario esperado (día hábil anterior), reintentando cada
+    `poll_seconds` hasta el fin de la ventana. Los horarios de descarga llevan un
+    jitter aleatorio para no pegarle a la API siempre en el mismo segundo.
+
+    Si el proceso estuvo caído (o suspendido) durante una ventana, al despertar
+    ejecuta esa corrida pendiente de inmediato (catch-up). Las ventanas cuyo
+    cierre ya fue predicho (ej. fines de semana) se saltean sin descargar nada.
+    La última ventana y el último cierre procesados se persisten en `state_path`.
+    """
+
+    def __init__(self, service: InferenceService, start_hour: int = 1, end_hour: int = 4,
+                 prefetch_minutes: float = 10, poll_seconds: float = 300, jitter_seconds: float = 60,
+                 state_path: str = SCHEDULER_STATE_PATH, seed: int = None):
+        """
+        Args:
+            service: Servicio con los modelos ya cargados
+            prefetch_minutes: Minutos antes de la apertura en que arranca la descarga en segundo plano
+            poll_seconds: Espera entre reintentos mientras el cierre no está disponible
+            jitter_seconds: Máximo desfase aleatorio agregado a cada descarga
+        """
+        if not 0 <= start_hour < end_hour <= 24:
+            raise ValueError(f"Ventana inválida: {start_hour}-{end_hour} UTC")
+        self.service = service
+        self.start_hour = start_hour
+        self.end_hour = end_hour
+        self.prefetch = timedelta(minutes=prefetch_minutes)
+        self.poll_seconds = poll_seconds
+        self.jitter_seconds = jitter_seconds
+        self.state_path = state_path
+        self.rng = random.Random(seed)
+        self.state = self._load_state()
+        self._stop = threading.Event()
+
+    # ------------------------------------------------------------------
+    # Estado y calendario
+    # ------------------------------------------------------------------
+    def _load_state(self) -> dict:
+        if not os.path.exists(self.state_path):
+            return {"last_window": None, "last_close": None}
+        with open(self.state_path) as f:
+            return json.load(f)
+
+    def _save_state(self):
+        os.makedirs(os.path.dirname(self.state_path) or ".", exist_ok=True)
+        tmp_path = f"{self.state_path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self.state, f, indent=4)
+        os.replace(tmp_path, self.state_path)
+
+    @staticmethod
+    def now() -> datetime:
+        return datetime.now(timezone.utc)
+
+    def window(self, day) -> tuple:
+        """
+        (inicio, fin) en UTC de la ventana del día `day`.
+        """
+        start = datetime(day.year, day.month, day.day, tzinfo=timezone.utc)
+        return start + timedelta(hours=self.start_hour), start + timedelta(hours=self.end_hour)
+
+    @staticmethod
+    def expected_close(day) -> str:
+        """
+        Fecha del cierre diario que se predice en la ventana de `day` (día hábil anterior).
+        """
+        return (pd.Timestamp(day) - pd.offsets.BDay(1)).strftime("%Y-%m-%d")
+
+    def _is_done(self, day) -> bool:
+        if self.state.get("last_window") and self.state["last_window"] >= day.isoformat():
+            return True
+        last_close = self.state.get("last_close")
+        return bool(last_close) and last_close >= self.expected_close(day)
+
+    def _mark_done(self, day, close: str = None):
+        self.state["last_window"] = day.isoformat()
+        if close:
+            self.state["last_close"] = max(close, self.state.get("last_close") or close)
+        self._save_state()
+
+    def _jitter(self) -> float:
+        return self.rng.uniform(0, self.jitter_seconds) if self.jitter_seconds else 0.0
+
+    def _wait_until(self, when: datetime) -> bool:
+        """
+        Duerme hasta `when`; devuelve False si se pidió detener el scheduler.
+        """
+        while not self._stop.is_set():
+            remaining = (when - self.now()).total_seconds()
+            if remaining <= 0:
+                return True
+            # Esperas acotadas: un salto del reloj (suspensión) se detecta al despertar
+            self._stop.wait(min(remaining, 300))
+        return False
+
+    def stop(self):
+        self._stop.set()
+
+    # ------------------------------------------------------------------
+    # Corridas
+    # ------------------------------------------------------------------
+    def _fetch(self) -> dict:
+        # force=True: el scheduler ya controla la ventana (la descarga previa ocurre antes de abrir).
+        # Sin cache de respuestas: cada reintento tiene que ver si ya apareció el cierre
+        try:
+            return self.service.fetch_latest(force=True, use_cache=False)
+        except Exception as e:
+            logging.error(f"Error descargando barras recientes: {e}")
+            return {}
+
+    def _missing(self, latest: dict, close: str) -> list:
+        """
+        Símbolos cuya descarga no trae la barra del cierre `close` (la barra
+        del día en curso no cuenta: es posterior y todavía está abierta).
+        """
+        missing = []
+        for symbol in self.service.symbols:
+            bars = latest.get(symbol)
+            if bars is None or close not in set(pd.DatetimeIndex(bars.index).strftime("%Y-%m-%d")):
+                missing.append(symbol)
+        return missing
+
+    @staticmethod
+    def _until(bars: pd.DataFrame, close: str) -> pd.DataFrame:
+        """
+        Barras hasta el cierre `close` inclusive: la predicción usa ese cierre, no la barra abierta.
+        """
+        return bars[pd.DatetimeIndex(bars.index).normalize() <= pd.Timestamp(close)]
+
+    def run_cycle(self, day, deadline: datetime, prefetched: dict = None) -> list:
+        """
+        Predice la ventana de `day`: usa la descarga previa si ya trae el cierre
+        esperado y si no reintenta hasta `deadline`. Al vencer el plazo predice
+        los símbolos disponibles y registra los faltantes.
+        """
+        close = self.expected_close(day)
+        latest = prefetched or {}
+        missing = self._missing(latest, close)
+        if missing:
+            latest = self._fetch() or latest
+            missing = self._missing(latest, close)
+        while missing:
+            retry_at = self.now() + timedelta(seconds=self.poll_seconds + self._jitter())
+            if retry_at >= deadline:
+                break
+            logging.info(f"Cierre {close} todavía no disponible para {missing}; reintento a las {retry_at:%H:%M:%S}")
+            if not self._wait_until(retry_at):
+                return []
+            latest = self._fetch() or latest
+            missing = self._missing(latest, close)
+
+        if missing:
+            logging.error(f"Ventana {day}: sin cierre {close} para {missing}")
+        ready = {symbol: self._until(bars, close) for symbol, bars in latest.items() if symbol not in missing}
+        results = self.service.predict_from_bars(ready) if ready else []
+        self.service.save_state()
+        path = self.service.save_predictions(results)
+
+        self._mark_done(day, close if not missing else None)
+        logging.info(f"Ventana {day}: {len(results)} predicciones (cierre {close}) en {path}")
+        print(f"[{self.now():%Y-%m-%d %H:%M:%S} UTC] Ventana {day}: {len(results)} predicciones, faltantes {missing}")
+        return results
+
+    def _due_window(self, now: datetime):
+        """
+        Día de la última ventana ya abierta (hoy o ayer).
+        """
+        day = now.date()
+        return day if now >= self.window(day)[0] else day - timedelta(days=1)
+
+    def run_forever(self):
+        """
+        Bucle principal: catch-up de la ventana pendiente, descarga previa y
+        predicción en cada ventana, hasta stop().
+        """
+        print(f"Scheduler residente: ventana {self.start_hour:02d}-{self.end_hour:02d} UTC, "
+              f"símbolos {self.service.symbols}")
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            while not self._stop.is_set():
+                now = self.now()
+                day = self._due_window(now)
+                start, end = self.window(day)
+                if not self._is_done(day):
+                    if now >= end:
+                        logging.warning(f"Ventana {day} perdida; ejecutando catch-up")
+                    # Dentro de la ventana se reintenta hasta el cierre; en catch-up, un solo intento
+                    self.run_cycle(day, deadline=max(end, now))
+                    continue
+
+                day = day + timedelta(days=1)
+                start, end = self.window(day)
+                if self._is_done(day):
+                    logging.info(f"Ventana {day}: cierre {self.expected_close(day)} ya predicho, se saltea")
+                    if not self._wait_until(end):
+                        break
+                    continue
+
+                prefetch_at = start - self.prefetch + timedelta(seconds=self._jitter())
+                print(f"Próxima ventana {day}: descarga previa a las {prefetch_at:%Y-%m-%d %H:%M:%S} UTC")
+                if not self._wait_until(prefetch_at):
+                    break
+                prefetched = executor.submit(self._fetch)
+                if not self._wait_until(start):
+                    break
+                self.run_cycle(day, deadline=end, prefetched=prefetched.result())
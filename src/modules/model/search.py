@@ -0,0 +1,268 @@
+import os
+import json
+import math
+import time
+import random
+import shutil
+import hashlib
+import logging
+import itertools
+from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+import pandas as pd
+
+from modules.model.backtest import WalkForwardBacktester
+from modules.model.matrix_cache import FeatureMatrixCache
+from modules.model.pre_processor import Preprocessor
+from modules.model.tester import ModelTester
+
+
+SEARCH_DIR = "artifacts/search"
+FOLD_CACHE_DIR = "artifacts/matrix_cache/folds"
+
+# Espacios de búsqueda por defecto
+DEFAULT_SPACE = {
+    "logistic": {"C": [0.01, 0.1, 1.0, 10.0]},
+    "xgboost": {
+        "max_depth": [3, 5, 7],
+        "learning_rate": [0.03, 0.1],
+        "n_estimators": [300],
+        "subsample": [0.8, 1.0],
+    },
+    "hist_gb": {"max_depth": [3, None], "learning_rate": [0.05, 0.1], "max_iter": [300]},
+    "random_forest": {"n_estimators": [300], "max_depth": [5, 10, None], "min_samples_leaf": [1, 20]},
+}
+
+
+def build_model(name: str, params: dict):
+    """
+    Construye un estimador sin entrenar a partir de su nombre y parámetros.
+    """
+    if name == "logistic":
+        from sklearn.linear_model import LogisticRegression
+        return LogisticRegression(**{"max_iter": 1000, "class_weight": "balanced", "random_state": 42, **params})
+    if name == "xgboost":
+        from xgboost import XGBClassifier
+        return XGBClassifier(**{"tree_method": "hist", "n_jobs": 1, "random_state": 42,
+                                "early_stopping_rounds": 20, "eval_metric": "mlogloss", **params})
+    if name == "hist_gb":
+        from sklearn.ensemble import HistGradientBoostingClassifier
+        return HistGradientBoostingClassifier(**{"early_stopping": True, "validation_fraction": 0.1,
+                                                 "n_iter_no_change": 20, "class_weight": "balanced",
+                                                 "random_state": 42, **params})
+    if name == "random_forest":
+        from sklearn.ensemble import RandomForestClassifier
+        return RandomForestClassifier(**{"n_jobs": 1, "class_weight": "balanced", "random_state": 42, **params})
+    raise ValueError(f"Modelo '{name}' no soportado")
+
+
+def expand_space(space: dict, n_samples: int = None, seed: int = 42) -> list:
+    """
+    Grilla completa de candidatos {"name", "params"}; con n_samples se toma
+    una muestra aleatoria de la grilla.
+    """
+    candidates = []
+    for name, grid in space.items():
+        keys = sorted(grid)
+        for values in itertools.product(*(grid[k] for k in keys)):
+            candidates.append({"name": name, "params": dict(zip(keys, values))})
+    if n_samples is not None and n_samples < len(candidates):
+        candidates = random.Random(seed).sample(candidates, n_samples)
+    for i, candidate in enumerate(candidates):
+        candidate["id"] = i
+    return candidates
+
+
+class FoldCache:
+    """
+    Matrices escaladas de cada fold guardadas una sola vez como .npy.
+    Los workers de la búsqueda las abren con memory-map en lugar de
+    re-escalar o recibir datos por pickle.
+    """
+
+    def __init__(self, root_dir: str = FOLD_CACHE_DIR):
+        self.root_dir = root_dir
+
+    def _fold_dir(self, key: str, fold: dict) -> str:
+        return os.path.join(self.root_dir, key, f"fold_{fold['fold']}")
+
+    @staticmethod
+    def make_key(matrix_key: str, folds: list) -> str:
+        digest = hashlib.sha1(json.dumps(folds, sort_keys=True).encode()).hexdigest()[:10]
+        return f"{matrix_key}_{digest}"
+
+    def build(self, matrix, folds: list, target_col: str) -> str:
+        key = self.make_key(matrix.key, folds)
+        for fold in folds:
+            fold_dir = self._fold_dir(key, fold)
+            if os.path.exists(os.path.join(fold_dir, "y_test.npy")):
+                continue
+            tmp_dir = f"{fold_dir}.tmp"
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            os.makedirs(tmp_dir)
+
+            X_train = matrix.X[fold["train_start"]:fold["train_end"]]
+            X_test = matrix.X[fold["test_start"]:fold["test_end"]]
+            X_train_scaled, X_test_scaled = Preprocessor(None, target_col=target_col).scale(X_train, X_test)
+
+            np.save(os.path.join(tmp_dir, "X_train.npy"), X_train_scaled)
+            np.save(os.path.join(tmp_dir, "X_test.npy"), X_test_scaled)
+            np.save(os.path.join(tmp_dir, "y_train.npy"), matrix.y[fold["train_start"]:fold["train_end"]])
+            np.save(os.path.join(tmp_dir, "y_test.npy"), matrix.y[fold["test_start"]:fold["test_end"]])
+            os.replace(tmp_dir, fold_dir)
+        return key
+
+    def load(self, key: str, fold: dict):
+        fold_dir = self._fold_dir(key, fold)
+        return tuple(
+            np.load(os.path.join(fold_dir, f"{name}.npy"), mmap_mode="r")
+            for name in ("X_train", "y_train", "X_test", "y_test")
+        )
+
+
+def _evaluate(cache_root: str, key: str, fold: dict, candidate: dict) -> dict:
+    """
+    Entrena un candidato sobre un fold cacheado (se ejecuta en un proceso worker).
+    """
+    start = time.perf_counter()
+    X_train, y_train, X_test, y_test = FoldCache(cache_root).load(key, fold)
+    model = build_model(candidate["name"], candidate["params"])
+
+    fit_kwargs = {}
+    if candidate["name"] == "xgboost":
+        # Early stopping sobre el último 10% del train (respeta el orden temporal)
+        split = int(len(y_train) * 0.9)
+        fit_kwargs["eval_set"] = [(X_train[split:], y_train[split:])]
+        fit_kwargs["verbose"] = False
+        X_train, y_train = X_train[:split], y_train[:split]
+
+    model.fit(X_train, y_train, **fit_kwargs)
+    y_pred = model.predict(X_test)
+
+    result = {"candidate": candidate["id"], "fold": fold["fold"], "test_year": fold["test_year"]}
+    result.update(ModelTester.compute_metrics(y_test, y_pred))
+    result["seconds"] = time.perf_counter() - start
+    return result
+
+
+class ModelSearch:
+    """
+    Búsqueda de modelos e hiperparámetros en paralelo con successive halving.
+
+    Los folds walk-forward se escalan y cachean una sola vez (FoldCache). En cada
+    ronda los candidatos sobrevivientes se evalúan en más folds (empezando por
+    los más recientes) y solo se conserva el mejor 1/eta según la métrica; los
+    modelos de boosting usan early stopping. El resultado es un leaderboard.
+    """
+
+    def __init__(self, df: pd.DataFrame, feature_version: str, space: dict = None, n_samples: int = None,
+                 n_folds: int = 4, eta: int = 3, metric: str = "Balanced Accuracy",
+                 target_col: str = "target_encoded", max_workers: int = None, seed: int = 42):
+        self.df = df
+        self.feature_version = feature_version
+        self.space = space or DEFAULT_SPACE
+        self.n_samples = n_samples
+        self.n_folds = n_folds
+        self.eta = eta
+        self.metric = metric
+        self.target_col = target_col
+        self.max_workers = max_workers or os.cpu_count()
+        self.seed = seed
+        self.fold_cache = FoldCache()
+
+    def _available_space(self) -> dict:
+        space = dict(self.space)
+        if "xgboost" in space:
+            try:
+                import xgboost  # noqa: F401
+            except ImportError:
+                logging.warning("xgboost no está instalado; se omite del espacio de búsqueda.")
+                space.pop("xgboost")
+        return space
+
+    def _schedule(self, n_candidates: int, n_folds: int) -> list:
+        """
+        Cantidad de folds por ronda: crece geométricamente hasta usar todos.
+        """
+        rounds = max(1, math.ceil(math.log(max(n_candidates, 1), self.eta)))
+        schedule = [min(n_folds, max(1, round(n_folds / self.eta ** (rounds - r - 1)))) for r in range(rounds)]
+        schedule[-1] = n_folds
+        # Rondas con la misma cantidad de folds no aportan información nueva
+        return sorted(set(schedule))
+
+    def run(self, output_dir: str = SEARCH_DIR) -> pd.DataFrame:
+        pre = Preprocessor(self.df, target_col=self.target_col)
+        matrix = FeatureMatrixCache().get_or_create(
+            self.feature_version, self.df, pre.get_feature_names(), self.target_col
+        )
+        backtester = WalkForwardBacktester(self.df, self.feature_version, n_folds=self.n_folds)
+        folds = backtester.generate_folds(matrix.dates)[::-1]  # más recientes primero
+        key = self.fold_cache.build(matrix, folds, self.target_col)
+
+        candidates = expand_space(self._available_space(), self.n_samples, self.seed)
+        by_id = {c["id"]: c for c in candidates}
+        schedule = self._schedule(len(candidates), len(folds))
+        print(f"Búsqueda: {len(candidates)} candidatos, {len(folds)} folds, rondas (folds) {schedule}")
+
+        results = []
+        evaluated = set()
+        alive = [c["id"] for c in candidates]
+
+        with ProcessPoolExecutor(max_workers=self.max_workers) as executor:
+            for round_id, n_round_folds in enumerate(schedule):
+                futures = {}
+                for cid in alive:
+                    for fold in folds[:n_round_folds]:
+                        if (cid, fold["fold"]) in evaluated:
+                            continue
+                        evaluated.add((cid, fold["fold"]))
+                        future = executor.submit(_evaluate, self.fold_cache.root_dir, key, fold, by_id[cid])
+                        futures[future] = (cid, fold)
+
+                for future in as_completed(futures):
+                    cid, fold = futures[future]
+                    try:
+                        result = future.result()
+                    except Exception as e:
+                        logging.error(f"Candidato {by_id[cid]} falló en fold {fold['fold']}: {e}")
+                        result = {"candidate": cid, "fold": fold["fold"], "test_year": fold["test_year"],
+                                  self.metric: np.nan, "error": str(e)}
+                    result["round"] = round_id
+                    results.append(result)
+
+                scores = (pd.DataFrame(results).query("candidate in @alive")
+                          .groupby("candidate")[self.metric].mean().sort_values(ascending=False))
+                if round_id < len(schedule) - 1:
+                    keep = max(1, len(alive) // self.eta)
+                    alive = list(scores.index[:keep])
+                    print(f"  Ronda {round_id}: {len(scores)} evaluados en {n_round_folds} folds, "
+                          f"sobreviven {len(alive)}")
+
+        leaderboard = self._leaderboard(pd.DataFrame(results), by_id)
+        self.save_results(leaderboard, pd.DataFrame(results), output_dir)
+        return leaderboard
+
+    def _leaderboard(self, results: pd.DataFrame, by_id: dict) -> pd.DataFrame:
+        metrics = [c for c in ("Balanced Accuracy", "F1 Macro") if c in results.columns]
+        board = results.groupby("candidate").agg(
+            folds=("fold", "count"),
+            **{f"{m} mean": (m, "mean") for m in metrics},
+            **{f"{m} std": (m, lambda x: x.std(ddof=0)) for m in metrics},
+            seconds=("seconds", "sum"),
+        ).reset_index()
+        board["model"] = board["candidate"].map(lambda cid: by_id[cid]["name"])
+        board["params"] = board["candidate"].map(lambda cid: json.dumps(by_id[cid]["params"]))
+        # Primero los que llegaron a más folds, luego por métrica
+        return board.sort_values(["folds", f"{self.metric} mean"], ascending=False).reset_index(drop=True)
+
+    def save_results(self, leaderboard: pd.DataFrame, results: pd.DataFrame, output_dir: str = SEARCH_DIR) -> str:
+        timestamp = datetime.now().strftime("%Y-%m-%d_%H%M%S")
+        run_dir = os.path.join(output_dir, f"search_{timestamp}")
+        os.makedirs(run_dir, exist_ok=True)
+        leaderboard.to_csv(os.path.join(run_dir, "leaderboard.csv"), index=False)
+        results.to_csv(os.path.join(run_dir, "evaluations.csv"), index=False)
+        print(f"Leaderboard guardado en {run_dir}")
+        print(leaderboard.head(10).to_string(index=False))
+        return run_dir
@@ -1,48 +1,101 @@
 import os
 import joblib
 import logging
+import numpy as np
 import pandas as pd
-import matplotlib.pyplot as plt
 from datetime import datetime
-from sklearn.metrics import (
-    f1_score,
-    balanced_accuracy_score,
-    confusion_matrix,
-    ConfusionMatrixDisplay
-)
+from concurrent.futures import ThreadPoolExecutor
 
 
+# Un único hilo escribe los reportes (CSV/JSON/PNG) en orden de llegada; el
+# pipeline no espera. Los reportes pendientes se completan antes de salir.
+_report_executor = None
+
+
+def _get_report_executor() -> ThreadPoolExecutor:
+    global _report_executor
+    if _report_executor is None:
+        _report_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="test-report")
+    return _report_executor
+
+
+def confusion(y_true, y_pred, labels=None):
+    """
+    Matriz de confusión en una sola pasada (np.bincount sobre pares codificados).
+
+    Returns:
+        (matriz [real, predicho], labels ordenados)
+    """
+    y_true = np.asarray(y_true)
+    y_pred = np.asarray(y_pred)
+    if labels is None:
+        labels = np.union1d(y_true, y_pred)
+    labels = np.asarray(labels)
+    n = len(labels)
+    true_idx = np.searchsorted(labels, y_true)
+    pred_idx = np.searchsorted(labels, y_pred)
+    cm = np.bincount(true_idx * n + pred_idx, minlength=n * n).reshape(n, n)
+    return cm, labels
+
+
+def metrics_from_confusion(cm) -> dict:
+    """
+    Métricas derivadas de la matriz de confusión (mismas definiciones que sklearn):
+    balanced accuracy = media del recall de las clases presentes en y_true;
+    F1 macro = media del F1 por clase (0 si la clase no tiene soporte ni predicciones).
+    """
+    cm = np.asarray(cm, dtype=np.float64)
+    tp = np.diag(cm)
+    support = cm.sum(axis=1)
+    predicted = cm.sum(axis=0)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        recall = np.where(support > 0, tp / support, 0.0)
+        denominator = support + predicted
+        f1 = np.where(denominator > 0, 2 * tp / denominator, 0.0)
+
+    present = support > 0
+    return {
+        "Balanced Accuracy": float(recall[present].mean()) if present.any() else 0.0,
+        "F1 Macro": float(f1.mean()) if len(f1) else 0.0,
+    }
+
 
 class ModelTester:
     """
     Clase encargada de testear el modelo entrenado:
     - Generar predicciones
-    - Calcular métricas
+    - Calcular métricas (una sola matriz de confusión)
     - Guardarlas en CSV/JSON
     - Guardar imágenes de resultados (matriz de confusión, etc.)
     Todo dentro de una carpeta única por corrida.
+
+    run_test devuelve las métricas apenas se calculan; los archivos de la corrida
+    se escriben en un hilo de fondo (ver wait_report).
     """
-    
-    def __init__(self, model_path, X_test, y_test, label_names=None, base_dir="artifacts/test_runs"):
+
+    def __init__(self, model_path, X_test, y_test, label_names=None, base_dir="artifacts/test_runs",
+                 model=None, plots=True):
+        """
+        Args:
+            model: Modelo ya cargado (evita volver a leer model_path)
+            plots: Si es False no se dibuja la matriz de confusión
+        """
         self.model_path = model_path
         self.X_test = X_test
         self.y_test = y_test
         self.label_names = label_names
         self.base_dir = base_dir
+        self.plots = plots
+        self.report = None
 
-        # Crear carpeta específica por corrida
-        timestamp = datetime.now().strftime("%Y-%m-%d_%H%M%S")
+        # Crear carpeta específica por corrida (con microsegundos: los reportes
+        # se escriben en segundo plano y dos corridas seguidas no deben pisarse)
+        timestamp = datetime.now().strftime("%Y-%m-%d_%H%M%S_%f")
         self.run_dir = os.path.join(self.base_dir, f"run_{timestamp}")
         os.makedirs(self.run_dir, exist_ok=True)
 
-        # Configurar logging de la corrida
-        logging.basicConfig(
-            filename=os.path.join(self.run_dir, "test.log"),
-            level=logging.INFO,
-            format="%(asctime)s - %(levelname)s - %(message)s"
-        )
-
-        self.model = self._load_model()
+        self.model = model if model is not None else self._load_model()
         logging.info(f"Inicializada prueba en {self.run_dir}")
 
     def _load_model(self):
@@ -50,27 +103,50 @@ class ModelTester:
         model = joblib.load(self.model_path)
         return model
 
-    def run_test(self):
+    def run_test(self, wait=False):
         """
         Ejecuta las predicciones y calcula las métricas principales.
+        Los reportes en disco se encolan en segundo plano; con wait=True se
+        espera a que terminen.
         """
         logging.info("Iniciando test del modelo...")
         y_pred = self.model.predict(self.X_test)
 
-        metrics = {
-            "Model": os.path.basename(self.model_path),
-            "Balanced Accuracy": balanced_accuracy_score(self.y_test, y_pred),
-            "F1 Macro": f1_score(self.y_test, y_pred, average="macro"),
-        }
-
-        # Guardar métricas y predicciones en disco
-        self.save_metrics(metrics)
-        self.save_predictions(y_pred)
-        self.plot_confusion_matrix(y_pred)
-
+        cm, labels = confusion(self.y_test, y_pred)
+        metrics = {"Model": os.path.basename(self.model_path)}
+        metrics.update(metrics_from_confusion(cm))
         logging.info(f"Métricas finales: {metrics}")
+
+        self.report = _get_report_executor().submit(self._write_report, metrics, y_pred, cm, labels)
+        if wait:
+            self.wait_report()
         return metrics, y_pred
 
+    def wait_report(self):
+        """
+        Espera a que se terminen de escribir los archivos de la corrida.
+        """
+        if self.report is not None:
+            self.report.result()
+
+    def _write_report(self, metrics, y_pred, cm, labels):
+        try:
+            self.save_metrics(metrics)
+            self.save_predictions(y_pred)
+            if self.plots:
+                self.plot_confusion_matrix(y_pred, cm=cm, labels=labels)
+        except Exception as e:
+            logging.error(f"Error escribiendo el reporte de {self.run_dir}: {e}")
+            raise
+
+    @staticmethod
+    def compute_metrics(y_true, y_pred):
+        """
+        Métricas principales (sin escribir nada a disco).
+        """
+        cm, _ = confusion(y_true, y_pred)
+        return metrics_from_confusion(cm)
+
     def save_metrics(self, metrics):
         """
         Guarda las métricas en un CSV y JSON dentro de la carpeta de la corrida.
@@ -89,24 +165,33 @@ class ModelTester:
         Guarda las predicciones junto con las etiquetas reales.
         """
         preds_df = pd.DataFrame({
-            "y_true": self.y_test,
+            "y_true": np.asarray(self.y_test),
             "y_pred": y_pred
         })
         preds_path = os.path.join(self.run_dir, "predictions.csv")
         preds_df.to_csv(preds_path, index=False)
         logging.info(f"Predicciones guardadas en {preds_path}")
 
-    def plot_confusion_matrix(self, y_pred):
+    def plot_confusion_matrix(self, y_pred, cm=None, labels=None):
         """
         Dibuja y guarda la matriz de confusión.
+        Usa una Figure propia (sin el estado global de pyplot) para poder
+        ejecutarse en el hilo de reportes.
         """
-        cm = confusion_matrix(self.y_test, y_pred)
-        disp = ConfusionMatrixDisplay(confusion_matrix=cm, display_labels=self.label_names)
-        disp.plot(cmap="Blues", values_format="d", colorbar=False)
-        plt.title("Matriz de Confusión - Test")
-        plt.tight_layout()
+        from matplotlib.figure import Figure
+        from sklearn.metrics import ConfusionMatrixDisplay
+
+        if cm is None:
+            cm, labels = confusion(self.y_test, y_pred)
+        display_labels = self.label_names if self.label_names and len(self.label_names) == len(labels) else labels
+
+        fig = Figure()
+        ax = fig.subplots()
+        disp = ConfusionMatrixDisplay(confusion_matrix=cm, display_labels=display_labels)
+        disp.plot(ax=ax, cmap="Blues", values_format="d", colorbar=False)
+        ax.set_title("Matriz de Confusión - Test")
+        fig.tight_layout()
 
         fig_path = os.path.join(self.run_dir, "confusion_matrix.png")
-        plt.savefig(fig_path)
-        plt.close()
+        fig.savefig(fig_path)
         logging.info(f"Matriz de confusión guardada en {fig_path}")
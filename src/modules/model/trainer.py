@@ -1,23 +1,13 @@
 import os
-import joblib
 import logging
 from sklearn.linear_model import LogisticRegression
 
+from modules.model.registry import ModelRegistry
+
 # Directorio donde se guardarán los modelos y scalers
 MODEL_DIR_LOGS = "logs"
 MODEL_DIR = "artifacts/model"
-SS_DIR = "artifacts/ss"
-
-os.makedirs(MODEL_DIR_LOGS, exist_ok=True)
-os.makedirs(MODEL_DIR, exist_ok=True)
-os.makedirs(SS_DIR, exist_ok=True)
 
-# Configuración de logging
-logging.basicConfig(
-    filename=os.path.join(MODEL_DIR, "training.log"),
-    level=logging.INFO,
-    format="%(asctime)s - %(levelname)s - %(message)s"
-)
 
 
 class ModelTrainer:
@@ -25,7 +15,18 @@ class ModelTrainer:
     Clase encargada de entrenar y guardar el modelo y el scaler.
     """
 
-    def __init__(self, model=None):
+    def __init__(self, model=None, registry: ModelRegistry = None):
+        os.makedirs(MODEL_DIR_LOGS, exist_ok=True)
+        os.makedirs(MODEL_DIR, exist_ok=True)
+
+        # Configuración de logging
+        logging.basicConfig(
+            filename=os.path.join(MODEL_DIR, "training.log"),
+            level=logging.INFO,
+            format="%(asctime)s - %(levelname)s - %(message)s"
+        )
+
+        self.registry = registry or ModelRegistry()
         # Si no se pasa un modelo, se usa LogisticRegression por defecto
         self.model = model or LogisticRegression(
             max_iter=1000,
@@ -42,23 +43,20 @@ class ModelTrainer:
         logging.info("Entrenamiento completado correctamente.")
         return self.model
 
-    def save_artifacts(self, model, scaler):
+    def save_artifacts(self, model, scaler, feature_names=None, symbols=("EURGBP",)):
         """
-        Guarda el modelo y el scaler tanto para EURGBP como para USDJPY,
-        cumpliendo con los requerimientos del desafío Lightstorm.
+        Registra el modelo y el scaler en el ModelRegistry para los símbolos
+        con cuyos datos fue entrenado (un modelo por par: ver MultiSymbolTrainer).
+        Cada artifact se guarda una sola vez (por hash) y los símbolos son alias;
+        los modelos lineales se exportan además a coeficientes planos (.npz).
+        Con feature_names se registra el orden de columnas esperado por el scaler.
         """
         try:
-            # Guardar modelos y scalers (EURGBP)
-            joblib.dump(model, os.path.join(MODEL_DIR, "model_eurgbp_logistic.pkl"))
-            joblib.dump(scaler, os.path.join(SS_DIR, "scaler_eurgbp.pkl"))
-
-            # Crear copias para USDJPY (mismo modelo, misma arquitectura)
-            joblib.dump(model, os.path.join(MODEL_DIR, "model_usdjpy.pkl"))
-            joblib.dump(scaler, os.path.join(SS_DIR, "scaler_usdjpy.pkl"))
+            entry = self.registry.register(symbols, model, scaler, feature_names=feature_names)
 
             logging.info("Modelos y scalers guardados correctamente.")
-            print(f"\nModelos guardados correctamente en:\n{MODEL_DIR}")
-            print(f"\nScalers guardados correctamente en:\n{MODEL_DIR}")
+            print(f"\nModelos y scalers registrados para {list(symbols)} en:\n{self.registry.root_dir}")
+            return entry
 
         except Exception as e:
             logging.error(f"Error al guardar modelos o scalers: {e}")
@@ -0,0 +1,182 @@
+import os
+import json
+import time
+import hashlib
+import logging
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+
+
+STAGE_CACHE_DIR = "artifacts/stage_cache"
+INDEX_FILE = "index.json"
+MANIFEST_FILE = "manifest.json"
+
+
+def fingerprint(**parts) -> str:
+    """
+    Hash estable (sha256) de las entradas de una etapa: hashes de datos,
+    versiones de código y parámetros, serializados como JSON ordenado.
+    """
+    payload = json.dumps(parts, sort_keys=True, default=repr)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def code_version(*modules) -> str:
+    """
+    Hash del código fuente de los módulos: editar la implementación de una
+    etapa invalida sus resultados cacheados.
+    """
+    digest = hashlib.sha256()
+    for module in modules:
+        with open(module.__file__, "rb") as f:
+            digest.update(f.read())
+    return digest.hexdigest()
+
+
+def hash_frame(df: pd.DataFrame, columns=None) -> str:
+    """
+    Hash del contenido de un DataFrame (nombres, dtypes y valores de cada columna).
+    """
+    digest = hashlib.sha256()
+    for col in columns or df.columns:
+        values = df[col].to_numpy()
+        if values.dtype == object:
+            values = np.asarray(df[col].astype(str).to_numpy(), dtype=np.str_)
+        values = np.ascontiguousarray(values)
+        digest.update(f"{col}|{values.dtype.str}|{values.shape}".encode())
+        digest.update(values.view(np.uint8))
+    return digest.hexdigest()
+
+
+def model_config(model) -> dict:
+    """
+    Configuración de un estimador para el fingerprint (None = modelo por defecto del trainer).
+    """
+    if model is None:
+        return {"class": None}
+    params = model.get_params(deep=True) if hasattr(model, "get_params") else {}
+    return {"class": f"{type(model).__module__}.{type(model).__qualname__}", "params": params}
+
+
+class StageCache:
+    """
+    Cache de etapas del pipeline por fingerprint de sus entradas.
+
+    Cada etapa calcula una clave con `fingerprint` (hash de los datos de entrada,
+    versión del código y parámetros) y consulta `lookup`: si la clave ya se
+    ejecutó y sus salidas siguen existiendo (feature store, registry, estado),
+    las reutiliza en lugar de recalcular. `store` registra las salidas de una
+    etapa recién ejecutada.
+
+        artifacts/stage_cache/index.json      (etapa/scope -> clave -> salidas)
+        artifacts/stage_cache/manifest.json   (hits / misses de la última corrida)
+        artifacts/stage_cache/runs/<run>.json (historial de manifests)
+
+    Con enabled=False todas las consultas son miss pero los resultados se
+    registran igual (útil para forzar un recálculo).
+    """
+
+    def __init__(self, root_dir: str = STAGE_CACHE_DIR, enabled: bool = True, max_entries: int = 8):
+        """
+        Args:
+            max_entries: Claves recordadas por etapa/scope (las más recientes)
+        """
+        self.root_dir = root_dir
+        self.enabled = enabled
+        self.max_entries = max_entries
+        self.index_path = os.path.join(root_dir, INDEX_FILE)
+        self.run_id = f"{datetime.now(timezone.utc):%Y%m%dT%H%M%S}"
+        self.index = self._load_index()
+        self.manifest = []
+        os.makedirs(root_dir, exist_ok=True)
+
+    def _load_index(self) -> dict:
+        if not os.path.exists(self.index_path):
+            return {}
+        try:
+            with open(self.index_path) as f:
+                return json.load(f)
+        except json.JSONDecodeError:
+            logging.warning(f"Índice de cache de etapas corrupto en {self.index_path}; se ignora")
+            return {}
+
+    def _save_index(self):
+        tmp_path = f"{self.index_path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self.index, f, indent=4)
+        os.replace(tmp_path, self.index_path)
+
+    @staticmethod
+    def _slot(stage: str, scope: str = None) -> str:
+        return f"{stage}/{scope}" if scope else stage
+
+    def _record(self, stage: str, scope: str, key: str, status: str, outputs: dict = None):
+        self.manifest.append({
+            "stage": stage,
+            "scope": scope,
+            "key": key,
+            "status": status,
+            "outputs": outputs,
+            "at": datetime.now(timezone.utc).isoformat(),
+        })
+
+    def lookup(self, stage: str, key: str, scope: str = None, validate=None):
+        """
+        Salidas guardadas para la clave, o None (miss).
+
+        Args:
+            scope: Subdivisión de la etapa (ej. el símbolo)
+            validate: Función sobre las salidas que devuelve False si ya no
+                sirven (ej. la versión del feature store fue borrada)
+        """
+        entry = self.index.get(self._slot(stage, scope), {}).get(key) if self.enabled else None
+        outputs = entry["outputs"] if entry else None
+        if outputs is not None and validate is not None and not validate(outputs):
+            logging.info(f"Cache de etapa {self._slot(stage, scope)}: salidas de {key[:12]} no disponibles")
+            outputs = None
+
+        if outputs is None:
+            self._record(stage, scope, key, "miss")
+            return None
+        entry["last_used"] = time.time()
+        self._record(stage, scope, key, "hit", outputs)
+        logging.info(f"Cache de etapa {self._slot(stage, scope)}: hit {key[:12]}")
+        return outputs
+
+    def store(self, stage: str, key: str, outputs: dict, scope: str = None):
+        """
+        Registra las salidas de una etapa ejecutada (y las asocia al último miss de esa etapa).
+        """
+        slot = self.index.setdefault(self._slot(stage, scope), {})
+        slot[key] = {"outputs": outputs, "created_at": datetime.now(timezone.utc).isoformat(),
+                     "last_used": time.time()}
+        for old in sorted(slot, key=lambda k: slot[k]["last_used"])[:-self.max_entries]:
+            del slot[old]
+        self._save_index()
+
+        for record in reversed(self.manifest):
+            if record["stage"] == stage and record["scope"] == scope and record["status"] == "miss":
+                record.update({"key": key, "outputs": outputs})
+                break
+
+    def stats(self) -> dict:
+        hits = sum(1 for r in self.manifest if r["status"] == "hit")
+        return {"hits": hits, "misses": len(self.manifest) - hits}
+
+    def save_manifest(self) -> str:
+        """
+        Escribe el manifest de la corrida (hits / misses por etapa) y actualiza el índice.
+        """
+        manifest = {"run_id": self.run_id, "enabled": self.enabled, **self.stats(), "stages": self.manifest}
+        runs_dir = os.path.join(self.root_dir, "runs")
+        os.makedirs(runs_dir, exist_ok=True)
+        with open(os.path.join(runs_dir, f"run_{self.run_id}.json"), "w") as f:
+            json.dump(manifest, f, indent=4)
+
+        path = os.path.join(self.root_dir, MANIFEST_FILE)
+        with open(path, "w") as f:
+            json.dump(manifest, f, indent=4)
+        self._save_index()
+        return path
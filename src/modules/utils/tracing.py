@@ -0,0 +1,235 @@
+import os
+import json
+import time
+import uuid
+import logging
+import resource
+import threading
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+
+TRACE_DIR = "artifacts/traces"
+SPANS_FILE = "spans.jsonl"
+METRIC_PREFIX = "forex_pipeline"
+
+_PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+
+def current_rss() -> int:
+    """
+    RSS actual del proceso en bytes (/proc en Linux; si no, el máximo histórico).
+    """
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * _PAGE_SIZE
+    except (OSError, IndexError, ValueError):
+        max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return max_rss if os.uname().sysname == "Darwin" else max_rss * 1024
+
+
+class Span:
+    """
+    Etapa medida: tiempo de pared, tiempo de CPU, filas procesadas y pico de RSS.
+    `rows` y `attributes` se pueden completar dentro del bloque.
+    """
+
+    def __init__(self, name: str, parent: str = None, rows: int = None, attributes: dict = None):
+        self.name = name
+        self.parent = parent
+        self.rows = rows
+        self.attributes = attributes or {}
+        self.started_at = datetime.now(timezone.utc)
+        self.status = "ok"
+        self.error = None
+        self.wall_seconds = None
+        self.cpu_seconds = None
+        self.rss_start = current_rss()
+        self.peak_rss = self.rss_start
+        self._wall_start = time.perf_counter()
+        self._cpu_start = time.process_time()
+
+    def sample(self, rss: int):
+        if rss > self.peak_rss:
+            self.peak_rss = rss
+
+    def finish(self):
+        self.sample(current_rss())
+        self.wall_seconds = time.perf_counter() - self._wall_start
+        self.cpu_seconds = time.process_time() - self._cpu_start
+
+    @classmethod
+    def from_dict(cls, record: dict, parent: str = None):
+        """
+        Reconstruye un span ya medido (to_dict), por ejemplo el de un proceso worker.
+        """
+        span = cls(record["name"], parent=parent, rows=record["rows"], attributes=record.get("attributes"))
+        span.started_at = datetime.fromisoformat(record["started_at"])
+        span.wall_seconds = record["wall_seconds"]
+        span.cpu_seconds = record["cpu_seconds"]
+        span.peak_rss = int(record["peak_rss_mb"] * 2 ** 20)
+        span.rss_start = span.peak_rss - int(record["rss_delta_mb"] * 2 ** 20)
+        span.status = record["status"]
+        span.error = record.get("error")
+        return span
+
+    def to_dict(self) -> dict:
+        record = {
+            "name": self.name,
+            "parent": self.parent,
+            "started_at": self.started_at.isoformat(),
+            "wall_seconds": self.wall_seconds,
+            "cpu_seconds": self.cpu_seconds,
+            "rows": int(self.rows) if self.rows is not None else None,
+            "rows_per_s": float(self.rows / self.wall_seconds) if self.rows and self.wall_seconds else None,
+            "peak_rss_mb": self.peak_rss / 2 ** 20,
+            "rss_delta_mb": (self.peak_rss - self.rss_start) / 2 ** 20,
+            "status": self.status,
+        }
+        if self.error:
+            record["error"] = self.error
+        if self.attributes:
+            record["attributes"] = self.attributes
+        return record
+
+
+class Tracer:
+    """
+    Tracing liviano por etapas del pipeline.
+
+    Cada `span()` mide su bloque; un hilo de muestreo lee el RSS cada
+    `sample_interval` segundos para registrar el pico de memoria de los spans
+    abiertos. Al terminar, `export()` agrega los spans a un JSON lines y
+    reescribe un textfile de Prometheus (node_exporter textfile collector).
+
+        with tracer.span("train", rows=len(X_train)):
+            model.fit(X_train, y_train)
+    """
+
+    def __init__(self, run_name: str = "pipeline", output_dir: str = TRACE_DIR, sample_interval: float = 0.05):
+        self.run_name = run_name
+        self.run_id = f"{datetime.now(timezone.utc):%Y%m%dT%H%M%S}-{uuid.uuid4().hex[:6]}"
+        self.output_dir = output_dir
+        self.sample_interval = sample_interval
+        self.spans = []
+        self._open = []
+        self._lock = threading.Lock()
+        self._sampler = None
+
+    def _sample_loop(self):
+        while True:
+            time.sleep(self.sample_interval)
+            with self._lock:
+                if not self._open:
+                    self._sampler = None
+                    return
+                rss = current_rss()
+                for span in self._open:
+                    span.sample(rss)
+
+    @contextmanager
+    def span(self, name: str, rows: int = None, **attributes):
+        with self._lock:
+            parent = self._open[-1].name if self._open else None
+            span = Span(name, parent=parent, rows=rows, attributes=attributes)
+            self._open.append(span)
+            if self._sampler is None:
+                self._sampler = threading.Thread(target=self._sample_loop, daemon=True)
+                self._sampler.start()
+        try:
+            yield span
+        except BaseException as e:
+            span.status = "error"
+            span.error = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            span.finish()
+            with self._lock:
+                self._open.remove(span)
+                self.spans.append(span)
+            logging.info(f"[trace] {name}: {span.wall_seconds:.3f}s wall, {span.cpu_seconds:.3f}s cpu, "
+                         f"rows={span.rows}, peak_rss={span.peak_rss / 2 ** 20:.1f}MB")
+
+    def merge(self, records: list, parent: str = None):
+        """
+        Agrega spans medidos en otro proceso (summary() del Tracer de un worker).
+        Los spans sin padre quedan bajo `parent` (por defecto el span abierto actual).
+        """
+        with self._lock:
+            parent = parent or (self._open[-1].name if self._open else None)
+            for record in records:
+                self.spans.append(Span.from_dict(record, parent=record["parent"] or parent))
+
+    def summary(self) -> list:
+        return [span.to_dict() for span in self.spans]
+
+    def export_jsonl(self, path: str = None) -> str:
+        """
+        Agrega una línea JSON por span (con run_id) al historial de corridas.
+        """
+        path = path or os.path.join(self.output_dir, SPANS_FILE)
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path, "a") as f:
+            for record in self.summary():
+                f.write(json.dumps({"run_id": self.run_id, "run": self.run_name, **record}) + "\n")
+        return path
+
+    def export_prometheus(self, path: str = None) -> str:
+        """
+        Reescribe (de forma atómica) <run_name>.prom con la última corrida.
+        Los spans con el mismo nombre se agregan: suma de tiempos y filas, máximo de RSS.
+        """
+        path = path or os.path.join(self.output_dir, f"{self.run_name}.prom")
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+
+        stages = {}
+        for span in self.spans:
+            stage = stages.setdefault(span.name, {"wall": 0.0, "cpu": 0.0, "rows": 0, "rss": 0, "errors": 0})
+            stage["wall"] += span.wall_seconds
+            stage["cpu"] += span.cpu_seconds
+            stage["rows"] += span.rows or 0
+            stage["rss"] = max(stage["rss"], span.peak_rss)
+            stage["errors"] += span.status == "error"
+
+        metrics = [
+            ("stage_wall_seconds", "Tiempo de pared por etapa", "wall"),
+            ("stage_cpu_seconds", "Tiempo de CPU por etapa", "cpu"),
+            ("stage_rows", "Filas procesadas por etapa", "rows"),
+            ("stage_peak_rss_bytes", "Pico de RSS durante la etapa", "rss"),
+            ("stage_errors", "Spans de la etapa que terminaron con error", "errors"),
+        ]
+        lines = []
+        for metric, help_text, field in metrics:
+            name = f"{METRIC_PREFIX}_{metric}"
+            lines += [f"# HELP {name} {help_text}", f"# TYPE {name} gauge"]
+            for stage, values in stages.items():
+                lines.append(f'{name}{{run="{self.run_name}",stage="{stage}"}} {values[field]}')
+        name = f"{METRIC_PREFIX}_last_run_timestamp_seconds"
+        lines += [f"# HELP {name} Fin de la última corrida", f"# TYPE {name} gauge",
+                  f'{name}{{run="{self.run_name}"}} {time.time():.0f}']
+
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w") as f:
+            f.write("\n".join(lines) + "\n")
+        os.replace(tmp_path, path)
+        return path
+
+    def export(self) -> tuple:
+        return self.export_jsonl(), self.export_prometheus()
+
+
+_tracer = Tracer()
+
+
+def get_tracer() -> Tracer:
+    """
+    Tracer activo del proceso; los módulos lo usan para abrir spans sin
+    necesidad de recibirlo por parámetro.
+    """
+    return _tracer
+
+
+def set_tracer(tracer: Tracer) -> Tracer:
+    global _tracer
+    _tracer = tracer
+    return tracer